@@ -0,0 +1,397 @@
+"""Benchmarks for the upload, data and preview endpoints
+
+Generates synthetic workbooks (CSV and .xlsx, growing row/column/sheet counts),
+drives the FastAPI app in-process through its test client, and records latency
+percentiles, peak RSS and output sizes per endpoint. Results can be saved as a
+baseline and later runs compared against it:
+
+    python benchmark.py --preset quick --save-baseline
+    python benchmark.py --preset quick --baseline benchmark_baseline.json
+
+The comparison exits with status 1 when any metric regresses past its threshold.
+Timings only compare between runs on the same machine, so no baseline is
+committed: CI saves one from the commit the change is based on and compares
+the change against it in the same job. That commit has to contain this
+script; the change that adds it has nothing to compare against, so the
+comparison is skipped when it is missing:
+
+    git worktree add ../base "$(git merge-base HEAD origin/main)"
+    if [ -f ../base/backend/benchmark.py ]; then
+        (cd ../base/backend && python benchmark.py --preset quick --save-baseline --baseline "$PWD/baseline.json")
+        python benchmark.py --preset quick --baseline ../base/backend/baseline.json
+    fi
+
+The app runs in a scratch directory, so nothing under backend/ is touched.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+BACKEND_DIR = Path(__file__).resolve().parent
+
+# name: list of (rows, columns, sheets, format)
+PRESETS = {
+    "quick": [
+        (1_000, 10, 1, "csv"),
+        (1_000, 10, 1, "xlsx"),
+        (20_000, 10, 1, "csv"),
+    ],
+    "default": [
+        (1_000, 10, 1, "csv"),
+        (1_000, 10, 1, "xlsx"),
+        (50_000, 20, 1, "csv"),
+        (50_000, 20, 1, "xlsx"),
+        (10_000, 10, 5, "xlsx"),
+    ],
+    "full": [
+        (1_000, 10, 1, "csv"),
+        (1_000, 10, 1, "xlsx"),
+        (100_000, 20, 1, "csv"),
+        (100_000, 20, 1, "xlsx"),
+        (20_000, 50, 1, "xlsx"),
+        (20_000, 10, 10, "xlsx"),
+        (1_000_000, 10, 1, "csv"),
+    ],
+}
+
+# Allowed relative increase over the baseline before a metric counts as a regression
+DEFAULT_THRESHOLDS = {"p50_ms": 0.25, "p95_ms": 0.50, "peak_rss_mb": 0.25, "output_bytes": 0.10}
+# Latencies below this are too noisy to compare
+MIN_COMPARABLE_MS = 10.0
+
+def scenario_name(rows: int, columns: int, sheets: int, fmt: str) -> str:
+    return f"{rows}x{columns}x{sheets}.{fmt}"
+
+def parse_scenario(text: str) -> tuple:
+    """Parse "ROWSxCOLSxSHEETS.FORMAT", e.g. 50000x20x1.csv"""
+    shape, fmt = text.rsplit(".", 1)
+    rows, columns, sheets = (int(part) for part in shape.split("x"))
+    if fmt not in ("csv", "xlsx"):
+        raise argparse.ArgumentTypeError(f"Unknown format: {fmt}")
+    if fmt == "csv" and sheets != 1:
+        raise argparse.ArgumentTypeError("A CSV has exactly one sheet")
+    return rows, columns, sheets, fmt
+
+def synthetic_sheet(rng: np.random.Generator, rows: int, columns: int) -> pd.DataFrame:
+    """A mix of the column kinds real exports have: ids, floats, categories, dates and gaps"""
+    data = {}
+    for index in range(columns):
+        kind = index % 5
+        name = f"col_{index}"
+        if kind == 0:
+            data[name] = np.arange(rows)
+        elif kind == 1:
+            data[name] = rng.normal(100, 25, rows).round(3)
+        elif kind == 2:
+            data[name] = rng.choice(["North", "South", "East", "West", "Central"], rows)
+        elif kind == 3:
+            data[name] = pd.Timestamp("2024-01-01") + pd.to_timedelta(rng.integers(0, 365 * 24, rows), unit="h")
+        else:
+            values = rng.random(rows)
+            data[name] = np.where(values < 0.1, np.nan, values * 1000)
+    return pd.DataFrame(data)
+
+def write_workbook(path: Path, seed: int, rows: int, columns: int, sheets: int, fmt: str):
+    rng = np.random.default_rng(seed)
+    if fmt == "csv":
+        synthetic_sheet(rng, rows, columns).to_csv(path, index=False)
+        return
+    with pd.ExcelWriter(path) as writer:
+        for sheet in range(sheets):
+            synthetic_sheet(rng, rows, columns).to_excel(writer, sheet_name=f"Sheet{sheet + 1}", index=False)
+
+def current_rss() -> int:
+    """Resident set size in bytes (Linux /proc; the peak on other Unixes, 0 on Windows)"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+    if sys.platform == "win32":
+        return 0  # No resource module; peak RSS then reads 0 and is never flagged as a regression
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+class RssSampler:
+    """Track the peak RSS while a block runs by sampling from a background thread"""
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, current_rss())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self.peak = current_rss()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, current_rss())
+
+def summarize(samples: list, peak_rss: int, output_bytes: int) -> dict:
+    latencies = np.array(samples) * 1000
+    return {
+        "runs": len(samples),
+        "cold_ms": round(float(latencies[0]), 2),
+        "p50_ms": round(float(np.percentile(latencies, 50)), 2),
+        "p95_ms": round(float(np.percentile(latencies, 95)), 2),
+        "p99_ms": round(float(np.percentile(latencies, 99)), 2),
+        "mean_ms": round(float(latencies.mean()), 2),
+        "peak_rss_mb": round(peak_rss / (1024 * 1024), 1),
+        "output_bytes": output_bytes,
+    }
+
+def measure(operation, repeat: int) -> dict:
+    """Run operation() repeat times; it returns the size of what it produced"""
+    samples = []
+    output_bytes = 0
+    with RssSampler() as sampler:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            output_bytes = operation()
+            samples.append(time.perf_counter() - start)
+    return summarize(samples, sampler.peak, output_bytes)
+
+def check(response, status: int = 200):
+    if response.status_code != status:
+        raise RuntimeError(f"{response.request.method} {response.request.url} -> {response.status_code}: {response.text[:200]}")
+    return response
+
+def run_scenario(client, main, workdir: Path, spec: tuple, seed: int, repeat: int) -> dict:
+    """Benchmark every endpoint against one synthetic workbook"""
+    rows, columns, sheets, fmt = spec
+    source = workdir / f"bench_{scenario_name(*spec)}"
+    write_workbook(source, seed, rows, columns, sheets, fmt)
+    content = source.read_bytes()
+    results = {"input_bytes": len(content)}
+
+    def upload():
+        response = check(client.post("/api/upload", files={"file": (source.name, content)}))
+        upload.file_id = response.json()["fileId"]
+        return len(response.content)
+
+    def data():
+        return len(check(client.get(f"/api/files/{upload.file_id}/data")).content)
+
+    def data_as(media_type: str):
+        def fetch():
+            return len(check(client.get(f"/api/files/{upload.file_id}/data", headers={"Accept": media_type})).content)
+        return fetch
+
+    def rows_window():
+        return len(check(client.get(f"/api/files/{upload.file_id}/rows", params={"offset": rows // 2, "limit": 1000})).content)
+
+    def profile():
+        return len(check(client.get(f"/api/files/{upload.file_id}/profile", params={"exact": "true"})).content)
+
+    counter = iter(range(10 ** 9))
+
+    def preview_output(body: dict) -> int:
+        return (
+            (main.PREVIEW_DIR / body["previewFile"]).stat().st_size
+            + (main.IMAGES_DIR / body["imageFile"]).stat().st_size
+            + (main.IMAGES_DIR / body["thumbnailFile"]).stat().st_size
+        )
+
+    def preview_cold():
+        # New customizations every time (and per scenario), so the preview cache never answers
+        body = check(client.post("/api/generate-preview", json={
+            "fileId": upload.file_id,
+            "customizations": {"presentationTo": f"Customer {source.name} {next(counter)}", "madeBy": "Benchmark"}
+        })).json()
+        return preview_output(body)
+
+    def preview_cached():
+        body = check(client.post("/api/generate-preview", json={
+            "fileId": upload.file_id,
+            "customizations": {"presentationTo": "Benchmark customer", "madeBy": "Benchmark"}
+        })).json()
+        return preview_output(body)
+
+    def deck():
+        body = check(client.post("/api/generate-deck", json={
+            "fileId": upload.file_id, "maxRows": 1000, "rowsPerSlide": 20,
+            "columns": [f"col_{index}" for index in range(min(columns, 8))]
+        })).json()
+        deck.thumbnails_url = body["thumbnailsUrl"]
+        return (main.PREVIEW_DIR / body["deckFile"]).stat().st_size
+
+    def thumbnails():
+        # The first run rasterizes every slide; repeats are answered from the per-slide cache
+        body = check(client.get(deck.thumbnails_url)).json()
+        return sum((main.IMAGES_DIR / slide["thumbnailUrl"].rsplit("/", 1)[1]).stat().st_size for slide in body["slides"])
+
+    # The first upload stores and probes the file; repeats hit content deduplication
+    results["upload"] = measure(upload, repeat)
+    # The first read parses the workbook into the sheet cache; repeats read the cache
+    main.invalidate_cached_sheets(main.file_storage[upload.file_id]["content_hash"])
+    results["data"] = measure(data, repeat)
+    results["data_columns"] = measure(data_as("application/vnd.excelppt.columns+json"), repeat)
+    results["data_msgpack"] = measure(data_as("application/msgpack"), repeat)
+    results["data_arrow"] = measure(data_as("application/vnd.apache.arrow.stream"), repeat)
+    results["rows"] = measure(rows_window, repeat)
+    results["profile"] = measure(profile, repeat)
+    results["preview"] = measure(preview_cold, repeat)
+    results["preview_cached"] = measure(preview_cached, repeat)
+    results["deck"] = measure(deck, repeat)
+    results["thumbnails"] = measure(thumbnails, repeat)
+
+    check(client.delete(f"/api/upload/{upload.file_id}"))
+    source.unlink()
+    return results
+
+def run_benchmarks(scenarios: list, seed: int, repeat: int) -> dict:
+    workdir = Path(tempfile.mkdtemp(prefix="excel-ppt-bench-"))
+    shutil.copy(BACKEND_DIR / "FirstPage.png", workdir / "FirstPage.png")
+    previous_dir = os.getcwd()
+    os.environ.setdefault("METADATA_DB_PATH", str(workdir / "metadata.db"))
+    # main.py resolves its storage directories against the working directory at import time
+    os.chdir(workdir)
+    sys.path.insert(0, str(BACKEND_DIR))
+    try:
+        from fastapi.testclient import TestClient
+
+        log = io.StringIO()
+        with contextlib.redirect_stdout(log):
+            import main
+            client_context = TestClient(main.app)
+            client = client_context.__enter__()
+
+        results = {}
+        try:
+            for spec in scenarios:
+                name = scenario_name(*spec)
+                print(f"Running {name} ...", flush=True)
+                with contextlib.redirect_stdout(log):
+                    results[name] = run_scenario(client, main, workdir, spec, seed, repeat)
+        finally:
+            with contextlib.redirect_stdout(log):
+                client_context.__exit__(None, None, None)
+        return results
+    finally:
+        os.chdir(previous_dir)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+def environment_info(seed: int, repeat: int) -> dict:
+    import fastapi
+    import pptx
+    import pyarrow
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "pyarrow": pyarrow.__version__,
+        "fastapi": fastapi.__version__,
+        "python-pptx": pptx.__version__,
+        "seed": seed,
+        "repeat": repeat,
+    }
+
+def compare(results: dict, baseline: dict, thresholds: dict) -> list:
+    """Return one (scenario, operation, metric, baseline, current, change) row per regression"""
+    regressions = []
+    for scenario, operations in results.items():
+        base_operations = baseline.get("results", {}).get(scenario)
+        if base_operations is None:
+            continue
+        for operation, metrics in operations.items():
+            base_metrics = base_operations.get(operation)
+            if not isinstance(metrics, dict) or not isinstance(base_metrics, dict):
+                continue
+            for metric, allowed in thresholds.items():
+                before, after = base_metrics.get(metric), metrics.get(metric)
+                if not before or after is None:
+                    continue
+                if metric.endswith("_ms") and max(before, after) < MIN_COMPARABLE_MS:
+                    continue
+                change = (after - before) / before
+                if change > allowed:
+                    regressions.append((scenario, operation, metric, before, after, change))
+    return regressions
+
+def print_table(results: dict):
+    header = f"{'scenario':<24}{'operation':<16}{'cold ms':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'rss MB':>10}{'output':>12}"
+    print(header)
+    print("-" * len(header))
+    for scenario, operations in results.items():
+        for operation, metrics in operations.items():
+            if not isinstance(metrics, dict):
+                continue
+            print(
+                f"{scenario:<24}{operation:<16}{metrics['cold_ms']:>10}{metrics['p50_ms']:>10}"
+                f"{metrics['p95_ms']:>10}{metrics['p99_ms']:>10}{metrics['peak_rss_mb']:>10}{metrics['output_bytes']:>12}"
+            )
+
+def main_cli(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--preset", choices=sorted(PRESETS), default="default")
+    parser.add_argument("--scenario", action="append", type=parse_scenario,
+                        help="ROWSxCOLSxSHEETS.FORMAT, repeatable; replaces the preset")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per operation (the first one is the cold run)")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--output", type=Path, default=Path("benchmark_results.json"))
+    parser.add_argument("--baseline", type=Path, default=BACKEND_DIR / "benchmark_baseline.json")
+    parser.add_argument("--save-baseline", action="store_true", help="store this run as the baseline")
+    parser.add_argument("--threshold", action="append", default=[], metavar="METRIC=RATIO",
+                        help="override a regression threshold, e.g. p50_ms=0.3")
+    args = parser.parse_args(argv)
+
+    thresholds = dict(DEFAULT_THRESHOLDS)
+    for override in args.threshold:
+        metric, ratio = override.split("=", 1)
+        thresholds[metric] = float(ratio)
+
+    scenarios = args.scenario or PRESETS[args.preset]
+    report = {
+        "environment": environment_info(args.seed, args.repeat),
+        "results": run_benchmarks(scenarios, args.seed, args.repeat),
+    }
+    print_table(report["results"])
+
+    args.output.write_text(json.dumps(report, indent=2))
+    print(f"\nResults written to {args.output}")
+
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps(report, indent=2))
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+
+    if not args.baseline.exists():
+        print(f"No baseline at {args.baseline}, skipping comparison (use --save-baseline)")
+        return 0
+
+    regressions = compare(report["results"], json.loads(args.baseline.read_text()), thresholds)
+    if not regressions:
+        print(f"No regressions against {args.baseline}")
+        return 0
+
+    print(f"\n{len(regressions)} regression(s) against {args.baseline}:")
+    for scenario, operation, metric, before, after, change in regressions:
+        print(f"  {scenario} {operation} {metric}: {before} -> {after} (+{change:.0%}, limit +{thresholds[metric]:.0%})")
+    return 1
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
@@ -1,21 +1,95 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException
+from __future__ import annotations
+
+import time
+
+# Taken before anything heavy is imported so the startup report covers the whole module load
+_MODULE_LOAD_STARTED = time.perf_counter()
+
+from fastapi import FastAPI, File, UploadFile, HTTPException, Query, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, FileResponse
+from fastapi import Request
+from fastapi.responses import JSONResponse, FileResponse, StreamingResponse, PlainTextResponse, Response
+from starlette.routing import Match
+from typing import List, Optional, TYPE_CHECKING
 import os
 import uuid
 import shutil
 from pathlib import Path
-import pandas as pd
-from pptx import Presentation
-from pptx.util import Inches
-from pptx.enum.text import PP_ALIGN
-from pptx.dml.color import RGBColor
 import io
-import base64
-import subprocess
+import importlib
 import platform
 import re
-from PIL import Image
+import json
+import hashlib
+import struct
+import zlib
+import csv
+import zipfile
+import posixpath
+from urllib.parse import quote
+import xml.etree.ElementTree as ET
+from xml.sax.saxutils import escape as xml_escape
+import asyncio
+import contextlib
+import contextvars
+import cProfile
+import pstats
+import random
+import threading
+import functools
+import logging
+import sqlite3
+from collections import OrderedDict, deque
+from collections.abc import MutableMapping
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+if TYPE_CHECKING:
+    from pptx import Presentation
+
+class LazyModule:
+    """Module stand-in that imports the real module on first attribute access
+
+    Keeps pandas, pyarrow and PIL out of the import path of endpoints that never
+    touch them (health checks, uploads, downloads). After the first access the
+    module's namespace is copied onto the proxy, so later lookups cost the same
+    as on the module itself. The proxy has no public methods of its own, so
+    names like np.load always mean the module's; use load_lazy_module() instead.
+    """
+    
+    def __init__(self, name: str):
+        self._lazy_name = name
+        self._lazy_module = None
+    
+    def __getattr__(self, attr):
+        return getattr(load_lazy_module(self), attr)
+    
+    def __repr__(self):
+        state = "loaded" if self._lazy_module is not None else "not loaded"
+        return f"<lazy module {self._lazy_name!r} ({state})>"
+
+def load_lazy_module(proxy: LazyModule):
+    """Import the module behind a LazyModule (if not done yet) and return it"""
+    module = proxy.__dict__["_lazy_module"]
+    if module is None:
+        module = importlib.import_module(proxy.__dict__["_lazy_name"])
+        proxy.__dict__.update(module.__dict__)
+        proxy.__dict__["_lazy_module"] = module
+    return module
+
+pd = LazyModule("pandas")
+np = LazyModule("numpy")
+pa = LazyModule("pyarrow")
+pa_csv = LazyModule("pyarrow.csv")
+pa_compute = LazyModule("pyarrow.compute")
+pa_ipc = LazyModule("pyarrow.ipc")
+pq = LazyModule("pyarrow.parquet")
+msgpack = LazyModule("msgpack")
+orjson = LazyModule("orjson")
+Image = LazyModule("PIL.Image")
+ImageDraw = LazyModule("PIL.ImageDraw")
+ImageFont = LazyModule("PIL.ImageFont")
+
+logger = logging.getLogger(__name__)
 
 app = FastAPI()
 
@@ -32,420 +106,4291 @@ app.add_middleware(
 UPLOAD_DIR = Path("uploads")
 PREVIEW_DIR = Path("previews")
 IMAGES_DIR = Path("images")
+CACHE_DIR = Path("cache")  # Parsed sheet data, one Parquet file per sheet
 UPLOAD_DIR.mkdir(exist_ok=True)
 PREVIEW_DIR.mkdir(exist_ok=True)
 IMAGES_DIR.mkdir(exist_ok=True)
+CACHE_DIR.mkdir(exist_ok=True)
+
+# Chunk size used when streaming uploads to disk
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+# Resumable uploads: suggested and largest accepted chunk, and how long an
+# upload may sit idle before it is dropped (its partial file is then orphaned
+# and removed by the reconcile pass anyway)
+RESUMABLE_CHUNK_SIZE = int(os.environ.get("RESUMABLE_CHUNK_SIZE", 8 * 1024 * 1024))
+RESUMABLE_MAX_CHUNK_SIZE = int(os.environ.get("RESUMABLE_MAX_CHUNK_SIZE", 32 * 1024 * 1024))
+# A request writing to a resumable upload holds it this long at most, in case its worker dies
+RESUMABLE_WRITE_LEASE_SECONDS = float(os.environ.get("RESUMABLE_WRITE_LEASE_SECONDS", 300))
+
+# Bytes read from the start of a CSV / worksheet part when probing metadata
+PROBE_SAMPLE_BYTES = 64 * 1024
+
+# Rows per Parquet row group in the sheet cache; windowed reads skip whole groups
+CACHE_ROW_GROUP_SIZE = 50_000
+# Rows decoded per batch when streaming sheet rows
+STREAM_BATCH_SIZE = 1_000
+
+# Column profiles: sheets with more rows than this get an approximate profile from
+# their first rows right away while the exact one is computed in the background
+PROFILE_SAMPLE_ROWS = 50_000
+PROFILE_PREVIEW_ROWS = 5
+# Part of the stored profile's file name; bump when the profile's contents change
+PROFILE_FORMAT_VERSION = 2
+
+# CSVs at least this large are converted to the sheet cache in chunks with the
+# pyarrow reader instead of one pd.read_csv; column types come from a sample of
+# the first rows, and Arrow allocations during the conversion may not exceed the ceiling
+CSV_CHUNKED_MIN_BYTES = int(os.environ.get("CSV_CHUNKED_MIN_BYTES", 64 * 1024 * 1024))
+CSV_SAMPLE_ROWS = 10_000
+CSV_MEMORY_LIMIT_BYTES = int(os.environ.get("CSV_MEMORY_LIMIT_BYTES", 512 * 1024 * 1024))
+
+# Worker pool for CPU-heavy stages (pandas, python-pptx, PIL); "thread" or "process"
+WORKER_POOL_KIND = os.environ.get("WORKER_POOL_KIND", "thread")
+WORKER_POOL_SIZE = int(os.environ.get("WORKER_POOL_SIZE", os.cpu_count() or 4))
+# Jobs allowed to wait for a free worker before requests are rejected with 503
+WORKER_QUEUE_DEPTH = int(os.environ.get("WORKER_QUEUE_DEPTH", 32))
+WORKER_JOB_TIMEOUT = float(os.environ.get("WORKER_JOB_TIMEOUT", 120))
+WORKER_RETRY_AFTER = 5  # Seconds suggested to clients when the queue is full
+
+# Background jobs: how long a finished job's result stays retrievable, and the
+# time limit for a single job (longer than request-bound work)
+JOB_RESULT_TTL = float(os.environ.get("JOB_RESULT_TTL", 3600))
+JOB_TIMEOUT = float(os.environ.get("JOB_TIMEOUT", 900))
+JOB_EVENTS_POLL_INTERVAL = 0.25
+
+# Rendered previews are reused while their (template, customizations) key is unchanged;
+# bump the version whenever render_preview changes what it draws
+PREVIEW_TEMPLATE_VERSION = 3
+PREVIEW_CACHE_MAX_BYTES = int(os.environ.get("PREVIEW_CACHE_MAX_BYTES", 512 * 1024 * 1024))
+
+# File metadata backend: "sqlite" is shared by every worker process and survives
+# restarts, "memory" is a plain per-process dict
+METADATA_BACKEND = os.environ.get("METADATA_BACKEND", "sqlite")
+METADATA_DB_PATH = Path(os.environ.get("METADATA_DB_PATH", "metadata.db"))
+# Files younger than this are never treated as orphans (another worker may be mid-upload)
+RECONCILE_GRACE_SECONDS = 3600
+
+# Background sweeper: how often it runs, how long files live per directory, the byte
+# quota across all storage directories, and how many deletions go to the pool at once
+SWEEP_INTERVAL_SECONDS = float(os.environ.get("SWEEP_INTERVAL_SECONDS", 300))
+STORAGE_TTL_SECONDS = {
+    "uploads": float(os.environ.get("UPLOADS_TTL_SECONDS", 7 * 24 * 3600)),
+    "previews": float(os.environ.get("PREVIEWS_TTL_SECONDS", 24 * 3600)),
+    "images": float(os.environ.get("IMAGES_TTL_SECONDS", 24 * 3600)),
+}
+STORAGE_QUOTA_BYTES = int(os.environ.get("STORAGE_QUOTA_BYTES", 10 * 1024 ** 3))
+SWEEP_BATCH_SIZE = 200
+
+# Metrics: histogram buckets (seconds) for stage and request timings; requests slower
+# than SLOW_REQUEST_SECONDS are logged with their stage breakdown, and a
+# PROFILE_SAMPLE_RATE fraction of requests run under cProfile so slow ones come with a profile
+METRICS_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+SLOW_REQUEST_SECONDS = float(os.environ.get("SLOW_REQUEST_SECONDS", 1.0))
+PROFILE_SAMPLE_RATE = float(os.environ.get("PROFILE_SAMPLE_RATE", 0.0))
+SLOW_REQUEST_LOG_SIZE = 50
+
+class MemoryMetadataStore(dict):
+    """file_id -> metadata dict, private to this process
+
+    Next to the file records it keeps (kind, id) -> dict records for other state
+    the workers share; a record with a content_hash pins that stored content.
+    """
+    
+    def __init__(self):
+        super().__init__()
+        self._lock = threading.RLock()
+        self._records = {}
+    
+    def transaction(self):
+        """Hold off other threads' transactions until the block ends"""
+        return self._lock
+    
+    def count_content_refs(self, content_hash: str) -> int:
+        with self._lock:
+            return (sum(1 for info in self.values() if info.get("content_hash") == content_hash)
+                    + sum(1 for pinned, _ in self._records.values() if pinned == content_hash))
+    
+    def put_record(self, kind: str, record_id: str, data: dict, content_hash: str = None):
+        with self._lock:
+            self._records[(kind, record_id)] = (content_hash, dict(data))
+    
+    def get_record(self, kind: str, record_id: str) -> Optional[dict]:
+        entry = self._records.get((kind, record_id))
+        return None if entry is None else dict(entry[1])
+    
+    def update_record(self, kind: str, record_id: str, update) -> Optional[dict]:
+        """Apply update(data) to a record atomically, returning the new data (None if there is no record)"""
+        with self._lock:
+            entry = self._records.get((kind, record_id))
+            if entry is None:
+                return None
+            data = dict(entry[1])
+            update(data)
+            self._records[(kind, record_id)] = (entry[0], data)
+            return dict(data)
+    
+    def pop_record(self, kind: str, record_id: str) -> Optional[dict]:
+        with self._lock:
+            entry = self._records.pop((kind, record_id), None)
+        return None if entry is None else entry[1]
+    
+    def records(self, kind: str) -> list:
+        """(record_id, data) for every record of a kind, oldest first"""
+        with self._lock:
+            return [(record_id, dict(data)) for (record_kind, record_id), (_, data) in self._records.items()
+                    if record_kind == kind]
+
+class SQLiteMetadataStore(MutableMapping):
+    """file_id -> metadata dict in a SQLite database in WAL mode
+
+    Behaves like the dict it replaces, but every uvicorn worker sees the same
+    records and they survive restarts. Each thread gets its own connection,
+    and so does each process: a process-pool child forked after the parent
+    opened one opens its own instead of using the inherited copy.
+    Other shared state lives in a records table, see MemoryMetadataStore.
+    """
+    
+    def __init__(self, path: Path):
+        self.path = path
+        self._local = threading.local()
+        # Connections a forked child inherited; kept referenced, never used or closed
+        # (closing one could checkpoint or remove the WAL under the parent), see the SQLite docs on fork()
+        self._inherited = []
+    
+    @property
+    def connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is not None and self._local.pid != os.getpid():
+            self._inherited.append(connection)
+            connection = None
+        if connection is None:
+            connection = sqlite3.connect(str(self.path), timeout=30, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS files ("
+                "file_id TEXT PRIMARY KEY, content_hash TEXT, created_at REAL NOT NULL, data TEXT NOT NULL)"
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS files_content_hash ON files (content_hash)")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS records ("
+                "kind TEXT NOT NULL, record_id TEXT NOT NULL, content_hash TEXT, data TEXT NOT NULL, "
+                "PRIMARY KEY (kind, record_id))"
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS records_content_hash ON records (content_hash)")
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+    
+    def __getitem__(self, file_id: str) -> dict:
+        row = self.connection.execute("SELECT data FROM files WHERE file_id = ?", (file_id,)).fetchone()
+        if row is None:
+            raise KeyError(file_id)
+        return json.loads(row[0])
+    
+    def __setitem__(self, file_id: str, info: dict):
+        # created_at is only set on insert, so updating a record keeps its place in the listing
+        self.connection.execute(
+            "INSERT INTO files (file_id, content_hash, created_at, data) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (file_id) DO UPDATE SET content_hash = excluded.content_hash, data = excluded.data",
+            (file_id, info.get("content_hash"), time.time(), json.dumps(info))
+        )
+    
+    def __delitem__(self, file_id: str):
+        if self.connection.execute("DELETE FROM files WHERE file_id = ?", (file_id,)).rowcount == 0:
+            raise KeyError(file_id)
+    
+    def __contains__(self, file_id) -> bool:
+        return self.connection.execute("SELECT 1 FROM files WHERE file_id = ?", (file_id,)).fetchone() is not None
+    
+    def __iter__(self):
+        rows = self.connection.execute("SELECT file_id FROM files ORDER BY created_at").fetchall()
+        return iter([row[0] for row in rows])
+    
+    def __len__(self) -> int:
+        return self.connection.execute("SELECT COUNT(*) FROM files").fetchone()[0]
+    
+    def items(self):
+        rows = self.connection.execute("SELECT file_id, data FROM files ORDER BY created_at").fetchall()
+        return [(file_id, json.loads(data)) for file_id, data in rows]
+    
+    def values(self):
+        return [info for _, info in self.items()]
+    
+    @contextlib.contextmanager
+    def transaction(self):
+        """Run the block in one BEGIN IMMEDIATE transaction; nested blocks join the outer one"""
+        connection = self.connection
+        if connection.in_transaction:
+            yield connection
+            return
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            yield connection
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        connection.execute("COMMIT")
+    
+    def pop(self, file_id: str, *default):
+        # Read and delete in one transaction so two workers cannot both pop the same record
+        with self.transaction() as connection:
+            row = connection.execute("SELECT data FROM files WHERE file_id = ?", (file_id,)).fetchone()
+            if row is not None:
+                connection.execute("DELETE FROM files WHERE file_id = ?", (file_id,))
+        if row is None:
+            if default:
+                return default[0]
+            raise KeyError(file_id)
+        return json.loads(row[0])
+    
+    def clear(self):
+        self.connection.execute("DELETE FROM files")
+    
+    def count_content_refs(self, content_hash: str) -> int:
+        return self.connection.execute(
+            "SELECT (SELECT COUNT(*) FROM files WHERE content_hash = ?) + (SELECT COUNT(*) FROM records WHERE content_hash = ?)",
+            (content_hash, content_hash)
+        ).fetchone()[0]
+    
+    def put_record(self, kind: str, record_id: str, data: dict, content_hash: str = None):
+        self.connection.execute(
+            "INSERT INTO records (kind, record_id, content_hash, data) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (kind, record_id) DO UPDATE SET content_hash = excluded.content_hash, data = excluded.data",
+            (kind, record_id, content_hash, json.dumps(data))
+        )
+    
+    def get_record(self, kind: str, record_id: str) -> Optional[dict]:
+        row = self.connection.execute(
+            "SELECT data FROM records WHERE kind = ? AND record_id = ?", (kind, record_id)
+        ).fetchone()
+        return None if row is None else json.loads(row[0])
+    
+    def update_record(self, kind: str, record_id: str, update) -> Optional[dict]:
+        """Apply update(data) to a record atomically, returning the new data (None if there is no record)"""
+        with self.transaction() as connection:
+            row = connection.execute(
+                "SELECT data FROM records WHERE kind = ? AND record_id = ?", (kind, record_id)
+            ).fetchone()
+            if row is None:
+                return None
+            data = json.loads(row[0])
+            update(data)
+            connection.execute(
+                "UPDATE records SET data = ? WHERE kind = ? AND record_id = ?", (json.dumps(data), kind, record_id)
+            )
+        return data
+    
+    def pop_record(self, kind: str, record_id: str) -> Optional[dict]:
+        with self.transaction() as connection:
+            row = connection.execute(
+                "SELECT data FROM records WHERE kind = ? AND record_id = ?", (kind, record_id)
+            ).fetchone()
+            if row is not None:
+                connection.execute("DELETE FROM records WHERE kind = ? AND record_id = ?", (kind, record_id))
+        return None if row is None else json.loads(row[0])
+    
+    def records(self, kind: str) -> list:
+        """(record_id, data) for every record of a kind, oldest first"""
+        rows = self.connection.execute(
+            "SELECT record_id, data FROM records WHERE kind = ? ORDER BY rowid", (kind,)
+        ).fetchall()
+        return [(record_id, json.loads(data)) for record_id, data in rows]
+
+def create_metadata_store():
+    if METADATA_BACKEND == "memory":
+        return MemoryMetadataStore()
+    if METADATA_BACKEND == "sqlite":
+        return SQLiteMetadataStore(METADATA_DB_PATH)
+    raise ValueError(f"Unknown METADATA_BACKEND: {METADATA_BACKEND}")
 
 # Store file metadata
-file_storage = {}
+file_storage = create_metadata_store()
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus sense"""
+    
+    def __init__(self, buckets: tuple):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+    
+    def observe(self, value: float):
+        self.sum += value
+        self.count += 1
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+
+class MetricsRegistry:
+    """In-process counters, histograms and scrape-time gauges, rendered as Prometheus text
+
+    Values live in the process that records them: with WORKER_POOL_KIND=process,
+    stages that run inside the pool's worker processes are not exported.
+    """
+    
+    PREFIX = "excelppt_"
+    HELP = {
+        "stage_duration_seconds": ("histogram", "Time spent in one processing stage"),
+        "http_request_duration_seconds": ("histogram", "Request latency until the response starts"),
+        "cache_requests_total": ("counter", "Cache lookups by cache and result"),
+        "slow_requests_total": ("counter", "Requests slower than SLOW_REQUEST_SECONDS"),
+        "live_preview_requests_total": ("counter", "Live-preview channel requests by outcome"),
+    }
+    
+    def __init__(self, buckets: tuple = METRICS_BUCKETS):
+        self.buckets = buckets
+        self.histograms = {}
+        self.counters = {}
+        self.collectors = []
+        self._lock = threading.Lock()
+    
+    def observe(self, name: str, value: float, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram(self.buckets)
+            histogram.observe(value)
+    
+    def inc(self, name: str, amount: float = 1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+    
+    def register(self, collector):
+        """collector() returns [(name, type, help, labels dict, value)] read at scrape time"""
+        self.collectors.append(collector)
+        return collector
+    
+    @staticmethod
+    def _labels(labels) -> str:
+        parts = [
+            '{}="{}"'.format(key, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+            for key, value in labels
+        ]
+        return "{" + ",".join(parts) + "}" if parts else ""
+    
+    def render(self) -> str:
+        families = OrderedDict()
+        
+        def family(name: str, kind: str, help_text: str) -> list:
+            full_name = self.PREFIX + name
+            if full_name not in families:
+                families[full_name] = [f"# HELP {full_name} {help_text}", f"# TYPE {full_name} {kind}"]
+            return families[full_name]
+        
+        with self._lock:
+            for (name, labels), value in sorted(self.counters.items()):
+                kind, help_text = self.HELP.get(name, ("counter", name))
+                family(name, kind, help_text).append(f"{self.PREFIX}{name}{self._labels(labels)} {value}")
+            for (name, labels), histogram in sorted(self.histograms.items()):
+                kind, help_text = self.HELP.get(name, ("histogram", name))
+                lines = family(name, kind, help_text)
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    lines.append(f"{self.PREFIX}{name}_bucket{self._labels(labels + (('le', bound),))} {count}")
+                lines.append(f"{self.PREFIX}{name}_bucket{self._labels(labels + (('le', '+Inf'),))} {histogram.count}")
+                lines.append(f"{self.PREFIX}{name}_sum{self._labels(labels)} {histogram.sum}")
+                lines.append(f"{self.PREFIX}{name}_count{self._labels(labels)} {histogram.count}")
+        
+        for collector in self.collectors:
+            try:
+                samples = collector()
+            except Exception as e:
+                logger.error("Metrics collector %s failed: %s", collector.__name__, e)
+                continue
+            for name, kind, help_text, labels, value in samples:
+                family(name, kind, help_text).append(
+                    f"{self.PREFIX}{name}{self._labels(sorted(labels.items()))} {value}"
+                )
+        
+        return "\n".join(line for lines in families.values() for line in lines) + "\n"
+
+metrics = MetricsRegistry()
+
+# (stage, seconds) list of the request being served, see record_request_metrics()
+_request_stages = contextvars.ContextVar("request_stages", default=None)
+
+def timed(stage: str):
+    """Decorator form of timed_stage()"""
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with timed_stage(stage):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+@contextlib.contextmanager
+def timed_stage(stage: str):
+    """Time a block into the stage_duration_seconds histogram (and the current request's breakdown)"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        metrics.observe("stage_duration_seconds", elapsed, stage=stage)
+        stages = _request_stages.get()
+        if stages is not None:
+            stages.append((stage, round(elapsed, 6)))
+
+class WorkerPool:
+    """Bounded executor that keeps blocking work off the event loop
+
+    At most max_workers jobs run at once and at most max_queue wait behind
+    them; anything beyond that is rejected with 503 + Retry-After instead of
+    piling up, so light endpoints like /api/health keep answering.
+    """
+    
+    def __init__(self, name: str, kind: str, max_workers: int, max_queue: int, timeout: float):
+        self.name = name
+        self.kind = kind
+        self.max_workers = max_workers
+        self.capacity = max_workers + max_queue
+        self.timeout = timeout
+        self.pending = 0
+        self._lock = threading.Lock()
+        self._executor = None
+    
+    @property
+    def executor(self):
+        # Created on first use so importing the module (or a process-pool child) stays cheap
+        if self._executor is None:
+            if self.kind == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=self.name)
+        return self._executor
+    
+    @property
+    def running(self) -> int:
+        return min(self.pending, self.max_workers)
+    
+    @property
+    def queued(self) -> int:
+        return max(self.pending - self.max_workers, 0)
+    
+    def _release(self, _future=None):
+        with self._lock:
+            self.pending -= 1
+    
+    def _busy_error(self) -> HTTPException:
+        return HTTPException(
+            status_code=503,
+            detail="Server is busy, please retry shortly",
+            headers={"Retry-After": str(WORKER_RETRY_AFTER)}
+        )
+    
+    def check_capacity(self):
+        """Raise the 503 that run() would raise if the pool is full right now"""
+        if self.pending >= self.capacity:
+            raise self._busy_error()
+    
+    async def run(self, func, *args, timeout: float = None, **kwargs):
+        """Run func(*args, **kwargs) on the pool and await its result"""
+        with self._lock:
+            if self.pending >= self.capacity:
+                raise self._busy_error()
+            self.pending += 1
+        
+        try:
+            if self.kind == "process":
+                future = self.executor.submit(func, *args, **kwargs)
+            else:
+                # Carry the request context over so stage timings land in its breakdown
+                future = self.executor.submit(contextvars.copy_context().run, func, *args, **kwargs)
+        except Exception:
+            self._release()
+            raise
+        # The slot is freed when the job really finishes, not when the caller gives up,
+        # so timed-out jobs that are still running keep counting against the limit
+        future.add_done_callback(self._release)
+        
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout or self.timeout)
+        except asyncio.TimeoutError:
+            raise HTTPException(status_code=504, detail="Processing timed out")
+    
+    def start(self):
+        """Create the executor now; a process pool forks all of its workers on the first submit"""
+        if self.kind == "process":
+            self.executor.submit(os.getpid).result()
+    
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+# pandas / python-pptx / PIL work
+cpu_pool = WorkerPool("cpu", WORKER_POOL_KIND, WORKER_POOL_SIZE, WORKER_QUEUE_DEPTH, WORKER_JOB_TIMEOUT)
+# Disk copies of upload bodies (file objects cannot be sent to a process pool)
+io_pool = WorkerPool("io", "thread", WORKER_POOL_SIZE, WORKER_QUEUE_DEPTH, WORKER_JOB_TIMEOUT)
+
+@app.on_event("startup")
+def start_worker_pools():
+    # Registered ahead of every other startup hook, so the process workers are forked
+    # before storage reconciliation opens a metadata store connection and before any
+    # thread starts importing the lazy modules (a child forked while another thread
+    # holds an import lock blocks on it forever)
+    cpu_pool.start()
+
+@app.on_event("shutdown")
+def shutdown_worker_pools():
+    cpu_pool.shutdown()
+    io_pool.shutdown()
+
+# Background jobs are "job" records in the metadata store (see submit_job()), so
+# their status, progress and result can be read from any worker
+# Strong references to running job tasks so they are not garbage collected
+_job_tasks = set()
+
+def expire_jobs():
+    """Drop finished jobs whose results have passed their expiry time
+
+    Jobs still running long after JOB_TIMEOUT belonged to a worker that died.
+    """
+    now = time.time()
+    for job_id, job in file_storage.records("job"):
+        if job["expires_at"] and job["expires_at"] <= now:
+            file_storage.pop_record("job", job_id)
+        elif job["finished_at"] is None and now - job["created_at"] > JOB_TIMEOUT + JOB_RESULT_TTL:
+            file_storage.pop_record("job", job_id)
+
+def update_job(job_id: str, **changes) -> Optional[dict]:
+    """Apply changes to a job record and bump its version so event streams pick them up"""
+    def update(job: dict):
+        job.update(changes)
+        job["version"] += 1
+    return file_storage.update_record("job", job_id, update)
+
+def update_job_progress(job_id: str, stage: str, progress: int):
+    """Progress callback handed to job functions (from a process pool only the sqlite backend sees it)"""
+    def update(job: dict):
+        if job["status"] == "running":
+            job["stage"] = stage
+            job["progress"] = progress
+            job["version"] += 1
+    file_storage.update_record("job", job_id, update)
+
+def job_status(job: dict) -> dict:
+    return {
+        "jobId": job["id"],
+        "kind": job["kind"],
+        "status": job["status"],
+        "stage": job["stage"],
+        "progress": job["progress"],
+        "error": job["error"],
+        "createdAt": job["created_at"],
+        "finishedAt": job["finished_at"],
+        "expiresAt": job["expires_at"],
+        "statusUrl": f"/api/jobs/{job['id']}",
+        "resultUrl": f"/api/jobs/{job['id']}/result",
+        "eventsUrl": f"/api/jobs/{job['id']}/events"
+    }
+
+async def _run_job(job_id: str, runner):
+    update_job(job_id, status="running", stage="running")
+    outcome = {}
+    try:
+        # Progress callback is a module-level partial so it can also cross into a process pool
+        progress = functools.partial(update_job_progress, job_id)
+        outcome["result"] = await runner(progress)
+        outcome.update(status="succeeded", stage="done", progress=100)
+    except asyncio.CancelledError:
+        # Shutdown or a cancelled wait: nothing will finish this job, so tell its pollers
+        outcome.update(status="failed", error="Job was cancelled")
+        raise
+    except HTTPException as e:
+        outcome.update(status="failed", error=e.detail)
+    except Exception as e:
+        logger.exception("Job %s failed: %s", job_id, e)
+        outcome.update(status="failed", error=str(e))
+    finally:
+        finished_at = time.time()
+        update_job(job_id, finished_at=finished_at, expires_at=finished_at + JOB_RESULT_TTL, **outcome)
+
+def submit_job(kind: str, runner) -> dict:
+    """Start `await runner(progress)` in the background and return its job record"""
+    expire_jobs()
+    # Reject up front rather than accepting a job that will fail immediately
+    cpu_pool.check_capacity()
+    
+    job = {
+        "id": str(uuid.uuid4()),
+        "kind": kind,
+        "status": "queued",
+        "stage": "queued",
+        "progress": 0,
+        "result": None,
+        "error": None,
+        "created_at": time.time(),
+        "finished_at": None,
+        "expires_at": None,
+        "version": 0
+    }
+    file_storage.put_record("job", job["id"], job)
+    
+    task = asyncio.create_task(_run_job(job["id"], runner))
+    _job_tasks.add(task)
+    task.add_done_callback(_job_tasks.discard)
+    return job
+
+def get_job(job_id: str) -> dict:
+    expire_jobs()
+    job = file_storage.get_record("job", job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found or expired")
+    return job
 
 def sanitize_filename(name: str) -> str:
     """Sanitize a string to be safe for use as a filename"""
     if not name or not name.strip():
         return "Presentation"
     
-    # Remove or replace unsafe characters
-    sanitized = re.sub(r'[<>:"/\\|?*]', '_', name.strip())
+    # Remove or replace unsafe characters
+    sanitized = re.sub(r'[<>:"/\\|?*]', '_', name.strip())
+    
+    # Remove multiple spaces and replace with single underscore
+    sanitized = re.sub(r'\s+', '_', sanitized)
+    
+    # Remove leading/trailing dots and spaces
+    sanitized = sanitized.strip('._')
+    
+    # Limit length to reasonable size
+    if len(sanitized) > 100:
+        sanitized = sanitized[:100]
+    
+    # Ensure it's not empty after sanitization
+    if not sanitized:
+        sanitized = "Presentation"
+    
+    return sanitized
+
+def _cache_manifest_path(cache_key: str) -> Path:
+    return CACHE_DIR / f"{cache_key}.manifest.json"
+
+def _cache_sheet_path(cache_key: str, index: int) -> Path:
+    # Sheet names can contain characters that are not valid in filenames,
+    # so sheets are stored by position and the manifest keeps the names
+    return CACHE_DIR / f"{cache_key}.{index}.parquet"
+
+def _source_signature(filepath: str) -> dict:
+    stat = os.stat(filepath)
+    return {"size": stat.st_size, "mtime": stat.st_mtime}
+
+# Schema metadata key holding the original types of cells in mixed columns (see _parquet_safe)
+_MIXED_CELLS_KEY = b"excelppt.mixed_cells"
+_MIXED_CELL_PARSERS = {"i": int, "f": float, "b": lambda text: text == "True"}
+
+def _mixed_cell_code(value) -> str:
+    if isinstance(value, (bool, np.bool_)):
+        return "b"
+    if isinstance(value, (int, np.integer)):
+        return "i"
+    if isinstance(value, (float, np.floating)) and not pd.isna(value):
+        return "f"
+    return "-"
+
+def _parquet_safe(df: pd.DataFrame) -> tuple:
+    """Make a DataFrame writable as Parquet (string column names, single-typed object columns)
+
+    Returns (df, mixed). A column holding several types is stored as text;
+    mixed maps it to one code per row ("i", "f", "b", or "-" for a cell
+    kept as text) so restore_mixed_cells() can give rows their numbers back.
+    """
+    df = df.copy(deep=False)
+    df.columns = [str(col) for col in df.columns]
+    mixed = {}
+    for col in df.select_dtypes(include="object").columns:
+        values = df[col]
+        present = values.notna()
+        if values[present].map(type).nunique() > 1:
+            # Mixed ints/strings/dates in one Excel column: keep them as text
+            mixed[col] = "".join(map(_mixed_cell_code, values.tolist()))
+            df[col] = values.where(~present, values.astype(str))
+    return df, mixed
+
+def write_sheet_parquet(df: pd.DataFrame, path: Path):
+    """Write one parsed sheet as Parquet, recording the original types of mixed-column cells"""
+    df, mixed = _parquet_safe(df)
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    if mixed:
+        table = table.replace_schema_metadata({**(table.schema.metadata or {}), _MIXED_CELLS_KEY: json.dumps(mixed)})
+    pq.write_table(table, path, row_group_size=CACHE_ROW_GROUP_SIZE)
+
+def mixed_cells(schema: pa.Schema) -> dict:
+    """The per-cell type codes _parquet_safe() stored in a cached sheet's schema"""
+    metadata = schema.metadata or {}
+    return json.loads(metadata[_MIXED_CELLS_KEY]) if _MIXED_CELLS_KEY in metadata else {}
+
+def restore_mixed_values(values, codes: str) -> bool:
+    """Parse the numbers and booleans of one mixed column back from text in place; False if none were"""
+    positions = [match.start() for match in re.finditer(r"[^-]", codes)]
+    for position in positions:
+        values[position] = _MIXED_CELL_PARSERS[codes[position]](values[position])
+    return bool(positions)
+
+def restore_mixed_cells(df: pd.DataFrame, mixed: dict, offset: int = 0) -> pd.DataFrame:
+    """Turn the numbers and booleans of mixed columns back from text, for rows offset.. of a sheet"""
+    for col, codes in mixed.items():
+        if col not in df.columns:
+            continue
+        values = df[col].to_numpy(dtype=object, copy=True)
+        if restore_mixed_values(values, codes[offset:offset + len(df)]):
+            df[col] = values
+    return df
+
+def read_cache_manifest(cache_key: str, filepath: str):
+    """Return the cache manifest for cache_key, or None if missing or stale"""
+    manifest_path = _cache_manifest_path(cache_key)
+    if not manifest_path.exists():
+        return None
+    try:
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except Exception as e:
+        logger.warning("Ignoring unreadable cache manifest for %s: %s", cache_key, e)
+        return None
+    if manifest.get("source") != _source_signature(filepath):
+        return None
+    return manifest
+
+def read_cached_sheets(cache_key: str, filepath: str):
+    """Return {sheet_name: DataFrame} from the cache, or None if missing or stale"""
+    manifest = read_cache_manifest(cache_key, filepath)
+    if manifest is None:
+        return None
+    try:
+        sheets = {}
+        for index, sheet_name in enumerate(manifest["sheets"]):
+            table = pq.read_table(_cache_sheet_path(cache_key, index))
+            sheets[sheet_name] = restore_mixed_cells(table.to_pandas(), mixed_cells(table.schema))
+        return sheets
+    except Exception as e:
+        logger.warning("Ignoring unreadable cache for %s: %s", cache_key, e)
+        return None
+
+def write_cached_sheets(cache_key: str, filepath: str, sheets: dict):
+    """Write parsed sheets to the cache; the manifest is written last so readers never see a partial entry
+
+    A value may also be the Path of an already cached sheet (an unchanged sheet
+    of an earlier version), which is copied instead of written again.
+    """
+    try:
+        for index, df in enumerate(sheets.values()):
+            sheet_path = _cache_sheet_path(cache_key, index)
+            tmp_path = sheet_path.with_suffix(f".{uuid.uuid4().hex}.tmp")
+            if isinstance(df, Path):
+                shutil.copyfile(df, tmp_path)
+            else:
+                write_sheet_parquet(df, tmp_path)
+            os.replace(tmp_path, sheet_path)
+        
+        manifest_path = _cache_manifest_path(cache_key)
+        tmp_path = manifest_path.with_suffix(f".{uuid.uuid4().hex}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"sheets": list(sheets.keys()), "source": _source_signature(filepath)}, f)
+        os.replace(tmp_path, manifest_path)
+    except Exception as e:
+        # The cache is only an optimization, the parsed data is still returned
+        logger.error("Error writing cache for %s: %s", cache_key, e)
+
+def invalidate_cached_sheets(cache_key: str):
+    """Remove every cache file belonging to cache_key"""
+    for cache_path in CACHE_DIR.glob(f"{cache_key}.*"):
+        try:
+            cache_path.unlink()
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.error("Error deleting cache file %s: %s", cache_path, e)
+
+def _is_large_csv(file_info: dict) -> bool:
+    return file_info["filename"].endswith('.csv') and os.path.getsize(file_info["filepath"]) >= CSV_CHUNKED_MIN_BYTES
+
+def csv_sample_schema(filepath) -> pa.Schema:
+    """Infer Arrow column types from the first CSV_SAMPLE_ROWS rows, the way pd.read_csv types them"""
+    sample = pd.read_csv(filepath, nrows=CSV_SAMPLE_ROWS)
+    fields = []
+    for col, dtype in sample.dtypes.items():
+        if pd.api.types.is_bool_dtype(dtype):
+            arrow_type = pa.bool_()
+        elif pd.api.types.is_integer_dtype(dtype):
+            arrow_type = pa.int64()
+        elif pd.api.types.is_float_dtype(dtype):
+            arrow_type = pa.float64()
+        else:
+            arrow_type = pa.string()
+        # pandas' names (deduplicated, "Unnamed: n" for blanks) so both paths cache the same columns
+        fields.append(pa.field(str(col), arrow_type))
+    return pa.schema(fields)
+
+def _widen_csv_type(arrow_type: pa.DataType) -> pa.DataType:
+    # A value later in the file did not fit the sampled type: ints become floats, anything else text
+    return pa.float64() if pa.types.is_integer(arrow_type) else pa.string()
+
+_CSV_COLUMN_ERROR_RE = re.compile(r"CSV column #(\d+)")
+
+def write_csv_cache(cache_key: str, filepath: str):
+    """Convert a CSV to the sheet cache in fixed-size blocks, without ever loading it whole
+
+    Rows are parsed by pyarrow's streaming reader with the sampled column types
+    and appended to the Parquet file one row group at a time. If a value further
+    down does not fit its sampled type, that column is widened and the
+    conversion restarts.
+    """
+    schema = csv_sample_schema(filepath)
+    block_size = min(max(CSV_MEMORY_LIMIT_BYTES // 64, 1024 * 1024), 16 * 1024 * 1024)
+    sheet_path = _cache_sheet_path(cache_key, 0)
+    
+    for _attempt in range(2 * len(schema) + 1):
+        tmp_path = sheet_path.with_suffix(f".{uuid.uuid4().hex}.tmp")
+        try:
+            # A Python file object keeps pyarrow from reading ahead far beyond the current block
+            with open(filepath, "rb") as source, pq.ParquetWriter(tmp_path, schema) as writer:
+                reader = pa_csv.open_csv(
+                    source,
+                    read_options=pa_csv.ReadOptions(column_names=schema.names, skip_rows=1, block_size=block_size),
+                    # Empty cells are missing values in every column, as with pd.read_csv
+                    convert_options=pa_csv.ConvertOptions(
+                        column_types={field.name: field.type for field in schema}, strings_can_be_null=True
+                    ),
+                )
+                pending, pending_rows, pending_bytes = [], 0, 0
+                for batch in reader:
+                    pending.append(batch)
+                    pending_rows += batch.num_rows
+                    pending_bytes += batch.nbytes
+                    if pa.total_allocated_bytes() > CSV_MEMORY_LIMIT_BYTES:
+                        raise MemoryError(
+                            f"CSV conversion exceeded the {CSV_MEMORY_LIMIT_BYTES // (1024 * 1024)} MB memory ceiling"
+                        )
+                    if pending_rows >= CACHE_ROW_GROUP_SIZE or pending_bytes >= CSV_MEMORY_LIMIT_BYTES // 4:
+                        writer.write_table(pa.Table.from_batches(pending, schema), row_group_size=CACHE_ROW_GROUP_SIZE)
+                        pending, pending_rows, pending_bytes = [], 0, 0
+                if pending:
+                    writer.write_table(pa.Table.from_batches(pending, schema), row_group_size=CACHE_ROW_GROUP_SIZE)
+        except pa.ArrowInvalid as e:
+            delete_path(tmp_path)
+            match = _CSV_COLUMN_ERROR_RE.search(str(e))
+            if match is None:
+                raise
+            index = int(match.group(1))
+            schema = schema.set(index, pa.field(schema.names[index], _widen_csv_type(schema.types[index])))
+            continue
+        except BaseException:
+            delete_path(tmp_path)
+            raise
+        
+        os.replace(tmp_path, sheet_path)
+        break
+    else:
+        raise ValueError("Could not settle the CSV column types")
+    
+    manifest_path = _cache_manifest_path(cache_key)
+    tmp_path = manifest_path.with_suffix(f".{uuid.uuid4().hex}.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"sheets": ["Sheet1"], "source": _source_signature(filepath)}, f)
+    os.replace(tmp_path, manifest_path)
+
+def load_sheets(file_info: dict) -> dict:
+    """Parse every sheet of an uploaded file in a single pass, served from the cache when possible"""
+    filepath = file_info["filepath"]
+    cache_key = file_info["content_hash"]
+    
+    sheets = read_cached_sheets(cache_key, filepath)
+    if sheets is not None:
+        metrics.inc("cache_requests_total", cache="sheets", result="hit")
+        return sheets
+    
+    if _is_large_csv(file_info):
+        # Convert in chunks first; the typed columnar cache is far smaller than object-dtype frames
+        metrics.inc("cache_requests_total", cache="sheets", result="miss")
+        with timed_stage("excel_parse"):
+            write_csv_cache(cache_key, filepath)
+        sheets = read_cached_sheets(cache_key, filepath)
+        if sheets is not None:
+            return sheets
+    
+    metrics.inc("cache_requests_total", cache="sheets", result="miss")
+    with timed_stage("excel_parse"):
+        if file_info["filename"].endswith('.csv'):
+            sheets = {"Sheet1": pd.read_csv(filepath)}
+        else:
+            # sheet_name=None opens the workbook once and parses all sheets
+            sheets = pd.read_excel(filepath, sheet_name=None)
+    
+    with timed_stage("cache_write"):
+        write_cached_sheets(cache_key, filepath, sheets)
+    return sheets
+
+def sheet_rows(df: pd.DataFrame) -> list:
+    """Rows of a parsed sheet as lists of JSON-ready cells, the way every row endpoint serves them"""
+    # Excel date cells come back as Timestamps, which JSONResponse cannot encode
+    for col in df.select_dtypes(include=["datetime", "datetimetz"]).columns:
+        df[col] = df[col].dt.strftime("%Y-%m-%d %H:%M:%S")
+    # Convert to list of lists, filling NaN (and NaT) with empty strings
+    return df.fillna("").values.tolist()
+
+def read_sheets_data(file_info: dict) -> dict:
+    """Return {sheet_name: rows} for every sheet, as served by /api/files/{file_id}/data"""
+    return {sheet_name: sheet_rows(df) for sheet_name, df in load_sheets(file_info).items()}
+
+def build_sheet_cache(file_info: dict):
+    """Populate the sheet cache without sending the parsed DataFrames back to the caller"""
+    if _is_large_csv(file_info):
+        if read_cache_manifest(file_info["content_hash"], file_info["filepath"]) is None:
+            metrics.inc("cache_requests_total", cache="sheets", result="miss")
+            with timed_stage("excel_parse"):
+                write_csv_cache(file_info["content_hash"], file_info["filepath"])
+        return
+    load_sheets(file_info)
+
+def iter_sheet_batches(sheet_path: Path, columns, offset: int, limit, batch_size: int = STREAM_BATCH_SIZE):
+    """Yield Arrow record batches covering rows [offset, offset + limit) of a cached sheet"""
+    parquet_file = pq.ParquetFile(sheet_path)
+    
+    # Skip row groups that end before the requested offset without decoding them
+    metadata = parquet_file.metadata
+    row_groups = []
+    skip = offset
+    for index in range(metadata.num_row_groups):
+        group_rows = metadata.row_group(index).num_rows
+        if not row_groups and skip >= group_rows:
+            skip -= group_rows
+            continue
+        row_groups.append(index)
+    
+    remaining = limit
+    if not row_groups or remaining == 0:
+        return
+    
+    for batch in parquet_file.iter_batches(batch_size=batch_size, row_groups=row_groups, columns=columns):
+        if skip:
+            if batch.num_rows <= skip:
+                skip -= batch.num_rows
+                continue
+            batch = batch.slice(skip)
+            skip = 0
+        if remaining is not None:
+            batch = batch.slice(0, remaining)
+            remaining -= batch.num_rows
+        
+        yield batch
+        
+        if remaining == 0:
+            return
+
+def iter_sheet_rows(sheet_path: Path, columns, offset: int, limit):
+    """Yield rows [offset, offset + limit) of a cached sheet, decoding one batch at a time"""
+    mixed = mixed_cells(pq.read_schema(sheet_path))
+    for batch in iter_sheet_batches(sheet_path, columns, offset, limit):
+        # Same cell representation as /api/files/{file_id}/data
+        yield from sheet_rows(restore_mixed_cells(batch.to_pandas(), mixed, offset))
+        offset += batch.num_rows
+
+def cached_sheet_path(file_info: dict, sheet: str = None) -> tuple:
+    """Return (sheet name, Parquet path) for a sheet, building the cache first if needed"""
+    filepath = file_info["filepath"]
+    cache_key = file_info["content_hash"]
+    manifest = read_cache_manifest(cache_key, filepath)
+    if manifest is None:
+        build_sheet_cache(file_info)
+        manifest = read_cache_manifest(cache_key, filepath)
+    if manifest is None:
+        raise RuntimeError("Sheet cache is unavailable")
+    
+    sheet_names = manifest["sheets"]
+    if sheet is None:
+        sheet = sheet_names[0]
+    if sheet not in sheet_names:
+        raise KeyError(sheet)
+    return sheet, _cache_sheet_path(cache_key, sheet_names.index(sheet))
+
+def _profile_path(sheet_path: Path) -> Path:
+    # Next to the sheet's Parquet file, so invalidate_cached_sheets removes it too
+    return sheet_path.with_suffix(f".profile.v{PROFILE_FORMAT_VERSION}.json")
+
+def _profile_type(arrow_type: pa.DataType) -> str:
+    if pa.types.is_boolean(arrow_type):
+        return "boolean"
+    if pa.types.is_integer(arrow_type):
+        return "integer"
+    if pa.types.is_floating(arrow_type) or pa.types.is_decimal(arrow_type):
+        return "float"
+    if pa.types.is_timestamp(arrow_type) or pa.types.is_date(arrow_type):
+        return "datetime"
+    if pa.types.is_string(arrow_type) or pa.types.is_large_string(arrow_type):
+        return "string"
+    return str(arrow_type)
+
+def _profile_value(value):
+    """Make a reduction result JSON-safe (NaN/NaT -> None, timestamps -> ISO strings)"""
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return None
+    if isinstance(value, (pd.Timestamp, np.datetime64)):
+        return pd.Timestamp(value).isoformat()
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+def profile_sheet(sheet_path: Path, max_rows: int = None) -> dict:
+    """Column names, types, null counts and min/max of a cached sheet, one row group at a time
+
+    With max_rows, only the first rows are scanned and null counts are scaled
+    up to the whole sheet, giving an approximate profile.
+    """
+    parquet_file = pq.ParquetFile(sheet_path)
+    schema = parquet_file.schema_arrow
+    total_rows = parquet_file.metadata.num_rows
+    mixed = mixed_cells(schema)
+    
+    nulls = pd.Series(0, index=schema.names, dtype=np.int64)
+    minimums, maximums = {}, {}
+    scanned = 0
+    for batch in iter_sheet_batches(sheet_path, None, 0, max_rows, batch_size=CACHE_ROW_GROUP_SIZE):
+        # Mixed columns get their numbers back first, as in the data endpoints; with
+        # numbers and text side by side they have no min/max (TypeError below)
+        df = restore_mixed_cells(batch.to_pandas(), mixed, scanned)
+        scanned += len(df)
+        nulls += df.isna().sum()
+        for col in df.columns:
+            values = df[col].dropna()
+            if values.empty:
+                continue
+            try:
+                low, high = values.min(), values.max()
+            except TypeError:
+                continue  # Nothing orderable (e.g. nested values)
+            minimums[col] = low if col not in minimums else min(minimums[col], low)
+            maximums[col] = high if col not in maximums else max(maximums[col], high)
+    
+    exact = scanned >= total_rows
+    if not exact and scanned:
+        nulls = (nulls * (total_rows / scanned)).round().astype(np.int64)
+    
+    sample_rows = list(iter_sheet_rows(sheet_path, None, 0, PROFILE_PREVIEW_ROWS))
+    return {
+        "rows": total_rows,
+        "exact": exact,
+        "scannedRows": scanned,
+        "columns": [
+            {
+                "name": field.name,
+                "type": "mixed" if field.name in mixed else _profile_type(field.type),
+                "nullCount": int(nulls[field.name]),
+                "min": _profile_value(minimums.get(field.name)),
+                "max": _profile_value(maximums.get(field.name)),
+            }
+            for field in schema
+        ],
+        "sampleRows": json.loads(json.dumps(sample_rows, default=str)),
+    }
+
+def read_sheet_profile(sheet_path: Path):
+    """Return the stored exact profile of a cached sheet, or None"""
+    try:
+        with open(_profile_path(sheet_path), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logger.warning("Ignoring unreadable profile %s: %s", sheet_path, e)
+        return None
+
+def write_sheet_profile(sheet_path: Path) -> dict:
+    """Compute the exact profile of a cached sheet and store it next to the sheet"""
+    profile = profile_sheet(sheet_path)
+    profile_path = _profile_path(sheet_path)
+    tmp_path = profile_path.with_suffix(f".{uuid.uuid4().hex}.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(profile, f)
+    os.replace(tmp_path, profile_path)
+    return profile
+
+@timed("upload_write")
+def store_upload(source, suffix: str):
+    """Stream an upload into the content-addressed store, returning (content_hash, path, claim)
+
+    The bytes are hashed while they are written, and stored once per SHA-256 as
+    {hash}{suffix}; a duplicate upload only costs the temporary write. The
+    stored content stays pinned by claim until register_upload or abandon_content.
+    """
+    digest = hashlib.sha256()
+    tmp_path = UPLOAD_DIR / f".{uuid.uuid4().hex}.part"
+    try:
+        with open(tmp_path, "wb") as buffer:
+            while True:
+                chunk = source.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                buffer.write(chunk)
+        
+        content_hash = digest.hexdigest()
+        file_path, claim = claim_content(tmp_path, content_hash, suffix)
+        return content_hash, file_path, claim
+    except Exception:
+        if tmp_path.exists():
+            tmp_path.unlink()
+        raise
+
+def content_ref_count(content_hash: str) -> int:
+    """Number of file_storage entries and uploads in progress that point at the given stored content"""
+    return file_storage.count_content_refs(content_hash)
+
+def claim_content(tmp_path: Path, content_hash: str, suffix: str):
+    """Move freshly written bytes to their content address, returning (path, claim)
+
+    The claim is a pending_upload record that counts as a reference, taken in
+    the same transaction as the existence check: release_content cannot delete
+    the stored file between this upload finding it and registering it.
+    """
+    file_path = UPLOAD_DIR / f"{content_hash}{suffix}"
+    claim = uuid.uuid4().hex
+    with file_storage.transaction():
+        file_storage.put_record(
+            "pending_upload", claim, {"filepath": str(file_path), "created_at": time.time()}, content_hash
+        )
+        if file_path.exists():
+            tmp_path.unlink()
+        else:
+            os.replace(tmp_path, file_path)
+    # The stored file is left untouched (its mtime is part of the sheet cache's source
+    # signature); the sweeper ages uploads by the uploaded_at of the records using them
+    return file_path, claim
+
+def abandon_content(content_hash: str, file_path: Path, claim: str):
+    """Drop the claim of an upload that will not be registered, deleting the content if nothing else uses it"""
+    with file_storage.transaction():
+        file_storage.pop_record("pending_upload", claim)
+        if not content_ref_count(content_hash):
+            invalidate_cached_sheets(content_hash)
+            delete_path(file_path)
+
+def delete_unreferenced_upload(file_path: Path) -> bool:
+    """Delete a stored upload unless a record or an upload in progress still uses its content"""
+    content_hash = file_path.name.split(".", 1)[0]
+    with file_storage.transaction():
+        if content_ref_count(content_hash):
+            return False
+        return delete_path(file_path)
+
+def _is_settled(path: Path, now: float) -> bool:
+    try:
+        return now - path.stat().st_mtime > RECONCILE_GRACE_SECONDS
+    except FileNotFoundError:
+        return False
+
+def reconcile_storage() -> dict:
+    """Bring file_storage and the uploads/cache directories back in line with each other
+
+    Records whose stored file is gone are dropped; stored files and cache
+    entries that no record points at are deleted once they are older than
+    RECONCILE_GRACE_SECONDS.
+    """
+    now = time.time()
+    dropped_records = []
+    for file_id, info in list(file_storage.items()):
+        if not os.path.exists(info["filepath"]):
+            file_storage.pop(file_id, None)
+            dropped_records.append(file_id)
+    
+    # Claims left behind by a worker that died between storing and registering an upload
+    for claim, pending in file_storage.records("pending_upload"):
+        if now - pending["created_at"] > RECONCILE_GRACE_SECONDS:
+            file_storage.pop_record("pending_upload", claim)
+    pending = [pending for _, pending in file_storage.records("pending_upload")]
+    
+    referenced_hashes = {info.get("content_hash") for info in file_storage.values()}
+    referenced_hashes |= {Path(info["filepath"]).name.split(".", 1)[0] for info in pending}
+    referenced_paths = {Path(info["filepath"]).name for info in file_storage.values()}
+    referenced_paths |= {Path(info["filepath"]).name for info in pending}
+    referenced_paths |= active_upload_parts()
+    
+    removed_files = []
+    for file_path in UPLOAD_DIR.glob("*"):
+        if file_path.is_file() and file_path.name not in referenced_paths and _is_settled(file_path, now):
+            try:
+                if delete_unreferenced_upload(file_path):
+                    removed_files.append(f"uploads/{file_path.name}")
+            except Exception as e:
+                logger.error("Error removing orphaned upload %s: %s", file_path, e)
+    
+    for cache_path in CACHE_DIR.glob("*"):
+        # Cache files are named {content_hash}.<part>
+        if cache_path.name.split(".", 1)[0] not in referenced_hashes and _is_settled(cache_path, now):
+            try:
+                cache_path.unlink()
+                removed_files.append(f"cache/{cache_path.name}")
+            except Exception as e:
+                logger.error("Error removing orphaned cache file %s: %s", cache_path, e)
+    
+    logger.info("Reconciled storage: dropped %d records, removed %d orphaned files", len(dropped_records), len(removed_files))
+    return {"droppedRecords": dropped_records, "removedFiles": removed_files}
+
+def delete_path(file_path) -> bool:
+    """Delete a file, retrying the way Windows needs for files that are still locked"""
+    try:
+        os.remove(file_path)
+        return True
+    except FileNotFoundError:
+        return True
+    except PermissionError:
+        if platform.system() != "Windows":
+            return False
+    
+    import subprocess
+    
+    # Method 1: Try del command
+    subprocess.run(['cmd', '/c', f'del /F /Q "{file_path}"'], capture_output=True, text=True)
+    time.sleep(0.1)
+    if not os.path.exists(file_path):
+        logger.info("Force deleted locked file with del: %s", file_path)
+        return True
+    
+    # Method 2: Retry with os.remove
+    for attempt in range(3):
+        try:
+            time.sleep(0.1)
+            os.remove(file_path)
+            logger.info("Deleted locked file on retry %d: %s", attempt + 1, file_path)
+            return True
+        except Exception:
+            continue
+    return False
+
+def remove_file_record(file_id: str) -> bool:
+    """Drop a file_storage entry, deleting the stored bytes and parsed data with the last reference
+
+    Returns False if the record did not exist.
+    """
+    info = file_storage.pop(file_id, None)
+    if info is None:
+        return False
+    release_content(info)
+    return True
+
+def release_content(info: dict):
+    """Delete the stored bytes and parsed data of a dropped record unless another record still uses them"""
+    # Other uploads of the same content keep the bytes and parsed data alive. Counting and
+    # deleting happen in one transaction, so no other worker can add a reference in between
+    content_hash = info["content_hash"]
+    with file_storage.transaction():
+        remaining_refs = content_ref_count(content_hash)
+        if remaining_refs:
+            logger.info("Content %s still referenced by %d file(s), keeping it on disk", content_hash, remaining_refs)
+            return
+        
+        # Last reference is gone, parsed data is no longer needed
+        invalidate_cached_sheets(content_hash)
+        if not delete_path(info["filepath"]):
+            logger.warning("Could not delete locked file: %s", info["filepath"])
+
+def _storage_files():
+    """(mtime, size, kind, path) for every file in the storage directories"""
+    for kind, dir_path in (("uploads", UPLOAD_DIR), ("previews", PREVIEW_DIR), ("images", IMAGES_DIR), ("cache", CACHE_DIR)):
+        for file_path in dir_path.glob("*"):
+            if file_path.name.startswith("."):
+                continue  # .{id}.part: an upload still being written, see store_upload
+            try:
+                stat = file_path.stat()
+            except FileNotFoundError:
+                continue
+            if file_path.is_file():
+                yield stat.st_mtime, stat.st_size, kind, file_path
+
+def plan_sweep(now: float) -> dict:
+    """Work out what the sweeper should delete: expired files first, then oldest-first down to the quota"""
+    actions = []
+    
+    # Upload TTL applies to records; the bytes go when the last record does
+    upload_ttl = STORAGE_TTL_SECONDS["uploads"]
+    for file_id, info in file_storage.items():
+        uploaded_at = info.get("uploaded_at")
+        if uploaded_at is None:
+            try:
+                uploaded_at = os.path.getmtime(info["filepath"])
+            except FileNotFoundError:
+                uploaded_at = 0
+        if now - uploaded_at > upload_ttl:
+            actions.append(("record", file_id))
+    
+    expired_records = {file_id for _, file_id in actions}
+    records_by_path = {}
+    uploaded_by_path = {}
+    for file_id, info in file_storage.items():
+        if file_id not in expired_records:
+            name = Path(info["filepath"]).name
+            records_by_path.setdefault(name, []).append(file_id)
+            if info.get("uploaded_at") is not None:
+                uploaded_by_path[name] = max(uploaded_by_path.get(name, 0), info["uploaded_at"])
+    
+    # Shared uploads are as recent as the latest upload of their bytes, not their file's mtime
+    files = sorted(
+        ((uploaded_by_path.get(file_path.name, mtime) if kind == "uploads" else mtime, size, kind, file_path)
+         for mtime, size, kind, file_path in _storage_files()),
+        key=lambda entry: entry[0]
+    )
+    total_bytes = sum(size for _, size, _, _ in files)
+    remaining = []
+    for mtime, size, kind, file_path in files:
+        ttl = STORAGE_TTL_SECONDS.get(kind)
+        if kind in ("previews", "images") and now - mtime > ttl:
+            actions.append(("file", file_path))
+            total_bytes -= size
+        else:
+            remaining.append((mtime, size, kind, file_path))
+    
+    # Over quota: evict oldest first. Uploads take their records and parsed data with
+    # them; cache files are evicted per content hash (the data is re-parsed on demand)
+    evicted_hashes = set()
+    for mtime, size, kind, file_path in remaining:
+        if total_bytes <= STORAGE_QUOTA_BYTES:
+            break
+        if kind == "uploads" and file_path.name in records_by_path:
+            actions.extend(("record", file_id) for file_id in records_by_path.pop(file_path.name))
+        elif kind == "uploads":
+            actions.append(("upload", file_path))
+        elif kind == "cache":
+            content_hash = file_path.name.split(".", 1)[0]
+            if content_hash in evicted_hashes:
+                continue
+            evicted_hashes.add(content_hash)
+            actions.append(("cache", content_hash))
+        else:
+            actions.append(("file", file_path))
+        total_bytes -= size
+    
+    return {"actions": actions, "bytes_after": max(total_bytes, 0)}
+
+def apply_sweep_batch(actions: list) -> dict:
+    """Carry out one batch of sweeper actions, returning counts"""
+    removed = {"records": 0, "files": 0, "cache": 0, "errors": 0}
+    for action, target in actions:
+        try:
+            if action == "record":
+                removed["records"] += remove_file_record(target)
+            elif action == "cache":
+                invalidate_cached_sheets(target)
+                removed["cache"] += 1
+            elif action == "purge":
+                removed["files"] += purge_file(*target)
+            elif action == "upload":
+                # Skipped if an upload of the same content has claimed it since the plan was made
+                removed["files"] += delete_unreferenced_upload(target)
+            elif delete_path(target):
+                removed["files"] += 1
+            else:
+                removed["errors"] += 1
+        except Exception as e:
+            logger.error("Sweeper failed to remove %s: %s", target, e)
+            removed["errors"] += 1
+    return removed
+
+def plan_purge(cutoff: float) -> dict:
+    """Delete every stored file last modified at or before cutoff (used by clear-all)"""
+    return {
+        "actions": [("purge", (file_path, cutoff)) for mtime, _, _, file_path in _storage_files() if mtime <= cutoff],
+        "bytes_after": None
+    }
+
+def purge_file(file_path: Path, cutoff: float) -> bool:
+    """Delete a file for clear-all unless it has been written or re-uploaded since cutoff"""
+    # Checked again at delete time. clear-all dropped every record before cutoff, so any
+    # reference to the content now comes from an upload claimed or registered since
+    with file_storage.transaction():
+        if file_path.parent in (UPLOAD_DIR, CACHE_DIR) and content_ref_count(file_path.name.split(".", 1)[0]):
+            return False
+        try:
+            if os.path.getmtime(file_path) > cutoff:
+                return False
+        except FileNotFoundError:
+            return False
+        return delete_path(file_path)
+
+# Outcome of the most recent sweep, reported by /api/storage
+sweeper_stats = {"runs": 0, "last_run": None, "last_result": None, "bytes_after": None}
+
+async def run_sweep(plan_func, *args) -> dict:
+    """Plan on the IO pool, then delete in batches so other IO work can interleave"""
+    plan = await io_pool.run(plan_func, *args)
+    actions = plan["actions"]
+    totals = {"records": 0, "files": 0, "cache": 0, "errors": 0}
+    for start in range(0, len(actions), SWEEP_BATCH_SIZE):
+        removed = await io_pool.run(apply_sweep_batch, actions[start:start + SWEEP_BATCH_SIZE])
+        for key, count in removed.items():
+            totals[key] += count
+    if plan["bytes_after"] is not None:
+        sweeper_stats["bytes_after"] = plan["bytes_after"]
+    return totals
+
+async def sweeper_loop():
+    # Startup already reconciled, so the first sweep waits one interval
+    while True:
+        await asyncio.sleep(SWEEP_INTERVAL_SECONDS)
+        try:
+            await io_pool.run(reconcile_storage)
+            result = await run_sweep(plan_sweep, time.time())
+            sweeper_stats["runs"] += 1
+            sweeper_stats["last_run"] = time.time()
+            sweeper_stats["last_result"] = result
+            if any(result.values()):
+                logger.info("Sweeper removed %s", result)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # Includes a busy pool (503); the next run picks up where this one stopped
+            logger.error("Error in storage sweeper: %s", e)
+
+_sweeper_task = None
+
+@app.on_event("startup")
+async def start_sweeper():
+    global _sweeper_task
+    _sweeper_task = asyncio.create_task(sweeper_loop())
+
+@app.on_event("shutdown")
+async def stop_sweeper():
+    if _sweeper_task is not None:
+        _sweeper_task.cancel()
+
+@app.on_event("startup")
+def reconcile_storage_on_startup():
+    try:
+        reconcile_storage()
+    except Exception as e:
+        # A failed reconcile only leaves stale entries behind, the API still works
+        logger.error("Error reconciling storage: %s", e)
+
+_XLSX_NS = {
+    "main": "http://schemas.openxmlformats.org/spreadsheetml/2006/main",
+    "rel": "http://schemas.openxmlformats.org/officeDocument/2006/relationships",
+    "pkg": "http://schemas.openxmlformats.org/package/2006/relationships",
+}
+_DIMENSION_RE = re.compile(rb'<(?:\w+:)?dimension\s+ref="([A-Z]+)(\d+)(?::([A-Z]+)(\d+))?"')
+
+def _column_number(letters: bytes) -> int:
+    number = 0
+    for letter in letters:
+        number = number * 26 + (letter - ord("A") + 1)
+    return number
+
+def xlsx_sheet_parts(archive: zipfile.ZipFile) -> list:
+    """[(sheet name, worksheet part name or None)] in workbook order"""
+    workbook = ET.fromstring(archive.read("xl/workbook.xml"))
+    rels = ET.fromstring(archive.read("xl/_rels/workbook.xml.rels"))
+    targets = {rel.get("Id"): rel.get("Target") for rel in rels.findall("pkg:Relationship", _XLSX_NS)}
+    
+    parts = []
+    for sheet in workbook.findall("main:sheets/main:sheet", _XLSX_NS):
+        target = targets.get(sheet.get(f"{{{_XLSX_NS['rel']}}}id"))
+        part = None
+        if target:
+            part = target.lstrip("/") if target.startswith("/") else posixpath.normpath(posixpath.join("xl", target))
+        parts.append((sheet.get("name"), part))
+    return parts
+
+def probe_xlsx(filepath) -> list:
+    """Read sheet names and used-range sizes from workbook.xml and the worksheet headers, without parsing cells"""
+    with zipfile.ZipFile(filepath) as archive:
+        sheets = []
+        for name, part in xlsx_sheet_parts(archive):
+            info = {"name": name, "rows": None, "columns": None}
+            if part:
+                try:
+                    # <dimension> sits at the top of the worksheet part, so only the head is read
+                    with archive.open(part) as sheet_xml:
+                        match = _DIMENSION_RE.search(sheet_xml.read(PROBE_SAMPLE_BYTES))
+                except KeyError:
+                    match = None
+                if match:
+                    first_col, first_row, last_col, last_row = match.groups()
+                    last_col, last_row = last_col or first_col, last_row or first_row
+                    # First row of the used range is the header, like pandas
+                    info["rows"] = max(int(last_row) - int(first_row), 0)
+                    info["columns"] = _column_number(last_col) - _column_number(first_col) + 1
+            sheets.append(info)
+    
+    if not sheets:
+        raise ValueError("Workbook contains no sheets")
+    return sheets
+
+def probe_csv(filepath) -> list:
+    """Sniff the CSV header and estimate the row count from a sample of the file"""
+    with open(filepath, "rb") as f:
+        sample = f.read(PROBE_SAMPLE_BYTES)
+    return probe_csv_sample(sample, os.path.getsize(filepath))
+
+def probe_csv_sample(sample: bytes, file_size: int) -> list:
+    """probe_csv() for the first PROBE_SAMPLE_BYTES of a file of file_size bytes"""
+    complete = len(sample) >= file_size
+    if not complete:
+        # Drop the trailing partial line so the sample only holds whole rows
+        sample = sample[:sample.rfind(b"\n") + 1] or sample
+    
+    text = sample.decode("utf-8", errors="replace")
+    lines = text.splitlines()
+    if not lines:
+        raise ValueError("CSV file is empty")
+    header = next(csv.reader([lines[0]]))
+    
+    if complete:
+        rows = len(lines) - 1
+    else:
+        # Assume the rest of the file has the same average line length as the sample
+        rows = max(int(file_size / (len(sample) / len(lines))) - 1, 0)
+    
+    return [{"name": "Sheet1", "rows": rows, "columns": len(header), "estimated": not complete}]
+
+_SHARED_STRING_RE = re.compile(rb"<(?:\w+:)?si\b[^>]*>(.*?)</(?:\w+:)?si>", re.S)
+_SHARED_STRING_CELL_RE = re.compile(rb'(<(?:\w+:)?c\b[^>]*?\bt="s"[^>]*>\s*<(?:\w+:)?v>)(\d+)(?=</)')
+_CELL_STYLE_RE = re.compile(rb'(<(?:\w+:)?c\b[^>]*?\s)s="(\d+)"')
+_WORKBOOK_PR_RE = re.compile(rb"<(?:\w+:)?workbookPr\b[^>]*>")
+
+def _xlsx_style_formats(archive: zipfile.ZipFile) -> list:
+    """Number format of each cell style (cellXfs index), the only part of styles.xml parsing depends on"""
+    try:
+        styles = ET.fromstring(archive.read("xl/styles.xml"))
+    except KeyError:
+        return []
+    codes = {fmt.get("numFmtId"): fmt.get("formatCode") for fmt in styles.findall("main:numFmts/main:numFmt", _XLSX_NS)}
+    return [
+        # Built-in formats (dates are ids 14-22 and 45-47) have no numFmt entry; the id stands for them
+        codes.get(xf.get("numFmtId"), f"builtin:{xf.get('numFmtId')}").encode("utf-8")
+        for xf in styles.findall("main:cellXfs/main:xf", _XLSX_NS)
+    ]
+
+@timed("sheet_fingerprint")
+def xlsx_sheet_fingerprints(filepath) -> dict:
+    """{sheet name: hash of everything the sheet's parsed values depend on}, without parsing cells
+
+    Shared-string indexes and style indexes are replaced by the string and the
+    number format they point at before hashing, so edits elsewhere in the
+    workbook that renumber the shared string table or add styles leave the
+    fingerprints of untouched sheets unchanged.
+    """
+    with zipfile.ZipFile(filepath) as archive:
+        try:
+            shared_strings = _SHARED_STRING_RE.findall(archive.read("xl/sharedStrings.xml"))
+        except KeyError:
+            shared_strings = []
+        style_formats = _xlsx_style_formats(archive)
+        workbook_pr = _WORKBOOK_PR_RE.search(archive.read("xl/workbook.xml"))
+        
+        def shared_string(match):
+            index = int(match.group(2))
+            return match.group(1) + (shared_strings[index] if index < len(shared_strings) else match.group(2))
+        
+        def style_format(match):
+            index = int(match.group(2))
+            return match.group(1) + b'fmt="' + (style_formats[index] if index < len(style_formats) else match.group(2)) + b'"'
+        
+        fingerprints = {}
+        for name, part in xlsx_sheet_parts(archive):
+            digest = hashlib.sha256(workbook_pr.group(0) if workbook_pr else b"")
+            try:
+                data = archive.read(part) if part else b""
+            except KeyError:
+                data = b""
+            data = _SHARED_STRING_CELL_RE.sub(shared_string, data)
+            digest.update(_CELL_STYLE_RE.sub(style_format, data))
+            fingerprints[name] = digest.hexdigest()
+    return fingerprints
+
+def build_incremental_cache(previous: dict, file_info: dict):
+    """Build the sheet cache of a new version from the previous version's cache plus the changed sheets
+
+    Unchanged sheets (same fingerprint) are copied, with their profiles, from
+    the previous version's cache; only the others are parsed. Returns
+    {"reused": [...], "reparsed": [...]} sheet names, or None when there is
+    nothing to reuse (not a .xlsx, or the previous version was never parsed).
+    """
+    filepath, cache_key = file_info["filepath"], file_info["content_hash"]
+    if not (zipfile.is_zipfile(previous["filepath"]) and zipfile.is_zipfile(filepath)):
+        return None
+    previous_manifest = read_cache_manifest(previous["content_hash"], previous["filepath"])
+    if previous_manifest is None or read_cache_manifest(cache_key, filepath) is not None:
+        return None
+    
+    previous_fingerprints = xlsx_sheet_fingerprints(previous["filepath"])
+    previous_index = {
+        previous_fingerprints[name]: index
+        for index, name in enumerate(previous_manifest["sheets"])
+        if name in previous_fingerprints
+    }
+    fingerprints = xlsx_sheet_fingerprints(filepath)
+    reused = {
+        name: _cache_sheet_path(previous["content_hash"], previous_index[fingerprint])
+        for name, fingerprint in fingerprints.items()
+        if fingerprint in previous_index
+    }
+    changed = [name for name in fingerprints if name not in reused]
+    
+    parsed = {}
+    if changed:
+        with timed_stage("excel_parse"):
+            parsed = pd.read_excel(filepath, sheet_name=changed)
+    metrics.inc("cache_requests_total", len(reused), cache="sheets", result="reused")
+    
+    with timed_stage("cache_write"):
+        write_cached_sheets(cache_key, filepath, {name: reused.get(name, parsed.get(name)) for name in fingerprints})
+        for index, name in enumerate(fingerprints):
+            previous_profile = _profile_path(reused[name]) if name in reused else None
+            if previous_profile is not None and previous_profile.exists():
+                shutil.copyfile(previous_profile, _profile_path(_cache_sheet_path(cache_key, index)))
+    return {"reused": list(reused), "reparsed": changed}
+
+@timed("sheet_probe")
+def probe_sheets(filepath, filename: str) -> list:
+    """Return [{name, rows, columns}] for an uploaded file without loading it into pandas"""
+    if filename.endswith('.csv'):
+        return probe_csv(filepath)
+    if zipfile.is_zipfile(filepath):
+        try:
+            return probe_xlsx(filepath)
+        except (KeyError, ET.ParseError) as e:
+            logger.warning("Workbook probe failed, falling back to pandas: %s", e)
+    # Legacy .xls (or an unusual package layout): only the names are available cheaply
+    excel_file = pd.ExcelFile(filepath)
+    return [{"name": name, "rows": None, "columns": None} for name in excel_file.sheet_names]
+
+ALLOWED_UPLOAD_TYPES = [
+    "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",  # .xlsx
+    "application/vnd.ms-excel",  # .xls
+    "text/csv"  # .csv
+]
+
+async def register_upload(file_id: str, filename: str, content_type: str, content_hash: str,
+                          file_path: Path, sheet_info: list, replaces: str = None, claim: str = None) -> dict:
+    """Store the record of a stored and probed upload, returning the upload response body
+
+    With replaces, the record becomes the next version of that file id. The
+    claim from claim_content is dropped once the record holds the reference.
+    """
+    sheets = [info["name"] for info in sheet_info]
+    file_info = {
+        "filename": filename,
+        "filepath": str(file_path),
+        "sheets": sheets,
+        "sheet_info": sheet_info,
+        "content_type": content_type,
+        "content_hash": content_hash,
+        "uploaded_at": time.time(),
+        "version": 1
+    }
+    
+    previous = file_storage.get(replaces) if replaces is not None else None
+    incremental = None
+    if previous is not None:
+        file_info["version"] = previous.get("version", 1) + 1
+        if previous["content_hash"] != content_hash:
+            try:
+                incremental = await cpu_pool.run(build_incremental_cache, previous, file_info)
+            except Exception as e:
+                # Including a busy pool (503) or a timeout (504): the bytes are stored
+                # either way, and the new version is parsed in full on first use instead
+                logger.warning("Incremental cache build failed for %s: %s", file_id, getattr(e, "detail", e))
+    
+    with file_storage.transaction():
+        file_storage[file_id] = file_info
+        if claim is not None:
+            file_storage.pop_record("pending_upload", claim)
+    if previous is not None and previous["content_hash"] != content_hash:
+        release_content(previous)
+    
+    content = {
+        "fileId": file_id,
+        "filename": filename,
+        "sheets": sheets,
+        "sheetInfo": sheet_info,
+        "contentHash": content_hash,
+        "version": file_info["version"],
+        "message": "File uploaded successfully"
+    }
+    if incremental is not None:
+        content["reusedSheets"] = incremental["reused"]
+        content["reparsedSheets"] = incremental["reparsed"]
+    return content
+
+@app.post("/api/upload")
+async def upload_file(file: UploadFile = File(...), replaces: Optional[str] = None):
+    """Upload and process Excel file
+
+    With ?replaces={file_id} the upload becomes the next version of that file:
+    the id stays the same, and for a .xlsx whose previous version was already
+    parsed only the sheets that changed are parsed again.
+    """
+    try:
+        if replaces is not None and replaces not in file_storage:
+            raise HTTPException(status_code=404, detail="File to replace not found")
+        
+        # Validate file type
+        if file.content_type not in ALLOWED_UPLOAD_TYPES:
+            raise HTTPException(status_code=400, detail="Invalid file type. Please upload Excel or CSV files only.")
+        
+        # Generate unique file ID (a new version keeps the old one)
+        file_id = replaces or str(uuid.uuid4())
+        
+        # Save file to disk, shared with any earlier upload of the same bytes
+        content_hash, file_path, claim = await io_pool.run(store_upload, file.file, Path(file.filename).suffix.lower())
+        
+        try:
+            # Probe sheet names and sizes without parsing the cells
+            try:
+                sheet_info = await cpu_pool.run(probe_sheets, file_path, file.filename)
+            except HTTPException:
+                raise
+            except Exception as e:
+                raise HTTPException(status_code=400, detail=f"Error reading Excel file: {str(e)}")
+            
+            # Store file metadata
+            return JSONResponse(content=await register_upload(
+                file_id, file.filename, file.content_type, content_hash, file_path, sheet_info, replaces, claim
+            ))
+        except BaseException:
+            # Clean up the file (unless another upload still uses it), also when the client went away
+            abandon_content(content_hash, file_path, claim)
+            raise
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
+
+# Resumable uploads in progress are upload_session records in the metadata store,
+# so any worker can take the next chunk or the completion. What only helps the
+# worker that happens to hold it stays here: the running digest of the bytes
+# received so far (re-hashed from disk when missing) and the early sheet probe.
+_upload_digests = {}
+_upload_probes = {}
+
+def active_upload_parts() -> set:
+    """Names of the partial files of resumable uploads still in progress"""
+    return {Path(session["part_path"]).name for _, session in file_storage.records("upload_session")}
+
+def expire_upload_sessions():
+    """Drop resumable uploads that have been idle longer than RECONCILE_GRACE_SECONDS"""
+    now = time.time()
+    sessions = file_storage.records("upload_session")
+    for upload_id, session in sessions:
+        if now - session["updated_at"] > RECONCILE_GRACE_SECONDS and session["writer_until"] < now:
+            discard_upload_session(upload_id)
+    
+    # Forget local state of uploads another worker finished or dropped
+    live = {upload_id for upload_id, _ in sessions}
+    for upload_id in set(_upload_digests) | set(_upload_probes):
+        if upload_id not in live:
+            forget_upload_session(upload_id)
+
+def forget_upload_session(upload_id: str):
+    _upload_digests.pop(upload_id, None)
+    task = _upload_probes.pop(upload_id, None)
+    if task is not None:
+        task.cancel()
+
+def discard_upload_session(upload_id: str):
+    forget_upload_session(upload_id)
+    session = file_storage.pop_record("upload_session", upload_id)
+    if session is not None:
+        delete_path(session["part_path"])
+        if session.get("claim") is not None:
+            abandon_content(session["content_hash"], Path(session["filepath"]), session["claim"])
+
+def get_upload_session(upload_id: str) -> dict:
+    expire_upload_sessions()
+    session = file_storage.get_record("upload_session", upload_id)
+    if session is None:
+        forget_upload_session(upload_id)
+        raise HTTPException(status_code=404, detail="Upload not found or expired")
+    return session
+
+def claim_upload_session(upload_id: str, offset: int = None):
+    """Take the write lease of a resumable upload, returning (session, token)
+
+    One request at a time writes to an upload, whichever worker it reaches;
+    with offset, the lease is only granted if that is where the next chunk goes.
+    The lease lapses after RESUMABLE_WRITE_LEASE_SECONDS in case its holder died.
+    """
+    token = uuid.uuid4().hex
+    now = time.time()
+    
+    def claim(session: dict):
+        if session["writer"] is not None and session["writer_until"] > now:
+            raise HTTPException(status_code=409, detail="Another request is writing to this upload")
+        if offset is not None and offset != session["received"]:
+            raise HTTPException(
+                status_code=409,
+                detail=f"Expected a chunk at offset {session['received']}",
+                headers={"Upload-Offset": str(session["received"])}
+            )
+        session["writer"] = token
+        session["writer_until"] = now + RESUMABLE_WRITE_LEASE_SECONDS
+    
+    session = file_storage.update_record("upload_session", upload_id, claim)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Upload not found or expired")
+    return session, token
+
+def update_upload_session(upload_id: str, token: str, release: bool = False, **changes) -> Optional[dict]:
+    """Apply changes to an upload while holding its lease; None if the upload or the lease is gone"""
+    held = []
+    
+    def update(session: dict):
+        if session["writer"] == token:
+            held.append(True)
+            session.update(changes)
+            if release:
+                session["writer"] = None
+                session["writer_until"] = 0
+    
+    session = file_storage.update_record("upload_session", upload_id, update)
+    return session if held else None
+
+def upload_session_status(session: dict) -> dict:
+    return {
+        "uploadId": session["id"],
+        "filename": session["filename"],
+        "size": session["size"],
+        "offset": session["received"],
+        "chunkSize": session["chunk_size"],
+        "complete": session["received"] == session["size"],
+        "uploadUrl": f"/api/uploads/{session['id']}",
+        "completeUrl": f"/api/uploads/{session['id']}/complete"
+    }
+
+@timed("upload_write")
+def write_upload_chunk(session: dict, offset: int, data: bytes, checksum: str):
+    """Verify a chunk against its SHA-256 and write it in place at offset
+
+    The running whole-file digest is only advanced once the chunk is on disk,
+    so a failed write can simply be retried from the same offset. A worker
+    that missed earlier chunks keeps no digest; /complete hashes the file then.
+    """
+    if hashlib.sha256(data).hexdigest() != checksum.lower():
+        raise HTTPException(status_code=400, detail="Chunk checksum mismatch")
+    with open(session["part_path"], "r+b") as f:
+        f.seek(offset)
+        f.write(data)
+        f.truncate()
+    received, digest = _upload_digests.pop(session["id"], (0, hashlib.sha256()))
+    if received == offset:
+        digest.update(data)
+        _upload_digests[session["id"]] = (offset + len(data), digest)
+
+@timed("upload_hash")
+def hash_file(file_path) -> str:
+    """SHA-256 of a file on disk, read in UPLOAD_CHUNK_SIZE pieces"""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        while True:
+            chunk = f.read(UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def start_upload_probe(session: dict):
+    """Probe the sheets as soon as enough of the file is in: the head of a CSV, the whole of a workbook"""
+    upload_id = session["id"]
+    if upload_id in _upload_probes:
+        return
+    if session["suffix"] == ".csv":
+        if session["received"] < min(PROBE_SAMPLE_BYTES, session["size"]):
+            return
+        with open(session["part_path"], "rb") as f:
+            sample = f.read(PROBE_SAMPLE_BYTES)
+        task = asyncio.ensure_future(cpu_pool.run(probe_csv_sample, sample, session["size"]))
+    elif session["received"] == session["size"]:
+        # The zip directory is at the end, so workbooks are probed when the last chunk lands
+        task = asyncio.ensure_future(cpu_pool.run(probe_sheets, Path(session["part_path"]), session["filename"]))
+    else:
+        return
+    # Failures are reported by /complete; don't let an unawaited task log them meanwhile
+    task.add_done_callback(lambda task: task.cancelled() or task.exception())
+    _upload_probes[upload_id] = task
+
+@app.post("/api/uploads")
+async def create_resumable_upload(data: dict):
+    """Start a resumable upload
+
+    Body: filename, size, contentType and optionally replaces (see /api/upload).
+    Chunks are then sent with PUT /api/uploads/{upload_id}?offset=N, each with
+    its SHA-256 in an X-Chunk-SHA256 header, and the upload is finished with
+    POST /api/uploads/{upload_id}/complete.
+    """
+    try:
+        filename = data.get("filename")
+        content_type = data.get("contentType")
+        size = data.get("size")
+        replaces = data.get("replaces")
+        if not filename:
+            raise HTTPException(status_code=400, detail="filename is required")
+        if content_type not in ALLOWED_UPLOAD_TYPES:
+            raise HTTPException(status_code=400, detail="Invalid file type. Please upload Excel or CSV files only.")
+        if not isinstance(size, int) or size <= 0:
+            raise HTTPException(status_code=400, detail="size must be a positive number of bytes")
+        if replaces is not None and replaces not in file_storage:
+            raise HTTPException(status_code=404, detail="File to replace not found")
+        
+        expire_upload_sessions()
+        upload_id = str(uuid.uuid4())
+        # Written in place: the finished file is renamed to its content address, never copied.
+        # The leading dot keeps the sweeper off it while it is in progress
+        part_path = UPLOAD_DIR / f".{upload_id}.part"
+        part_path.touch()
+        session = {
+            "id": upload_id,
+            "filename": filename,
+            "suffix": Path(filename).suffix.lower(),
+            "content_type": content_type,
+            "size": size,
+            "replaces": replaces,
+            "chunk_size": min(RESUMABLE_CHUNK_SIZE, RESUMABLE_MAX_CHUNK_SIZE),
+            "part_path": str(part_path),
+            "received": 0,
+            "writer": None,
+            "writer_until": 0,
+            "created_at": time.time(),
+            "updated_at": time.time()
+        }
+        file_storage.put_record("upload_session", upload_id, session)
+        _upload_digests[upload_id] = (0, hashlib.sha256())
+        return JSONResponse(status_code=201, content=upload_session_status(session))
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
+
+@app.get("/api/uploads/{upload_id}")
+async def get_resumable_upload(upload_id: str):
+    """Progress of a resumable upload; offset is where the next chunk must start"""
+    return JSONResponse(content=upload_session_status(get_upload_session(upload_id)))
+
+@app.put("/api/uploads/{upload_id}")
+async def put_upload_chunk(upload_id: str, request: Request, offset: int = Query(..., ge=0)):
+    """Write one chunk of a resumable upload at offset
+
+    Chunks must arrive in order: a chunk that does not start at the current
+    offset is rejected with 409 and the offset to resume from.
+    """
+    get_upload_session(upload_id)
+    checksum = request.headers.get("x-chunk-sha256")
+    if not checksum:
+        raise HTTPException(status_code=400, detail="X-Chunk-SHA256 header is required")
+    
+    session, token = claim_upload_session(upload_id, offset)
+    try:
+        body = bytearray()
+        async for piece in request.stream():
+            body += piece
+            if len(body) > RESUMABLE_MAX_CHUNK_SIZE:
+                raise HTTPException(status_code=413, detail=f"Chunks are limited to {RESUMABLE_MAX_CHUNK_SIZE} bytes")
+        if not body:
+            raise HTTPException(status_code=400, detail="Empty chunk")
+        if offset + len(body) > session["size"]:
+            raise HTTPException(status_code=400, detail="Chunk runs past the declared file size")
+        
+        await io_pool.run(write_upload_chunk, session, offset, bytes(body), checksum)
+    except BaseException:
+        update_upload_session(upload_id, token, release=True)
+        raise
+    
+    session = update_upload_session(
+        upload_id, token, release=True, received=offset + len(body), updated_at=time.time()
+    )
+    if session is None:
+        raise HTTPException(status_code=409, detail="The upload was taken over or dropped while this chunk was written")
+    start_upload_probe(session)
+    return JSONResponse(content=upload_session_status(session), headers={"Upload-Offset": str(session["received"])})
+
+@app.post("/api/uploads/{upload_id}/complete")
+async def complete_resumable_upload(upload_id: str, data: Optional[dict] = None):
+    """Finish a resumable upload and register it like POST /api/upload would
+
+    The content hash was computed as chunks arrived and the sheets were probed
+    meanwhile, so this is usually a rename plus a metadata write. An optional
+    sha256 in the body is checked against the whole file. The upload stays
+    open until it is registered, so a completion that failed with 503/504 can
+    be retried.
+    """
+    get_upload_session(upload_id)
+    session, token = claim_upload_session(upload_id)
+    try:
+        if session["received"] != session["size"]:
+            raise HTTPException(
+                status_code=409,
+                detail=f"Upload is incomplete: {session['received']} of {session['size']} bytes received",
+                headers={"Upload-Offset": str(session["received"])}
+            )
+        replaces = session["replaces"]
+        if replaces is not None and replaces not in file_storage:
+            raise HTTPException(status_code=404, detail="File to replace not found")
+        
+        if session.get("claim") is None:
+            received, digest = _upload_digests.get(upload_id, (None, None))
+            if received == session["size"]:
+                content_hash = digest.hexdigest()
+            else:
+                # The chunks went to other workers
+                content_hash = await io_pool.run(hash_file, session["part_path"])
+            expected = (data or {}).get("sha256")
+            if expected and expected.lower() != content_hash:
+                discard_upload_session(upload_id)
+                raise HTTPException(status_code=400, detail="File checksum mismatch, the upload has been discarded")
+            
+            try:
+                start_upload_probe(session)
+                sheet_info = await _upload_probes[upload_id]
+            except HTTPException:
+                # Busy or timed out: probe again on the next attempt
+                _upload_probes.pop(upload_id, None)
+                raise
+            except Exception as e:
+                discard_upload_session(upload_id)
+                raise HTTPException(status_code=400, detail=f"Error reading Excel file: {str(e)}")
+            
+            # Move the bytes to their content address once, pinned by the claim
+            # until the record exists; a retry goes straight to registering
+            file_path, claim = await io_pool.run(claim_content, Path(session["part_path"]), content_hash, session["suffix"])
+            session = update_upload_session(
+                upload_id, token, content_hash=content_hash, filepath=str(file_path), claim=claim, sheet_info=sheet_info
+            )
+            if session is None:
+                abandon_content(content_hash, file_path, claim)
+                raise HTTPException(status_code=409, detail="The upload was taken over or dropped while it was completed")
+        else:
+            expected = (data or {}).get("sha256")
+            if expected and expected.lower() != session["content_hash"]:
+                discard_upload_session(upload_id)
+                raise HTTPException(status_code=400, detail="File checksum mismatch, the upload has been discarded")
+        
+        content = await register_upload(
+            replaces or str(uuid.uuid4()), session["filename"], session["content_type"],
+            session["content_hash"], Path(session["filepath"]), session["sheet_info"], replaces, session["claim"]
+        )
+        file_storage.pop_record("upload_session", upload_id)
+        forget_upload_session(upload_id)
+        return JSONResponse(content=content)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
+    finally:
+        update_upload_session(upload_id, token, release=True)
+
+@app.delete("/api/uploads/{upload_id}")
+async def cancel_resumable_upload(upload_id: str):
+    """Abandon a resumable upload and delete what was received"""
+    get_upload_session(upload_id)
+    discard_upload_session(upload_id)
+    return JSONResponse(content={"message": "Upload cancelled"})
+
+# Media types /api/files/{file_id}/data can answer with, by format name
+DATA_MEDIA_TYPES = {
+    "json": "application/json",
+    "columns": "application/vnd.excelppt.columns+json",
+    "msgpack": "application/msgpack",
+    "arrow": "application/vnd.apache.arrow.stream",
+}
+DATA_FORMAT_ALIASES = {"application/x-msgpack": "msgpack", "application/vnd.msgpack": "msgpack"}
+# String columns with at most this many distinct values per row are sent dictionary-encoded
+DATA_DICTIONARY_MAX_RATIO = 0.5
+# Buffer compression of the Arrow IPC stream (None to send it uncompressed)
+DATA_ARROW_COMPRESSION = os.environ.get("DATA_ARROW_COMPRESSION", "zstd") or None
+
+def negotiate_data_format(accept: str) -> Optional[str]:
+    """Pick the format for an Accept header: highest q wins, ties go to the listed order
+
+    A missing header or */* means the legacy row-oriented JSON; None means
+    nothing acceptable is offered.
+    """
+    if not accept or not accept.strip():
+        return "json"
+    by_media_type = {media_type: name for name, media_type in DATA_MEDIA_TYPES.items()}
+    by_media_type.update(DATA_FORMAT_ALIASES)
+    
+    candidates = []
+    for index, part in enumerate(accept.split(",")):
+        media_type, *params = [item.strip() for item in part.split(";")]
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        media_type = media_type.lower()
+        if media_type in ("*/*", "application/*"):
+            fmt = "json"
+        else:
+            fmt = by_media_type.get(media_type)
+        if fmt and quality > 0:
+            candidates.append((-quality, index, fmt))
+    return min(candidates)[2] if candidates else None
+
+def _wire_column(column, numpy_ok: bool):
+    """Values of one Arrow column for the columnar formats, keeping numbers as numbers"""
+    arrow_type = column.type
+    if pa.types.is_timestamp(arrow_type) or pa.types.is_date(arrow_type):
+        if pa.types.is_timestamp(arrow_type):
+            # Whole seconds, so the text matches the row-oriented JSON ("2024-01-31 08:00:00")
+            column = column.cast(pa.timestamp("s", arrow_type.tz), safe=False)
+        # A plain cast is an order of magnitude faster than pc.strftime
+        return column.cast(pa.string()).to_pylist()
+    if numpy_ok:
+        # orjson writes NaN as null, so float columns can go as arrays even with gaps
+        if pa.types.is_floating(arrow_type):
+            return column.to_numpy()
+        if (pa.types.is_integer(arrow_type) or pa.types.is_boolean(arrow_type)) and column.null_count == 0:
+            return column.to_numpy()
+    return column.to_pylist()
+
+def _is_repeated_strings(column) -> bool:
+    if not (pa.types.is_string(column.type) or pa.types.is_large_string(column.type)) or len(column) == 0:
+        return False
+    return pa_compute.count_distinct(column).as_py() <= len(column) * DATA_DICTIONARY_MAX_RATIO
+
+def _wire_sheet(table: pa.Table, numpy_ok: bool) -> dict:
+    """One sheet for the columnar formats; mixed columns get their numbers back like in the JSON rows"""
+    mixed = mixed_cells(table.schema)
+    types = []
+    data = []
+    for field, column in zip(table.schema, table.columns):
+        if field.name in mixed:
+            values = column.to_pylist()
+            restore_mixed_values(values, mixed[field.name])
+            types.append("mixed")
+            data.append(values)
+        elif _is_repeated_strings(column):
+            encoded = pa_compute.dictionary_encode(column.combine_chunks())
+            indices = encoded.indices
+            types.append(_profile_type(field.type))
+            data.append({
+                "dictionary": encoded.dictionary.to_pylist(),
+                "indices": indices.to_numpy(zero_copy_only=False) if numpy_ok and indices.null_count == 0 else indices.to_pylist()
+            })
+        else:
+            types.append(_profile_type(field.type))
+            data.append(_wire_column(column, numpy_ok))
+    return {"columns": table.column_names, "types": types, "rowCount": table.num_rows, "data": data}
+
+def encode_sheet_data(file_info: dict, file_id: str, fmt: str, sheet: str = None) -> tuple:
+    """Serialize sheets from the sheet cache in a columnar format, returning (body, mixed columns sent as text)"""
+    names = [sheet] if sheet is not None else list(file_info["sheets"])
+    if fmt == "arrow":
+        sheet_name, sheet_path = cached_sheet_path(file_info, names[0])
+        table = pq.read_table(sheet_path).combine_chunks()
+        mixed = mixed_cells(table.schema)
+        with timed_stage("arrow_serialization"):
+            columns = [
+                pa_compute.dictionary_encode(column) if _is_repeated_strings(column) else column
+                for column in table.columns
+            ]
+            metadata = {
+                "fileId": file_id,
+                "filename": file_info["filename"],
+                "sheet": sheet_name,
+                "sheets": json.dumps(list(file_info["sheets"]))
+            }
+            if mixed:
+                metadata["mixedCells"] = json.dumps(mixed)
+            table = pa.table(columns, names=table.column_names, metadata=metadata)
+            options = pa_ipc.IpcWriteOptions(compression=DATA_ARROW_COMPRESSION)
+            sink = pa.BufferOutputStream()
+            with pa_ipc.new_stream(sink, table.schema, options=options) as writer:
+                writer.write_table(table)
+            return sink.getvalue().to_pybytes(), list(mixed)
+    
+    tables = {}
+    for name in names:
+        sheet_name, sheet_path = cached_sheet_path(file_info, name)
+        tables[sheet_name] = pq.read_table(sheet_path)
+    
+    with timed_stage(f"{fmt}_serialization"):
+        sheets = {sheet_name: _wire_sheet(table, fmt == "columns") for sheet_name, table in tables.items()}
+        payload = {"fileId": file_id, "filename": file_info["filename"], "sheets": sheets}
+        if fmt == "msgpack":
+            return msgpack.packb(payload, use_bin_type=True, default=str), []
+        return orjson.dumps(payload, option=orjson.OPT_SERIALIZE_NUMPY, default=str), []
+
+@app.get("/api/files/{file_id}/data")
+async def get_file_data(file_id: str, request: Request, sheet: Optional[str] = None, format: Optional[str] = None):
+    """Get Excel file data for processing
+
+    The format follows the Accept header (see DATA_MEDIA_TYPES) or ?format=:
+    json (rows, the default), columns (column-oriented JSON) or msgpack, both
+    {fileId, filename, sheets: {name: {columns, types, rowCount, data}}}
+    with one entry per column in data, or arrow (a compressed Arrow IPC
+    stream of one sheet). The columnar formats keep numbers as numbers and
+    empty cells as null, and send string columns with many repeats
+    dictionary-encoded ({dictionary, indices} in the JSON formats). Arrow
+    cannot hold mixed-type columns, so it sends them as text, names them in
+    X-Mixed-Columns-As-Text and keeps their cell type codes in the schema
+    metadata under "mixedCells".
+    """
+    if file_id not in file_storage:
+        raise HTTPException(status_code=404, detail="File not found")
+    
+    fmt = format or negotiate_data_format(request.headers.get("accept"))
+    if fmt not in DATA_MEDIA_TYPES:
+        raise HTTPException(
+            status_code=406,
+            detail=f"Supported formats: {', '.join(DATA_MEDIA_TYPES.values())}"
+        )
+    
+    try:
+        file_info = file_storage[file_id]
+        if sheet is not None and sheet not in file_info["sheets"]:
+            raise HTTPException(status_code=404, detail=f"Sheet not found: {sheet}")
+        
+        if fmt != "json":
+            body, text_columns = await cpu_pool.run(encode_sheet_data, file_info, file_id, fmt, sheet)
+            headers = {"Vary": "Accept"}
+            if text_columns:
+                # Percent-encoded, comma-separated: column names need not be valid header text
+                headers["X-Mixed-Columns-As-Text"] = ",".join(quote(str(col), safe="") for col in text_columns)
+            return Response(content=body, media_type=DATA_MEDIA_TYPES[fmt], headers=headers)
+        
+        # Read all sheets from Excel file (parsed once, then cached)
+        sheets_data = await cpu_pool.run(read_sheets_data, file_info)
+        if sheet is not None:
+            sheets_data = {sheet: sheets_data[sheet]}
+        
+        # JSONResponse encodes the body when it is built
+        with timed_stage("json_serialization"):
+            return JSONResponse(content={
+                "fileId": file_id,
+                "filename": file_info["filename"],
+                "sheets": sheets_data
+            }, headers={"Vary": "Accept"})
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error reading file data: {str(e)}")
+
+@app.get("/api/files/{file_id}/rows")
+async def stream_sheet_rows(
+    file_id: str,
+    sheet: Optional[str] = None,
+    offset: int = Query(0, ge=0),
+    limit: Optional[int] = Query(None, ge=0),
+    columns: Optional[List[str]] = Query(None),
+):
+    """Stream a window of one sheet's rows as NDJSON (header line first, then one JSON array per row)"""
+    if file_id not in file_storage:
+        raise HTTPException(status_code=404, detail="File not found")
+    
+    try:
+        file_info = file_storage[file_id]
+        filepath = file_info["filepath"]
+        cache_key = file_info["content_hash"]
+        
+        # Make sure the sheet cache exists; rows are streamed from it, never from the workbook
+        manifest = read_cache_manifest(cache_key, filepath)
+        if manifest is None:
+            await cpu_pool.run(build_sheet_cache, file_info)
+            manifest = read_cache_manifest(cache_key, filepath)
+        if manifest is None:
+            raise HTTPException(status_code=500, detail="Sheet cache is unavailable")
+        
+        sheet_names = manifest["sheets"]
+        if sheet is None:
+            sheet = sheet_names[0]
+        if sheet not in sheet_names:
+            raise HTTPException(status_code=404, detail=f"Sheet not found: {sheet}")
+        
+        sheet_path = _cache_sheet_path(cache_key, sheet_names.index(sheet))
+        parquet_file = pq.ParquetFile(sheet_path)
+        available_columns = parquet_file.schema_arrow.names
+        if columns:
+            unknown = [col for col in columns if col not in available_columns]
+            if unknown:
+                raise HTTPException(status_code=400, detail=f"Unknown columns: {', '.join(unknown)}")
+        total_rows = parquet_file.metadata.num_rows
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error reading file data: {str(e)}")
+    
+    def generate():
+        yield json.dumps({
+            "fileId": file_id,
+            "sheet": sheet,
+            "columns": columns or available_columns,
+            "offset": offset,
+            "totalRows": total_rows
+        }) + "\n"
+        
+        lines = []
+        for row in iter_sheet_rows(sheet_path, columns, offset, limit):
+            lines.append(json.dumps(row, default=str))
+            if len(lines) >= STREAM_BATCH_SIZE:
+                yield "\n".join(lines) + "\n"
+                lines = []
+        if lines:
+            yield "\n".join(lines) + "\n"
+    
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
+
+# Exact profiles being computed in the background, by sheet Parquet path
+_profile_tasks = {}
+
+@app.get("/api/files/{file_id}/profile")
+async def get_sheet_profile(file_id: str, sheet: Optional[str] = None, exact: bool = False):
+    """Column names, types, null counts, min/max and sample rows of one sheet
+
+    Large sheets answer at once with a profile of their first rows
+    ("exact": false) while the exact profile is computed in the background;
+    later calls return the exact one. exact=true waits for it instead.
+    """
+    if file_id not in file_storage:
+        raise HTTPException(status_code=404, detail="File not found")
+    
+    try:
+        file_info = file_storage[file_id]
+        try:
+            sheet, sheet_path = await cpu_pool.run(cached_sheet_path, file_info, sheet)
+        except KeyError:
+            raise HTTPException(status_code=404, detail=f"Sheet not found: {sheet}")
+        
+        profile = read_sheet_profile(sheet_path)
+        metrics.inc("cache_requests_total", cache="profiles", result="miss" if profile is None else "hit")
+        if profile is None:
+            key = str(sheet_path)
+            task = _profile_tasks.get(key)
+            if task is None:
+                task = asyncio.ensure_future(cpu_pool.run(write_sheet_profile, sheet_path, timeout=JOB_TIMEOUT))
+                _profile_tasks[key] = task
+                
+                def forget(done):
+                    _profile_tasks.pop(key, None)
+                    if not done.cancelled() and done.exception() is not None:
+                        logger.error("Error computing profile for %s: %s", key, done.exception())
+                task.add_done_callback(forget)
+            
+            if exact or pq.ParquetFile(sheet_path).metadata.num_rows <= PROFILE_SAMPLE_ROWS:
+                # shield: a client that gives up should not cancel the shared computation
+                profile = await asyncio.shield(task)
+            else:
+                profile = await cpu_pool.run(profile_sheet, sheet_path, PROFILE_SAMPLE_ROWS)
+        
+        return JSONResponse(content={"fileId": file_id, "sheet": sheet, **profile})
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.exception("Error profiling sheet: %s", e)
+        raise HTTPException(status_code=500, detail=f"Error profiling sheet: {str(e)}")
+
+# Background purges started by clear-all, kept referenced until they finish
+_purge_tasks = set()
+
+@app.delete("/api/clear-all")
+async def clear_all_uploads():
+    """Forget all uploaded files and previews; the files themselves are deleted in the background"""
+    try:
+        cutoff = time.time()
+        
+        # Records and the preview index go first, so nothing can reference the files any more
+        records_cleared = len(file_storage)
+        await io_pool.run(file_storage.clear)
+        preview_cache.clear()
+        logger.info("Cleared file_storage")
+        
+        # Deleting can take a while (and retries locked files on Windows), so it runs on the
+        # IO pool in batches; files written after this request are left alone
+        task = asyncio.create_task(run_sweep(plan_purge, cutoff))
+        _purge_tasks.add(task)
+        task.add_done_callback(_purge_tasks.discard)
+        
+        return JSONResponse(content={
+            "message": "All files cleared; uploads, previews, images and cache are being removed in the background",
+            "records_cleared": records_cleared,
+            "directories_cleaned": ["uploads", "previews", "images", "cache"]
+        })
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.exception("Error clearing all files: %s", e)
+        raise HTTPException(status_code=500, detail=f"Error clearing all files: {str(e)}")
+
+@app.delete("/api/upload/{file_id}")
+def delete_file(file_id: str):
+    """Delete uploaded file"""
+    logger.info("DELETE request for file_id: %s", file_id)
+    
+    try:
+        if not remove_file_record(file_id):
+            logger.info("File not found in storage: %s", file_id)
+            raise HTTPException(status_code=404, detail="File not found in storage")
+        
+        logger.info("File removed from storage: %s", file_id)
+        return JSONResponse(content={"message": "File deleted successfully"})
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.exception("Error deleting file: %s", e)
+        raise HTTPException(status_code=500, detail=f"Error deleting file: {str(e)}")
+
+@app.get("/api/storage")
+async def get_storage_status():
+    """Storage quota, TTLs and the outcome of the last background sweep"""
+    return JSONResponse(content={
+        "quotaBytes": STORAGE_QUOTA_BYTES,
+        "ttlSeconds": STORAGE_TTL_SECONDS,
+        "sweepIntervalSeconds": SWEEP_INTERVAL_SECONDS,
+        "bytesUsed": sweeper_stats["bytes_after"],
+        "sweeps": sweeper_stats["runs"],
+        "lastSweepAt": sweeper_stats["last_run"],
+        "lastSweep": sweeper_stats["last_result"]
+    })
+
+
+# Preview image geometry (pixels) and encoder settings
+PREVIEW_IMAGE_SIZE = (1280, 720)
+PREVIEW_THUMBNAIL_SIZE = (320, 180)
+# zlib level 1 keeps PNG encoding in the low milliseconds at a small size cost
+PREVIEW_PNG_COMPRESS_LEVEL = 1
+# Rows per independently compressed PNG band; unchanged bands reuse the background's bytes
+PREVIEW_PNG_BAND_ROWS = 16
+PREVIEW_WEBP_QUALITY = 80
+
+# The slide background embedded in decks is downsampled to this many pixels per
+# slide inch (never upscaled) and, when opaque, stored as JPEG at this quality;
+# a quality of 100 keeps it lossless PNG
+BACKGROUND_ASSET_DPI = int(os.environ.get("BACKGROUND_ASSET_DPI", 150))
+BACKGROUND_ASSET_QUALITY = int(os.environ.get("BACKGROUND_ASSET_QUALITY", 85))
+SLIDE_SIZE_INCHES = (13.33, 7.5)
+# Words whose rendered widths are remembered per font before the memo is reset
+WORD_WIDTH_CACHE_SIZE = 20_000
+
+_ADLER_BASE = 65521
+
+def _adler32_combine(adler1: int, adler2: int, length2: int) -> int:
+    """Adler-32 of A+B from the checksums of A and B (zlib's adler32_combine)"""
+    remainder = length2 % _ADLER_BASE
+    sum1 = adler1 & 0xffff
+    sum2 = (remainder * sum1) % _ADLER_BASE
+    sum1 = (sum1 + (adler2 & 0xffff) + _ADLER_BASE - 1) % _ADLER_BASE
+    sum2 = (sum2 + (adler1 >> 16) + (adler2 >> 16) + _ADLER_BASE - remainder) % _ADLER_BASE
+    return sum1 | (sum2 << 16)
+
+def _png_chunk(chunk_type: bytes, data: bytes) -> bytes:
+    return struct.pack(">I", len(data)) + chunk_type + data + struct.pack(">I", zlib.crc32(chunk_type + data))
+
+class BandedPngEncoder:
+    """RGB PNG encoder that only recompresses the row bands that differ from a base image
+
+    Each band of rows is Sub-filtered (no dependency on the row above) and
+    deflated on its own with a full flush, so compressed bands can be
+    concatenated into one valid zlib stream and the base image's bands are
+    reused as-is. A preview only touches the bands its text crosses.
+    """
+    
+    def __init__(self, base: Image.Image, band_rows: int = PREVIEW_PNG_BAND_ROWS):
+        self.size = base.size
+        self.band_rows = band_rows
+        self.base = np.asarray(base.convert("RGB"))
+        self.bands = [self._encode_band(self.base[top:top + band_rows]) for top in range(0, self.size[1], band_rows)]
+    
+    @staticmethod
+    def _encode_band(rows: np.ndarray) -> tuple:
+        # Sub filter: each byte minus the same channel of the pixel to its left
+        filtered = rows.astype(np.uint8, copy=True)
+        filtered[:, 1:] -= rows[:, :-1]
+        raw = np.concatenate([np.ones((rows.shape[0], 1), dtype=np.uint8), filtered.reshape(rows.shape[0], -1)], axis=1).tobytes()
+        compressor = zlib.compressobj(PREVIEW_PNG_COMPRESS_LEVEL, zlib.DEFLATED, -15)
+        data = compressor.compress(raw) + compressor.flush(zlib.Z_FULL_FLUSH)
+        return data, zlib.adler32(raw), len(raw)
+    
+    def encode(self, img: Image.Image) -> bytes:
+        pixels = np.asarray(img if img.mode == "RGB" else img.convert("RGB"))
+        if pixels.shape != self.base.shape:
+            raise ValueError("Image size differs from the encoder's base image")
+        
+        stream = [b"\x78\x01"]  # zlib header, fastest-compression flag
+        adler = 1
+        for index, top in enumerate(range(0, self.size[1], self.band_rows)):
+            rows = pixels[top:top + self.band_rows]
+            if np.array_equal(rows, self.base[top:top + self.band_rows]):
+                data, band_adler, length = self.bands[index]
+            else:
+                data, band_adler, length = self._encode_band(rows)
+            stream.append(data)
+            adler = _adler32_combine(adler, band_adler, length)
+        stream.append(b"\x03\x00")  # Empty final block ends the deflate stream
+        stream.append(struct.pack(">I", adler))
+        
+        width, height = self.size
+        return b"".join([
+            b"\x89PNG\r\n\x1a\n",
+            _png_chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)),
+            _png_chunk(b"IDAT", b"".join(stream)),
+            _png_chunk(b"IEND", b"")
+        ])
+
+class PreviewRasterizer:
+    """Draws the title-slide preview with everything but the text prepared up front
+
+    The background is decoded and resized once, fonts are loaded once, and
+    word widths are measured once per font, so wrapping a line is a sum of
+    cached widths instead of measuring an ever-growing prefix.
+    """
+    
+    def __init__(self):
+        width, height = PREVIEW_IMAGE_SIZE
+        background_path = Path("FirstPage.png")
+        self.source = _source_signature(background_path) if background_path.exists() else None
+        
+        # Load FirstPage.png as the base image
+        if background_path.exists():
+            try:
+                with Image.open(background_path) as img:
+                    # Resize to PowerPoint dimensions if needed
+                    self.background = img.convert("RGB").resize((width, height), Image.Resampling.LANCZOS)
+                logger.info("Loaded FirstPage.png as base image")
+            except Exception as e:
+                logger.error("Error loading FirstPage.png: %s", e)
+                # Fallback: create blank image
+                self.background = Image.new('RGB', (width, height), color=(245, 245, 245))
+        else:
+            logger.warning("FirstPage.png not found, creating blank image")
+            self.background = Image.new('RGB', (width, height), color=(245, 245, 245))
+        
+        # Try to use system fonts with specific sizes, fallback to default
+        try:
+            self.presentation_font = ImageFont.truetype("arial.ttf", 25)  # 18.5pt equivalent for preview
+            self.made_by_font = ImageFont.truetype("arial.ttf", 21)  # 16pt equivalent for preview
+        except Exception:
+            self.presentation_font = ImageFont.load_default()
+            self.made_by_font = ImageFont.load_default()
+        
+        self.png_encoder = BandedPngEncoder(self.background)
+        self._word_widths = {}
+        self._lock = threading.Lock()
+    
+    def text_width(self, text: str, font) -> float:
+        """Width of text in pixels, memoized per (font, text)"""
+        key = (id(font), text)
+        width = self._word_widths.get(key)
+        if width is None:
+            width = font.getlength(text)
+            with self._lock:
+                if len(self._word_widths) >= WORD_WIDTH_CACHE_SIZE:
+                    self._word_widths.clear()
+                self._word_widths[key] = width
+        return width
+    
+    def wrap_text(self, text: str, font, max_width: float) -> list:
+        """Greedy word wrap using cached word widths (linear in the number of words)"""
+        space_width = self.text_width(" ", font)
+        lines = []
+        current_words = []
+        current_width = 0.0
+        
+        for word in text.split(' '):
+            word_width = self.text_width(word, font)
+            candidate_width = current_width + (space_width if current_words else 0) + word_width
+            if candidate_width <= max_width:
+                current_words.append(word)
+                current_width = candidate_width
+            elif current_words:
+                lines.append(" ".join(current_words))
+                current_words = [word]
+                current_width = word_width
+            else:
+                lines.append(word)  # Single word is too long, add anyway
+        
+        if current_words:
+            lines.append(" ".join(current_words))
+        
+        return lines
+    
+    def render(self, customizations: dict) -> Image.Image:
+        """Draw the title slide for the given customizations onto a copy of the background"""
+        img = self.background.copy()
+        width, height = img.size
+        draw = ImageDraw.Draw(img)
+        presentation_text, made_by_text = title_slide_texts(customizations)
+        
+        # Position under TAOGLAS logo, right side (matching screenshot)
+        title_x = 850  # Right side, under logo - moved much further to the right
+        title_y = 280  # Moved down 25% more from TAOGLAS logo
+        text_box_width = 350  # Width for text wrapping - increased to match PowerPoint
+        line_height = 30
+        
+        # Draw wrapped text (left aligned)
+        for i, line in enumerate(self.wrap_text(presentation_text, self.presentation_font, text_box_width)):
+            line_y = title_y + (i * line_height)
+            draw.text((title_x, line_y), line, fill=(68, 68, 68), font=self.presentation_font)
+        
+        # Position "Made by" at bottom right (aligned with presentation text box)
+        made_by_bbox = self.made_by_font.getbbox(made_by_text)
+        made_by_width = made_by_bbox[2] - made_by_bbox[0]
+        made_by_height = made_by_bbox[3] - made_by_bbox[1]
+        made_by_x = width - made_by_width - 20  # Right aligned positioning - closer to edge
+        made_by_y = height - made_by_height - 50
+        draw.text((made_by_x, made_by_y), made_by_text, fill=(68, 68, 68), font=self.made_by_font)
+        
+        return img
+    
+    def save(self, img: Image.Image, output_path: Path, image_format: str, size: tuple = None):
+        if size and size != img.size:
+            # The render is already at preview resolution, box-reduce first then a cheap filter
+            img = img.resize(size, Image.Resampling.BILINEAR, reducing_gap=2.0)
+        if image_format == "WEBP":
+            img.save(str(output_path), "WEBP", quality=PREVIEW_WEBP_QUALITY, method=0)
+        elif image_format == "PNG" and img.size == self.png_encoder.size:
+            with open(output_path, "wb") as f:
+                f.write(self.png_encoder.encode(img))
+        else:
+            img.save(str(output_path), image_format, compress_level=PREVIEW_PNG_COMPRESS_LEVEL)
+
+_rasterizer = None
+_rasterizer_lock = threading.Lock()
+
+def get_rasterizer() -> PreviewRasterizer:
+    """The shared preview rasterizer, rebuilt only when FirstPage.png changes"""
+    global _rasterizer
+    background_path = Path("FirstPage.png")
+    source = _source_signature(background_path) if background_path.exists() else None
+    rasterizer = _rasterizer
+    if rasterizer is None or rasterizer.source != source:
+        with _rasterizer_lock:
+            if _rasterizer is None or _rasterizer.source != source:
+                _rasterizer = PreviewRasterizer()
+            rasterizer = _rasterizer
+    return rasterizer
+
+def thumbnail_format() -> tuple:
+    """(PIL format, file suffix) for preview thumbnails; WebP unless Pillow lacks it"""
+    from PIL import features
+    if features.check("webp"):
+        return "WEBP", ".webp"
+    return "PNG", ".png"
+
+def create_powerpoint_preview_image(customizations: dict, outputs: list) -> bool:
+    """Render the preview once and write it as every (path, format, size) in outputs"""
+    try:
+        rasterizer = get_rasterizer()
+        with timed_stage("png_render"):
+            img = rasterizer.render(customizations)
+        with timed_stage("image_encode"):
+            for output_path, image_format, size in outputs:
+                rasterizer.save(img, output_path, image_format, size)
+        return True
+        
+    except Exception as e:
+        logger.exception("Error creating preview image: %s", e)
+        return False
+
+# Placeholder texts baked into the title-slide template and swapped per request
+TITLE_PLACEHOLDER = "__PRESENTATION_TO__"
+MADE_BY_PLACEHOLDER = "__MADE_BY__"
+_PLACEHOLDER_RE = re.compile("|".join(re.escape(p) for p in (TITLE_PLACEHOLDER, MADE_BY_PLACEHOLDER)))
+# Media parts are already compressed, so they are stored instead of deflated again
+_STORED_PART_SUFFIXES = (".png", ".jpg", ".jpeg", ".gif", ".emf", ".wmf")
+_XML_INVALID_CHARS_RE = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+def title_slide_texts(customizations: dict) -> tuple:
+    """Return the (presentation to, made by) texts shown on the title slide"""
+    presentation_text = customizations.get("presentationTo", "Presentation to")
+    if not (presentation_text and presentation_text.strip() and presentation_text != "Presentation to"):
+        presentation_text = "Presentation to (Ex: Taoglas internal, XXX company...etc)"
+    
+    made_by_text = customizations.get("madeBy", "Made by")
+    if not (made_by_text and made_by_text.strip() and made_by_text != "Made by"):
+        made_by_text = "Made by:"
+    
+    return presentation_text, made_by_text
+
+def optimize_background(background_path: Path) -> bytes:
+    """Downsample and recompress an image for embedding as a full-slide background"""
+    with Image.open(background_path) as img:
+        img.load()
+        target = tuple(round(inches * BACKGROUND_ASSET_DPI) for inches in SLIDE_SIZE_INCHES)
+        if img.width > target[0] or img.height > target[1]:
+            img = img.resize((min(img.width, target[0]), min(img.height, target[1])), Image.Resampling.LANCZOS)
+        
+        opaque = "A" not in img.getbands() or img.getchannel("A").getextrema()[0] == 255
+        buffer = io.BytesIO()
+        if opaque and BACKGROUND_ASSET_QUALITY < 100:
+            img.convert("RGB").save(buffer, "JPEG", quality=BACKGROUND_ASSET_QUALITY, optimize=True)
+        else:
+            img.save(buffer, "PNG", optimize=True)
+    return buffer.getvalue()
+
+_background_asset = None
+_background_asset_lock = threading.Lock()
+
+def get_background_asset() -> Optional[bytes]:
+    """The optimized FirstPage.png bytes, processed once per version of the file"""
+    global _background_asset
+    background_path = Path("FirstPage.png")
+    if not background_path.exists():
+        return None
+    source = _source_signature(background_path)
+    asset = _background_asset
+    if asset is None or asset[0] != source:
+        with _background_asset_lock:
+            if _background_asset is None or _background_asset[0] != source:
+                data = optimize_background(background_path)
+                logger.info("Optimized FirstPage.png for decks: %s -> %d bytes", source["size"], len(data))
+                _background_asset = (source, data)
+            asset = _background_asset
+    return asset[1]
+
+def build_title_deck() -> Presentation:
+    """Build the title-slide deck with placeholder texts in both text boxes"""
+    from pptx import Presentation
+    from pptx.util import Inches
+    from pptx.enum.text import PP_ALIGN
+    from pptx.dml.color import RGBColor
+    
+    # Create a new presentation with better design
+    prs = Presentation()
+    
+    # Create first slide (title slide)
+    slide_layout = prs.slide_layouts[6]  # Blank layout
+    slide = prs.slides.add_slide(slide_layout)
+    
+    # Set slide dimensions (16:9)
+    prs.slide_width = Inches(13.33)
+    prs.slide_height = Inches(7.5)
+    
+    # Add FirstPage.png as background image
+    background_image_path = Path("FirstPage.png")
+    if background_image_path.exists():
+        try:
+            # Add the background image to cover the entire slide
+            slide.shapes.add_picture(
+                io.BytesIO(get_background_asset()),
+                0, 0,  # Position at top-left corner
+                prs.slide_width, 
+                prs.slide_height
+            )
+            logger.info("Added FirstPage.png as background")
+        except Exception as e:
+            logger.error("Error adding background image: %s", e)
+            # Fallback to solid background
+            slide.background.fill.solid()
+            slide.background.fill.fore_color.rgb = RGBColor(245, 245, 245)
+    else:
+        logger.warning("FirstPage.png not found, using solid background")
+        slide.background.fill.solid()
+        slide.background.fill.fore_color.rgb = RGBColor(245, 245, 245)
+    
+    # Add presentation title text box (positioned under TAOGLAS logo, right side)
+    title_box = slide.shapes.add_textbox(
+        Inches(8.5), Inches(4
+        ), Inches(4.5), Inches(1.5)  # Positioned exactly under TAOGLAS logo on right side
+    )
+    title_frame = title_box.text_frame
+    title_frame.clear()  # Clear default paragraph
+    title_frame.text = TITLE_PLACEHOLDER
+    
+    title_frame.paragraphs[0].alignment = PP_ALIGN.LEFT  # Ensure left alignment
+    title_frame.paragraphs[0].font.size = Inches(18.5/72)  # 18.5pt font size
+    title_frame.paragraphs[0].font.color.rgb = RGBColor(68, 68, 68)
+    title_frame.word_wrap = True
+    
+    # Add "Made by" text box (bottom right, exactly positioned)
+    made_by_box = slide.shapes.add_textbox(
+        Inches(10), Inches(6.2), Inches(2.5), Inches(0.8)  # Bottom right corner, aligned with presentation text
+    )
+    made_by_frame = made_by_box.text_frame
+    made_by_frame.clear()  # Clear default paragraph
+    made_by_frame.text = MADE_BY_PLACEHOLDER
+    
+    made_by_frame.paragraphs[0].alignment = PP_ALIGN.RIGHT  # Ensure right alignment
+    made_by_frame.paragraphs[0].font.size = Inches(16/72)  # 16pt font size
+    made_by_frame.paragraphs[0].font.color.rgb = RGBColor(68, 68, 68)
+    
+    return prs
+
+def write_package_part(archive: zipfile.ZipFile, name: str, data: bytes):
+    # Media parts are already compressed, deflating them again only costs time
+    compression = zipfile.ZIP_STORED if name.lower().endswith(_STORED_PART_SUFFIXES) else zipfile.ZIP_DEFLATED
+    archive.writestr(name, data, compress_type=compression)
+
+class TitleSlideTemplate:
+    """The title-slide deck serialized once; each render only rewrites the slide XML part
+
+    All other package parts (theme, layouts, the background picture) are kept
+    as bytes and copied into every output, so a render is a zip write of
+    in-memory buffers instead of a python-pptx build and save.
+    """
+    
+    SLIDE_PART = "ppt/slides/slide1.xml"
+    
+    def __init__(self, deck_bytes: bytes, source: dict = None):
+        self.source = source
+        self.parts = []
+        with zipfile.ZipFile(io.BytesIO(deck_bytes)) as archive:
+            for info in archive.infolist():
+                self.parts.append((info.filename, archive.read(info.filename)))
+        
+        slide_xml = dict(self.parts)[self.SLIDE_PART].decode("utf-8")
+        for placeholder in (TITLE_PLACEHOLDER, MADE_BY_PLACEHOLDER):
+            if slide_xml.count(placeholder) != 1:
+                raise ValueError(f"Template slide must contain {placeholder} exactly once")
+        self.slide_xml = slide_xml
+    
+    @classmethod
+    def build(cls) -> "TitleSlideTemplate":
+        background_path = Path("FirstPage.png")
+        source = _source_signature(background_path) if background_path.exists() else None
+        buffer = io.BytesIO()
+        build_title_deck().save(buffer)
+        return cls(buffer.getvalue(), source)
+    
+    @staticmethod
+    def _xml_text(text: str) -> str:
+        # Text boxes hold a single run, so line breaks become spaces
+        text = re.sub(r"[\r\n\v]+", " ", text)
+        return xml_escape(_XML_INVALID_CHARS_RE.sub("", text))
+    
+    def iter_parts(self, presentation_text: str, made_by_text: str):
+        """Yield (part name, bytes) for the whole package with both placeholders replaced"""
+        # One pass, so placeholder text typed into one field is not substituted again
+        texts = {TITLE_PLACEHOLDER: self._xml_text(presentation_text), MADE_BY_PLACEHOLDER: self._xml_text(made_by_text)}
+        slide_xml = _PLACEHOLDER_RE.sub(lambda match: texts[match.group(0)], self.slide_xml)
+        for name, data in self.parts:
+            if name == self.SLIDE_PART:
+                data = slide_xml.encode("utf-8")
+            yield name, data
+    
+    def render(self, presentation_text: str, made_by_text: str) -> bytes:
+        """Return the .pptx bytes with both placeholders replaced"""
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+            for name, data in self.iter_parts(presentation_text, made_by_text):
+                write_package_part(archive, name, data)
+        return buffer.getvalue()
+
+_title_template = None
+_title_template_lock = threading.Lock()
+
+def get_title_template() -> TitleSlideTemplate:
+    """The shared title-slide template, rebuilt only when FirstPage.png changes"""
+    global _title_template
+    background_path = Path("FirstPage.png")
+    source = _source_signature(background_path) if background_path.exists() else None
+    template = _title_template
+    if template is None or template.source != source:
+        with _title_template_lock:
+            if _title_template is None or _title_template.source != source:
+                _title_template = TitleSlideTemplate.build()
+            template = _title_template
+    return template
+
+# Heavy imports and renderer setup that would otherwise land on the first request
+WARMUP_ON_STARTUP = os.environ.get("WARMUP_ON_STARTUP", "1").lower() not in ("0", "false", "no")
+WARMUP_MODULES = ("pptx", "pptx.chart.data", "openpyxl")
+
+startup_timings = {}
+startup_state = {"ready": False, "error": None}
+
+def warm_up() -> dict:
+    """Import the heavy libraries and build the cached title template and rasterizer
+
+    Returns seconds per step. Runs once in the server process and, for a
+    process pool, once in every worker so none of them pays for it on a request.
+    """
+    timings = {}
+    for module in (pd, np, pa, pa_csv, pa_ipc, pq, Image, ImageDraw, ImageFont):
+        started = time.perf_counter()
+        name = load_lazy_module(module).__name__
+        timings[f"import {name}"] = time.perf_counter() - started
+    for name in WARMUP_MODULES:
+        started = time.perf_counter()
+        importlib.import_module(name)
+        timings[f"import {name}"] = time.perf_counter() - started
+    steps = (("background asset", get_background_asset), ("title template", get_title_template), ("rasterizer", get_rasterizer))
+    for step, build in steps:
+        started = time.perf_counter()
+        build()
+        timings[step] = time.perf_counter() - started
+    return timings
+
+async def warm_up_workers():
+    started = time.perf_counter()
+    try:
+        steps = await asyncio.to_thread(warm_up)
+        if cpu_pool.kind == "process":
+            # One job per worker; each is busy importing long enough that they spread across the pool
+            await asyncio.gather(*(cpu_pool.run(warm_up, timeout=300) for _ in range(cpu_pool.max_workers)))
+        startup_timings.update(("warmup " + step, seconds) for step, seconds in steps.items())
+    except Exception as e:
+        # Not fatal: whatever did not warm up is loaded by the first request that needs it
+        startup_state["error"] = str(e)
+        logger.warning("Warm-up failed: %s", e)
+    startup_timings["warmup"] = time.perf_counter() - started
+    mark_ready()
+
+def mark_ready():
+    startup_timings["ready"] = time.perf_counter() - _MODULE_LOAD_STARTED
+    startup_state["ready"] = True
+    logger.info("Startup: %s", ", ".join(f"{phase} {seconds * 1000:.0f}ms" for phase, seconds in startup_timings.items()))
+
+@app.on_event("startup")
+async def start_warmup():
+    global _warmup_task
+    startup_timings["app startup"] = time.perf_counter() - _MODULE_LOAD_STARTED
+    # The process workers were already forked by start_worker_pools()
+    if WARMUP_ON_STARTUP:
+        _warmup_task = asyncio.create_task(warm_up_workers())
+    else:
+        mark_ready()
+
+_warmup_task = None
+
+@metrics.register
+def collect_startup_metrics() -> list:
+    samples = [("startup_seconds", "gauge", "Seconds spent in each startup phase", {"phase": phase}, seconds)
+               for phase, seconds in startup_timings.items()]
+    samples.append(("ready", "gauge", "1 once warm-up has finished", {}, int(startup_state["ready"])))
+    return samples
+
+def render_preview(customizations: dict, progress=None, render_id: str = None) -> dict:
+    """Build the preview deck and its PNG, returning the response payload
+
+    progress, if given, is called as progress(stage, percent) between stages.
+    render_id replaces the random suffix of the output filenames.
+    """
+    if progress:
+        progress("building deck", 10)
+    
+    # Clone the precompiled title slide with this request's texts
+    presentation_text, made_by_text = title_slide_texts(customizations)
+    with timed_stage("pptx_build"):
+        deck_bytes = get_title_template().render(presentation_text, made_by_text)
+    
+    # Save preview PowerPoint with custom filename based on presentation name
+    presentation_name = customizations.get("presentationTo", "Presentation")
+    sanitized_name = sanitize_filename(presentation_name)
+    
+    # Add unique identifier to prevent conflicts while keeping readable name
+    unique_id = render_id or str(uuid.uuid4())[:8]  # Short unique ID
+    preview_filename = f"{sanitized_name}_{unique_id}.pptx"
+    download_filename = f"{sanitized_name}.pptx"  # Clean name for download
+    
+    preview_path = PREVIEW_DIR / preview_filename
+    if progress:
+        progress("saving deck", 40)
+    with timed_stage("pptx_save"), open(preview_path, "wb") as f:
+        f.write(deck_bytes)
+    
+    # Create preview image (full PNG plus a small thumbnail) that matches the PowerPoint content
+    image_filename = f"{sanitized_name}_{unique_id}_preview.png"
+    image_path = IMAGES_DIR / image_filename
+    thumb_format, thumb_suffix = thumbnail_format()
+    thumbnail_filename = f"{sanitized_name}_{unique_id}_thumb{thumb_suffix}"
+    thumbnail_path = IMAGES_DIR / thumbnail_filename
+    
+    # Generate actual preview image with the same content
+    if progress:
+        progress("rendering image", 70)
+    success = create_powerpoint_preview_image(customizations, [
+        (image_path, "PNG", None),
+        (thumbnail_path, thumb_format, PREVIEW_THUMBNAIL_SIZE)
+    ])
+    if not success:
+        logger.warning("Failed to create preview image, using fallback")
+        # Fallback: create simple image
+        fallback_img = Image.new('RGB', PREVIEW_IMAGE_SIZE, color=(245, 245, 245))
+        fallback_img.save(str(image_path), 'PNG')
+        fallback_img.resize(PREVIEW_THUMBNAIL_SIZE).save(str(thumbnail_path), thumb_format)
+    
+    return {
+        "message": "Preview generated successfully",
+        "previewFile": preview_filename,
+        "downloadFilename": download_filename,
+        "imageFile": image_filename,
+        "downloadUrl": f"/api/download-preview/{preview_filename}?download_name={download_filename}",
+        "imageUrl": f"/api/preview-image/{image_filename}",
+        "thumbnailFile": thumbnail_filename,
+        "thumbnailUrl": f"/api/preview-image/{thumbnail_filename}"
+    }
+
+# Table slides: rows per slide by default (and at most), the most columns one
+# table may hold, and decimals kept when formatting floats
+TABLE_ROWS_PER_SLIDE = 15
+TABLE_MAX_ROWS_PER_SLIDE = 50
+TABLE_MAX_COLUMNS = 20
+TABLE_FLOAT_DECIMALS = 2
+TABLE_BATCH_ROWS = 5_000  # Rows read and formatted together before being cut into slides
+EMU_PER_INCH = 914400
+
+_PML_NS = 'xmlns:a="http://schemas.openxmlformats.org/drawingml/2006/main" ' \
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships" ' \
+    'xmlns:p="http://schemas.openxmlformats.org/presentationml/2006/main"'
+_SLIDE_CONTENT_TYPE = "application/vnd.openxmlformats-officedocument.presentationml.slide+xml"
+_SLIDE_REL_TYPE = "http://schemas.openxmlformats.org/officeDocument/2006/relationships/slide"
+_TABLE_STYLE_ID = "{5C22544A-7EE6-4342-B048-85BDC9FD1C3A}"  # PowerPoint's built-in "Medium Style 2 - Accent 1"
+
+def format_table_cells(df: pd.DataFrame) -> pd.DataFrame:
+    """Turn every cell into escaped XML text, one vectorized pass per column"""
+    formatted = {}
+    for col in df.columns:
+        values = df[col]
+        if pd.api.types.is_datetime64_any_dtype(values):
+            text = values.dt.strftime("%Y-%m-%d")
+        elif pd.api.types.is_float_dtype(values):
+            text = values.round(TABLE_FLOAT_DECIMALS).astype(str).str.replace(r"\.0$", "", regex=True)
+        else:
+            text = values.astype(str)
+        text = text.where(values.notna(), "")
+        formatted[col] = (
+            text.str.replace(_XML_INVALID_CHARS_RE.pattern, "", regex=True)
+            .str.replace("&", "&amp;", regex=False)
+            .str.replace("<", "&lt;", regex=False)
+            .str.replace(">", "&gt;", regex=False)
+        )
+    return pd.DataFrame(formatted, index=df.index)
+
+def _table_cell(text, size: int, bold: bool = False):
+    # Works on a scalar or a whole column of strings
+    bold_attr = ' b="1"' if bold else ""
+    return (
+        f'<a:tc><a:txBody><a:bodyPr/><a:lstStyle/><a:p><a:r><a:rPr lang="en-US" sz="{size}"{bold_attr} dirty="0"/><a:t>'
+        + text
+        + '</a:t></a:r></a:p></a:txBody><a:tcPr/></a:tc>'
+    )
+
+def table_font_size(column_count: int) -> int:
+    return 1000 if column_count <= 8 else 800
+
+def table_row_cells(df: pd.DataFrame, font_size: int) -> list:
+    """Return the <a:tc> XML of every row of df, built column by column for the whole frame"""
+    cells = format_table_cells(df)
+    rows = pd.Series("", index=cells.index, dtype=object)
+    for col in cells.columns:
+        rows = rows + _table_cell(cells[col], font_size)
+    return rows.tolist()
+
+class TableDeckWriter:
+    """Appends table slides to the title-slide template by writing slide XML straight into the zip
+
+    Only one slide's worth of rows is held at a time; the package parts that
+    list the slides ([Content_Types].xml, presentation.xml and its rels) are
+    written last, once the slide count is known.
+    """
+    
+    PACKAGE_PARTS = ("[Content_Types].xml", "ppt/presentation.xml", "ppt/_rels/presentation.xml.rels")
+    
+    def __init__(self, output_path: Path, template: TitleSlideTemplate, customizations: dict):
+        self.template = template
+        self.archive = zipfile.ZipFile(output_path, "w", zipfile.ZIP_DEFLATED)
+        self.package = {}
+        self.slide_count = 0
+        
+        presentation_text, made_by_text = title_slide_texts(customizations)
+        for name, data in template.iter_parts(presentation_text, made_by_text):
+            if name in self.PACKAGE_PARTS:
+                self.package[name] = data.decode("utf-8")
+            else:
+                write_package_part(self.archive, name, data)
+        
+        # New slides reuse the title slide's (blank) layout
+        rels = ET.fromstring(dict(template.parts)["ppt/slides/_rels/slide1.xml.rels"])
+        self.layout_target = next(
+            rel.get("Target") for rel in rels.findall("pkg:Relationship", _XLSX_NS)
+            if rel.get("Type").endswith("/slideLayout")
+        )
+        
+        presentation = self.package["ppt/presentation.xml"]
+        size = re.search(r'<p:sldSz cx="(\d+)" cy="(\d+)"', presentation)
+        self.slide_width, self.slide_height = int(size.group(1)), int(size.group(2))
+        self.next_slide_id = max(int(value) for value in re.findall(r'<p:sldId id="(\d+)"', presentation)) + 1
+    
+    def add_table_slide(self, title: str, header: list, row_cells: list):
+        """Add a slide with a title and a table; row_cells comes from table_row_cells()"""
+        self.slide_count += 1
+        number = self.slide_count + 1  # slide1 is the title slide
+        
+        margin = int(0.4 * EMU_PER_INCH)
+        top = int(1.1 * EMU_PER_INCH)
+        width = self.slide_width - 2 * margin
+        column_width = width // len(header)
+        row_count = len(row_cells) + 1
+        row_height = min((self.slide_height - top - margin) // row_count, int(0.4 * EMU_PER_INCH))
+        font_size = table_font_size(len(header))
+        
+        header_xml = "".join(_table_cell(xml_escape(str(name)), font_size, bold=True) for name in header)
+        row_open = f'<a:tr h="{row_height}">'
+        rows_xml = row_open + header_xml + "</a:tr>" + "".join(row_open + cells + "</a:tr>" for cells in row_cells)
+        grid_xml = "".join(f'<a:gridCol w="{column_width}"/>' for _ in header)
+        
+        slide_xml = (
+            f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n<p:sld {_PML_NS}><p:cSld><p:spTree>'
+            '<p:nvGrpSpPr><p:cNvPr id="1" name=""/><p:cNvGrpSpPr/><p:nvPr/></p:nvGrpSpPr><p:grpSpPr/>'
+            '<p:sp><p:nvSpPr><p:cNvPr id="2" name="Title"/><p:cNvSpPr txBox="1"/><p:nvPr/></p:nvSpPr>'
+            f'<p:spPr><a:xfrm><a:off x="{margin}" y="{int(0.3 * EMU_PER_INCH)}"/><a:ext cx="{width}" cy="{int(0.6 * EMU_PER_INCH)}"/></a:xfrm>'
+            '<a:prstGeom prst="rect"><a:avLst/></a:prstGeom><a:noFill/></p:spPr>'
+            '<p:txBody><a:bodyPr wrap="none"/><a:lstStyle/><a:p><a:r><a:rPr lang="en-US" sz="2400" dirty="0">'
+            f'<a:solidFill><a:srgbClr val="444444"/></a:solidFill></a:rPr><a:t>{TitleSlideTemplate._xml_text(title)}</a:t></a:r></a:p></p:txBody></p:sp>'
+            '<p:graphicFrame><p:nvGraphicFramePr><p:cNvPr id="3" name="Table"/>'
+            '<p:cNvGraphicFramePr><a:graphicFrameLocks noGrp="1"/></p:cNvGraphicFramePr><p:nvPr/></p:nvGraphicFramePr>'
+            f'<p:xfrm><a:off x="{margin}" y="{top}"/><a:ext cx="{column_width * len(header)}" cy="{row_height * row_count}"/></p:xfrm>'
+            '<a:graphic><a:graphicData uri="http://schemas.openxmlformats.org/drawingml/2006/table">'
+            f'<a:tbl><a:tblPr firstRow="1" bandRow="1"><a:tableStyleId>{_TABLE_STYLE_ID}</a:tableStyleId></a:tblPr>'
+            f'<a:tblGrid>{grid_xml}</a:tblGrid>{rows_xml}</a:tbl></a:graphicData></a:graphic></p:graphicFrame>'
+            '</p:spTree></p:cSld><p:clrMapOvr><a:masterClrMapping/></p:clrMapOvr></p:sld>'
+        )
+        self.archive.writestr(f"ppt/slides/slide{number}.xml", slide_xml)
+        self.archive.writestr(
+            f"ppt/slides/_rels/slide{number}.xml.rels",
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/slideLayout" '
+            f'Target="{self.layout_target}"/></Relationships>'
+        )
+    
+    def close(self):
+        """Write the package parts that list every slide and finish the zip"""
+        numbers = range(2, self.slide_count + 2)
+        content_types = self.package["[Content_Types].xml"].replace("</Types>", "".join(
+            f'<Override PartName="/ppt/slides/slide{n}.xml" ContentType="{_SLIDE_CONTENT_TYPE}"/>' for n in numbers
+        ) + "</Types>")
+        presentation = self.package["ppt/presentation.xml"].replace("</p:sldIdLst>", "".join(
+            f'<p:sldId id="{self.next_slide_id + i}" r:id="rIdSlide{n}"/>' for i, n in enumerate(numbers)
+        ) + "</p:sldIdLst>")
+        presentation_rels = self.package["ppt/_rels/presentation.xml.rels"].replace("</Relationships>", "".join(
+            f'<Relationship Id="rIdSlide{n}" Type="{_SLIDE_REL_TYPE}" Target="slides/slide{n}.xml"/>' for n in numbers
+        ) + "</Relationships>")
+        
+        self.archive.writestr("[Content_Types].xml", content_types)
+        self.archive.writestr("ppt/presentation.xml", presentation)
+        self.archive.writestr("ppt/_rels/presentation.xml.rels", presentation_rels)
+        self.archive.close()
+    
+    def abort(self):
+        self.archive.close()
+
+def iter_workbook_frames(file_info: dict, sheet: str, columns, batch_rows: int):
+    """Yield DataFrames of batch_rows rows read straight from the upload, never the whole sheet
+
+    Used by the streaming mode: CSV is read in chunks and .xlsx through
+    openpyxl's read-only row iterator, so no sheet cache is built.
+    """
+    filepath = file_info["filepath"]
+    if file_info["filename"].endswith('.csv'):
+        yield from pd.read_csv(filepath, chunksize=batch_rows, usecols=columns)
+        return
+    
+    from openpyxl import load_workbook
+    workbook = load_workbook(filepath, read_only=True, data_only=True)
+    try:
+        sheet = sheet or workbook.sheetnames[0]
+        if sheet not in workbook.sheetnames:
+            raise KeyError(sheet)
+        rows = workbook[sheet].iter_rows(values_only=True)
+        header = next(rows, ())
+        # Same header naming as pandas.read_excel for blank header cells
+        header = [str(name) if name is not None else f"Unnamed: {i}" for i, name in enumerate(header)]
+        unknown = [col for col in columns or () if col not in header]
+        if unknown:
+            raise ValueError(f"Unknown columns: {', '.join(unknown)}")
+        indexes = [header.index(col) for col in columns] if columns else list(range(len(header)))
+        names = [header[i] for i in indexes]
+        
+        batch = []
+        for row in rows:
+            batch.append([row[i] if i < len(row) else None for i in indexes])
+            if len(batch) >= batch_rows:
+                yield pd.DataFrame(batch, columns=names)
+                batch = []
+        if batch:
+            yield pd.DataFrame(batch, columns=names)
+    finally:
+        workbook.close()
+
+def build_table_deck(file_info: dict, sheet: str = None, columns: list = None,
+                     rows_per_slide: int = TABLE_ROWS_PER_SLIDE, customizations: dict = None,
+                     stream: bool = False, max_rows: int = None, progress=None, output=None) -> dict:
+    """Write a deck with the title slide followed by the sheet paginated into table slides
+
+    The deck is saved under PREVIEW_DIR, or written to the binary file object
+    output when one is given (then only sheet/rows/slides are returned).
+    """
+    customizations = customizations or {}
+    total_rows = None
+    
+    if stream and not file_info["filename"].endswith(('.csv', '.xlsx', '.xlsm')):
+        stream = False  # Legacy .xls has no row-streaming reader, go through the cache
+    
+    if stream:
+        sheet_name = sheet or file_info["sheets"][0]
+        frames = iter_workbook_frames(file_info, sheet_name, columns, TABLE_BATCH_ROWS)
+    else:
+        sheet_name, sheet_path = cached_sheet_path(file_info, sheet)
+        parquet_file = pq.ParquetFile(sheet_path)
+        unknown = [col for col in columns or () if col not in parquet_file.schema_arrow.names]
+        if unknown:
+            raise ValueError(f"Unknown columns: {', '.join(unknown)}")
+        total_rows = parquet_file.metadata.num_rows
+        if max_rows is not None:
+            total_rows = min(total_rows, max_rows)
+        frames = (
+            batch.to_pandas()
+            for batch in iter_sheet_batches(sheet_path, columns, 0, max_rows, batch_size=TABLE_BATCH_ROWS)
+        )
+    
+    if output is None:
+        # Save next to the previews, named after the presentation and the sheet
+        sanitized_name = sanitize_filename(customizations.get("presentationTo", "Presentation"))
+        deck_name = f"{sanitized_name}_{sanitize_filename(sheet_name)}"
+        deck_filename = f"{deck_name}_{str(uuid.uuid4())[:8]}.pptx"
+        download_filename = f"{deck_name}.pptx"
+        deck_path = PREVIEW_DIR / deck_filename
+    
+    writer = TableDeckWriter(deck_path if output is None else output, get_title_template(), customizations)
+    header = None
+    pending = []  # Formatted rows not yet placed on a slide
+    row_count = 0
+    
+    def flush(rows: list):
+        first_row = row_count - len(pending) + 1
+        title = f"{sheet_name}: rows {first_row}-{first_row + len(rows) - 1}"
+        if total_rows is not None:
+            title += f" of {total_rows}"
+        writer.add_table_slide(title, header, rows)
+    
+    try:
+        for frame in frames:
+            if max_rows is not None:
+                if row_count >= max_rows:
+                    break
+                frame = frame.iloc[:max_rows - row_count]
+            if frame.empty:
+                continue
+            if header is None:
+                header = list(frame.columns)
+                if len(header) > TABLE_MAX_COLUMNS:
+                    raise ValueError(f"Too many columns for a table slide ({len(header)}), select at most {TABLE_MAX_COLUMNS}")
+            
+            # Format the whole batch at once, then cut it into slides; batches need
+            # not line up with slide boundaries so leftovers carry over
+            with timed_stage("table_format"):
+                pending.extend(table_row_cells(frame, table_font_size(len(header))))
+            row_count += len(frame)
+            with timed_stage("pptx_build"):
+                while len(pending) >= rows_per_slide:
+                    flush(pending[:rows_per_slide])
+                    pending = pending[rows_per_slide:]
+            
+            if progress and total_rows:
+                progress("writing slides", min(95, int(95 * row_count / total_rows)))
+        
+        if pending:
+            flush(pending)
+        with timed_stage("pptx_save"):
+            writer.close()
+    except Exception:
+        writer.abort()
+        if output is None:
+            delete_path(deck_path)
+        raise
+    
+    summary = {"sheet": sheet_name, "rows": row_count, "slides": writer.slide_count + 1}
+    if output is not None:
+        return summary
+    return {
+        "message": "Deck generated successfully",
+        "deckFile": deck_filename,
+        "downloadFilename": download_filename,
+        **summary,
+        "downloadUrl": f"/api/download-preview/{deck_filename}?download_name={download_filename}",
+        "thumbnailsUrl": f"/api/decks/{deck_filename}/thumbnails"
+    }
+
+# Chart slides: points kept per series once a series is downsampled, categories
+# kept on a bar/column chart, and the most series one chart may hold
+CHART_MAX_POINTS = 2_000
+CHART_MAX_CATEGORIES = 50
+CHART_MAX_SERIES = 8
+CHART_AGGREGATES = ("sum", "mean", "min", "max", "count")
+_EXCEL_EPOCH = "1899-12-30"
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """Pick threshold points of (x, y) with Largest-Triangle-Three-Buckets, keeping first and last"""
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    
+    # threshold - 2 buckets over the inner points; spacing is >= 1 so none is empty
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    
+    # Average of the bucket after each bucket, all at once from prefix sums;
+    # the last bucket looks ahead to the final point
+    x_sums = np.concatenate(([0.0], np.cumsum(x, dtype=np.float64)))
+    y_sums = np.concatenate(([0.0], np.cumsum(y, dtype=np.float64)))
+    counts = np.diff(edges)
+    avg_x = (x_sums[edges[1:]] - x_sums[edges[:-1]]) / counts
+    avg_y = (y_sums[edges[1:]] - y_sums[edges[:-1]]) / counts
+    next_x = np.append(avg_x[1:], x[-1])
+    next_y = np.append(avg_y[1:], y[-1])
+    
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for bucket in range(threshold - 2):
+        lo, hi = edges[bucket], edges[bucket + 1]
+        areas = np.abs(
+            (x[a] - next_x[bucket]) * (y[lo:hi] - y[a])
+            - (x[a] - x[lo:hi]) * (next_y[bucket] - y[a])
+        )
+        a = lo + int(np.argmax(areas))
+        selected[bucket + 1] = a
+    return selected
+
+def bucket_aggregate(frame: pd.DataFrame, max_buckets: int, how: str) -> pd.DataFrame:
+    """Aggregate consecutive rows into at most max_buckets buckets, labelled by their first row's index"""
+    if len(frame) <= max_buckets:
+        return frame
+    buckets = np.arange(len(frame)) * max_buckets // len(frame)
+    aggregated = frame.groupby(buckets).agg(how)
+    # buckets is sorted, so searchsorted finds each bucket's first row
+    aggregated.index = frame.index[np.searchsorted(buckets, aggregated.index)]
+    return aggregated
+
+def _numeric_series(df: pd.DataFrame, column: str) -> pd.Series:
+    values = df[column]
+    if not pd.api.types.is_numeric_dtype(values) or pd.api.types.is_bool_dtype(values):
+        values = pd.to_numeric(values, errors="coerce")
+        if values.notna().sum() == 0:
+            raise ValueError(f"Column is not numeric: {column}")
+    return values.astype(np.float64)
+
+def _x_axis_values(df: pd.DataFrame, x: str):
+    """Return (numeric x values, is_date) for an XY chart, or (None, False) when x is categorical"""
+    if x is None:
+        return np.arange(1, len(df) + 1, dtype=np.float64), False
+    values = df[x]
+    if pd.api.types.is_datetime64_any_dtype(values):
+        if values.dt.tz is not None:
+            # Excel dates carry no time zone: compare in UTC, as naive timestamps
+            values = values.dt.tz_convert(None)
+        # Excel serial days so the axis can use a date number format
+        return ((values - pd.Timestamp(_EXCEL_EPOCH)) / pd.Timedelta(days=1)).to_numpy(dtype=np.float64), True
+    if pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values):
+        return values.to_numpy(dtype=np.float64), False
+    return None, False
+
+def prepare_chart(df: pd.DataFrame, spec: dict, max_points: int) -> dict:
+    """Reduce one chart spec's columns to a bounded chart payload
+
+    Numeric or date x (or none) gives an XY line/scatter chart with every series
+    downsampled independently by LTTB. Categorical x gives a category chart
+    aggregated per value; bar/column keep the largest CHART_MAX_CATEGORIES,
+    line charts bucket consecutive categories down to max_points.
+    """
+    chart_type = spec.get("type", "line")
+    if chart_type not in ("line", "scatter", "bar", "column"):
+        raise ValueError(f"Unknown chart type: {chart_type}")
+    x = spec.get("x")
+    y_columns = spec.get("y") or []
+    if isinstance(y_columns, str):
+        y_columns = [y_columns]
+    if not y_columns:
+        raise ValueError("A chart needs at least one y column")
+    if len(y_columns) > CHART_MAX_SERIES:
+        raise ValueError(f"Too many series for one chart ({len(y_columns)}), select at most {CHART_MAX_SERIES}")
+    how = spec.get("aggregate", "sum")
+    if how not in CHART_AGGREGATES:
+        raise ValueError(f"Unknown aggregate: {how}")
+    
+    title = spec.get("title") or ", ".join(y_columns) + (f" by {x}" if x else "")
+    y_values = pd.DataFrame({col: _numeric_series(df, col) for col in y_columns})
+    x_values, x_is_date = _x_axis_values(df, x) if chart_type in ("line", "scatter") else (None, False)
+    
+    if x_values is not None:
+        series = []
+        for col in y_columns:
+            values = y_values[col].to_numpy()
+            keep = ~(np.isnan(values) | np.isnan(x_values))
+            sx, sy = x_values[keep], values[keep]
+            if len(sx) > 1 and np.any(np.diff(sx) < 0):
+                order = np.argsort(sx, kind="stable")
+                sx, sy = sx[order], sy[order]
+            picked = lttb_indices(sx, sy, max_points)
+            series.append((col, sx[picked], sy[picked]))
+        return {"kind": "xy", "type": chart_type, "title": title, "series": series,
+                "xIsDate": x_is_date, "sourceRows": len(df)}
+    
+    if x is None:
+        raise ValueError(f"A {chart_type} chart needs an x column")
+    
+    # Categorical x: one value per category, NaN categories dropped
+    y_values.index = df[x].astype(str).where(df[x].notna(), None)
+    y_values = y_values[y_values.index.notna()]
+    if how == "count":
+        aggregated = y_values.groupby(level=0, sort=False).count()
+    else:
+        aggregated = y_values.groupby(level=0, sort=False).agg(how)
+    
+    if chart_type in ("bar", "column"):
+        if len(aggregated) > CHART_MAX_CATEGORIES:
+            aggregated = aggregated.nlargest(CHART_MAX_CATEGORIES, y_columns[0])
+            title += f" (top {CHART_MAX_CATEGORIES})"
+    else:
+        aggregated = bucket_aggregate(aggregated, max_points, "mean")
+    
+    return {"kind": "category", "type": chart_type, "title": title,
+            "categories": aggregated.index.tolist(),
+            "series": [(col, aggregated[col].to_numpy(), None) for col in y_columns],
+            "sourceRows": len(df)}
+
+def add_chart_slide(prs: Presentation, chart: dict):
+    """Add a blank slide with a title and a native chart built from a prepare_chart payload"""
+    from pptx.util import Inches, Pt
+    from pptx.chart.data import CategoryChartData, XyChartData
+    from pptx.enum.chart import XL_CHART_TYPE, XL_LEGEND_POSITION
+    from pptx.dml.color import RGBColor
+    
+    slide = prs.slides.add_slide(prs.slide_layouts[6])
+    margin = Inches(0.4)
+    
+    title_box = slide.shapes.add_textbox(margin, Inches(0.3), prs.slide_width - 2 * margin, Inches(0.6))
+    title_frame = title_box.text_frame
+    title_frame.text = chart["title"]
+    title_frame.paragraphs[0].font.size = Pt(24)
+    title_frame.paragraphs[0].font.color.rgb = RGBColor(68, 68, 68)
+    
+    if chart["kind"] == "xy":
+        chart_data = XyChartData()
+        for name, xs, ys in chart["series"]:
+            series = chart_data.add_series(name)
+            for px, py in zip(xs.tolist(), ys.tolist()):
+                series.add_data_point(px, py)
+        chart_type = XL_CHART_TYPE.XY_SCATTER if chart["type"] == "scatter" else XL_CHART_TYPE.XY_SCATTER_LINES_NO_MARKERS
+    else:
+        chart_data = CategoryChartData()
+        chart_data.categories = chart["categories"]
+        for name, values, _ in chart["series"]:
+            # NaN (empty aggregate) becomes a gap rather than an invalid number
+            chart_data.add_series(name, [None if np.isnan(v) else v for v in values.tolist()])
+        chart_type = {
+            "bar": XL_CHART_TYPE.BAR_CLUSTERED,
+            "column": XL_CHART_TYPE.COLUMN_CLUSTERED,
+            "line": XL_CHART_TYPE.LINE,
+        }[chart["type"]]
+    
+    graphic_frame = slide.shapes.add_chart(
+        chart_type, margin, Inches(1.1), prs.slide_width - 2 * margin, prs.slide_height - Inches(1.5), chart_data
+    )
+    native_chart = graphic_frame.chart
+    native_chart.font.size = Pt(10)
+    native_chart.has_legend = len(chart["series"]) > 1
+    if native_chart.has_legend:
+        native_chart.legend.position = XL_LEGEND_POSITION.BOTTOM
+        native_chart.legend.include_in_layout = False
+    if chart["kind"] == "xy" and chart["xIsDate"]:
+        native_chart.category_axis.tick_labels.number_format = "yyyy-mm-dd"
+        native_chart.category_axis.tick_labels.number_format_is_linked = False
+
+def build_chart_deck(file_info: dict, sheet: str, charts: list, customizations: dict = None,
+                     max_points: int = CHART_MAX_POINTS, progress=None, output=None) -> dict:
+    """Write a deck with the title slide followed by one native chart slide per chart spec
+
+    Saved under PREVIEW_DIR, or written to the binary file object output when given.
+    """
+    customizations = customizations or {}
+    sheet_name, sheet_path = cached_sheet_path(file_info, sheet)
+    
+    # Read only the columns the charts use, straight from the columnar cache
+    available_columns = pq.ParquetFile(sheet_path).schema_arrow.names
+    needed = []
+    for spec in charts:
+        y_columns = spec.get("y") or []
+        for col in [spec.get("x")] + ([y_columns] if isinstance(y_columns, str) else list(y_columns)):
+            if col is not None and col not in needed:
+                needed.append(col)
+    unknown = [col for col in needed if col not in available_columns]
+    if unknown:
+        raise ValueError(f"Unknown columns: {', '.join(unknown)}")
+    df = pq.read_table(sheet_path, columns=needed).to_pandas()
+    
+    prepared = []
+    for index, spec in enumerate(charts):
+        with timed_stage("chart_aggregate"):
+            prepared.append(prepare_chart(df, spec, max_points))
+        if progress:
+            progress("aggregating", int(40 * (index + 1) / len(charts)))
+    del df
+    
+    from pptx import Presentation
+    
+    presentation_text, made_by_text = title_slide_texts(customizations)
+    prs = Presentation(io.BytesIO(get_title_template().render(presentation_text, made_by_text)))
+    for index, chart in enumerate(prepared):
+        with timed_stage("pptx_build"):
+            add_chart_slide(prs, chart)
+        if progress:
+            progress("building charts", 40 + int(55 * (index + 1) / len(prepared)))
+    
+    summary = {
+        "sheet": sheet_name,
+        "slides": len(prepared) + 1,
+        "charts": [
+            {
+                "title": chart["title"],
+                "sourceRows": chart["sourceRows"],
+                "points": {name: len(values) for name, _, values in chart["series"]} if chart["kind"] == "xy"
+                else {name: len(chart["categories"]) for name, _, _ in chart["series"]},
+            }
+            for chart in prepared
+        ],
+    }
+    if output is not None:
+        with timed_stage("pptx_save"):
+            prs.save(output)
+        return summary
+    
+    sanitized_name = sanitize_filename(customizations.get("presentationTo", "Presentation"))
+    deck_name = f"{sanitized_name}_{sanitize_filename(sheet_name)}_charts"
+    deck_filename = f"{deck_name}_{str(uuid.uuid4())[:8]}.pptx"
+    download_filename = f"{deck_name}.pptx"
+    with timed_stage("pptx_save"):
+        prs.save(str(PREVIEW_DIR / deck_filename))
+    
+    return {
+        "message": "Deck generated successfully",
+        "deckFile": deck_filename,
+        "downloadFilename": download_filename,
+        **summary,
+        "downloadUrl": f"/api/download-preview/{deck_filename}?download_name={download_filename}",
+        "thumbnailsUrl": f"/api/decks/{deck_filename}/thumbnails"
+    }
+
+# Batch generation: most decks per request, and how many render at once
+# (defaults to the CPU pool size so a batch cannot starve other requests of the queue)
+BATCH_MAX_ITEMS = int(os.environ.get("BATCH_MAX_ITEMS", "1000"))
+BATCH_CONCURRENCY = int(os.environ.get("BATCH_CONCURRENCY", str(WORKER_POOL_SIZE)))
+# Rows per table deck in a batch when maxRows is not given, and the most it may ask for
+BATCH_MAX_ROWS = int(os.environ.get("BATCH_MAX_ROWS", "1000"))
+
+def _int_option(data: dict, key: str, default):
+    """An integer request option (default when missing or empty), 400 when it is not a whole number"""
+    value = data.get(key)
+    if value is None or value == "":
+        return default
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail=f"{key} must be an integer")
+
+def table_deck_options(data: dict, file_info: dict, max_rows_limit: int = None) -> dict:
+    """build_table_deck arguments from a /api/generate-deck body, raising HTTPException if they are invalid
+
+    With max_rows_limit, maxRows defaults to it and may not exceed it.
+    """
+    sheet = data.get("sheet")
+    if sheet is not None and sheet not in file_info["sheets"]:
+        raise HTTPException(status_code=404, detail=f"Sheet not found: {sheet}")
+    columns = data.get("columns") or None
+    if columns is not None and (not isinstance(columns, list) or not all(isinstance(col, str) for col in columns)):
+        raise HTTPException(status_code=400, detail="columns must be a list of column names")
+    rows_per_slide = _int_option(data, "rowsPerSlide", TABLE_ROWS_PER_SLIDE) or TABLE_ROWS_PER_SLIDE
+    if not 1 <= rows_per_slide <= TABLE_MAX_ROWS_PER_SLIDE:
+        raise HTTPException(status_code=400, detail=f"rowsPerSlide must be between 1 and {TABLE_MAX_ROWS_PER_SLIDE}")
+    max_rows = _int_option(data, "maxRows", max_rows_limit)
+    if max_rows is not None and max_rows < 1:
+        raise HTTPException(status_code=400, detail="maxRows must be at least 1")
+    if max_rows_limit is not None and max_rows > max_rows_limit:
+        raise HTTPException(status_code=400, detail=f"maxRows must be at most {max_rows_limit}")
+    return {
+        "sheet": sheet,
+        "columns": columns,
+        "rows_per_slide": rows_per_slide,
+        "stream": bool(data.get("stream")),
+        "max_rows": max_rows
+    }
+
+def chart_deck_options(data: dict, file_info: dict) -> dict:
+    """build_chart_deck arguments from a /api/generate-charts body, raising HTTPException if they are invalid"""
+    sheet = data.get("sheet")
+    if sheet is not None and sheet not in file_info["sheets"]:
+        raise HTTPException(status_code=404, detail=f"Sheet not found: {sheet}")
+    charts = data.get("charts")
+    if not charts or not isinstance(charts, list):
+        raise HTTPException(status_code=400, detail="charts must be a non-empty list")
+    max_points = _int_option(data, "maxPoints", CHART_MAX_POINTS) or CHART_MAX_POINTS
+    if not 3 <= max_points <= CHART_MAX_POINTS:
+        raise HTTPException(status_code=400, detail=f"maxPoints must be between 3 and {CHART_MAX_POINTS}")
+    return {"sheet": sheet, "charts": charts, "max_points": max_points}
+
+def render_batch_item(file_info: Optional[dict], options: dict, customizations: dict) -> tuple:
+    """Render one batch deck in memory and return (pptx bytes, summary)
+
+    options are the checked table_deck_options or chart_deck_options for the file.
+    """
+    if file_info is None:
+        # No file: just the title slide, same as /api/generate-preview
+        presentation_text, made_by_text = title_slide_texts(customizations)
+        return get_title_template().render(presentation_text, made_by_text), {"slides": 1}
+    
+    buffer = io.BytesIO()
+    if "charts" in options:
+        summary = build_chart_deck(file_info, customizations=customizations, output=buffer, **options)
+    else:
+        summary = build_table_deck(file_info, customizations=customizations, output=buffer, **options)
+    return buffer.getvalue(), summary
+
+class ZipStream:
+    """Write-only file object that hands zipfile's output to a streaming response
+
+    zipfile falls back to data descriptors when the target cannot tell()/seek(),
+    so entries can be sent as soon as they are written, with nothing on disk.
+    """
+    
+    def __init__(self):
+        self.chunks = []
+    
+    def write(self, data) -> int:
+        self.chunks.append(bytes(data))
+        return len(data)
+    
+    def flush(self):
+        pass
+    
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+# Slide thumbnails: default and largest width (pixels) and the most slides one request renders.
+# Bump SLIDE_RENDERER_VERSION whenever the drawing changes so cached thumbnails are redrawn.
+SLIDE_THUMBNAIL_WIDTH = 320
+SLIDE_THUMBNAIL_MAX_WIDTH = 1920
+SLIDE_THUMBNAILS_PER_REQUEST = int(os.environ.get("SLIDE_THUMBNAILS_PER_REQUEST", "100"))
+SLIDE_RENDERER_VERSION = 1
+# Text smaller than this many pixels is unreadable anyway and is drawn as a bar instead of glyphs
+SLIDE_TEXT_GREEK_PIXELS = 6
+EMU_PER_POINT = 12700
+
+_DML_NS = {
+    "a": "http://schemas.openxmlformats.org/drawingml/2006/main",
+    "p": "http://schemas.openxmlformats.org/presentationml/2006/main",
+    "c": "http://schemas.openxmlformats.org/drawingml/2006/chart",
+    "pkg": "http://schemas.openxmlformats.org/package/2006/relationships",
+}
+_R_ID = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}id"
+_R_EMBED = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}embed"
+
+@functools.lru_cache(maxsize=128)
+def slide_font(size: int, bold: bool = False):
+    """TrueType font at a pixel size, falling back to Pillow's built-in font"""
+    for name in (("arialbd.ttf", "DejaVuSans-Bold.ttf") if bold else ("arial.ttf", "DejaVuSans.ttf")):
+        try:
+            return ImageFont.truetype(name, size)
+        except OSError:
+            continue
+    try:
+        return ImageFont.load_default(size=size)
+    except TypeError:  # Pillow < 10.1 has a single bitmap size
+        return ImageFont.load_default()
+
+def package_part_rels(archive: zipfile.ZipFile, part: str) -> dict:
+    """{relationship id: target part name} of a package part's internal relationships"""
+    rels_name = posixpath.join(posixpath.dirname(part), "_rels", posixpath.basename(part) + ".rels")
+    try:
+        rels = ET.fromstring(archive.read(rels_name))
+    except KeyError:
+        return {}
+    targets = {}
+    for rel in rels.findall("pkg:Relationship", _DML_NS):
+        target = rel.get("Target")
+        if rel.get("TargetMode") == "External" or not target:
+            continue
+        targets[rel.get("Id")] = (
+            target.lstrip("/") if target.startswith("/") else posixpath.normpath(posixpath.join(posixpath.dirname(part), target))
+        )
+    return targets
+
+def deck_slide_parts(archive: zipfile.ZipFile) -> tuple:
+    """((slide width, slide height) in EMU, [slide part names in presentation order])"""
+    presentation = ET.fromstring(archive.read("ppt/presentation.xml"))
+    size = presentation.find("p:sldSz", _DML_NS)
+    targets = package_part_rels(archive, "ppt/presentation.xml")
+    parts = [targets[slide.get(_R_ID)] for slide in presentation.findall("p:sldIdLst/p:sldId", _DML_NS)]
+    return (int(size.get("cx")), int(size.get("cy"))), parts
+
+def slide_thumbnail_key(archive: zipfile.ZipFile, part: str, slide_size: tuple, width: int, suffix: str) -> str:
+    """Hash of a slide's XML and of the parts it draws from (media, charts), plus the render settings
+
+    Related parts are identified by the CRC-32 and size the zip already
+    stores, so a shared background image is never re-read just to be hashed.
+    """
+    digest = hashlib.sha256(json.dumps([SLIDE_RENDERER_VERSION, list(slide_size), width, suffix]).encode("utf-8"))
+    digest.update(archive.read(part))
+    for rel_id, target in sorted(package_part_rels(archive, part).items()):
+        try:
+            info = archive.getinfo(target)
+        except KeyError:
+            continue
+        digest.update(f"{rel_id}:{target}:{info.CRC}:{info.file_size}".encode("utf-8"))
+    return digest.hexdigest()
+
+def _srgb(element) -> Optional[tuple]:
+    """RGB of an element's <a:solidFill><a:srgbClr>, or None (theme colors are not resolved)"""
+    if element is None:
+        return None
+    color = element.find("a:solidFill/a:srgbClr", _DML_NS)
+    if color is None:
+        return None
+    value = color.get("val")
+    return tuple(int(value[i:i + 2], 16) for i in (0, 2, 4))
+
+def _num_cache(element) -> list:
+    """Values of a chart <c:val>/<c:xVal>/<c:yVal> from its cached points, None for gaps"""
+    if element is None:
+        return []
+    cache = element.find(".//c:numCache", _DML_NS)
+    if cache is None:
+        return []
+    count = cache.find("c:ptCount", _DML_NS)
+    points = cache.findall("c:pt", _DML_NS)
+    values = [None] * (int(count.get("val")) if count is not None else len(points))
+    for point in points:
+        index = int(point.get("idx"))
+        if index < len(values):
+            try:
+                values[index] = float(point.findtext("c:v", namespaces=_DML_NS))
+            except (TypeError, ValueError):
+                pass
+    return values
+
+class SlideRasterizer:
+    """Draws one slide of a deck with PIL, covering only the shapes our decks are built from
+
+    That is pictures, text boxes, tables and bar/column/line/scatter charts,
+    read straight from the slide XML, so no office suite is needed. Layout
+    and master content, theme colors and other chart types are not drawn;
+    the result is a thumbnail, not a faithful rendering.
+    """
+    
+    # Accent colors of python-pptx's default theme, used for chart series and table styling
+    ACCENTS = [(79, 129, 189), (192, 80, 77), (155, 187, 89), (128, 100, 162), (75, 172, 198), (247, 150, 70)]
+    TABLE_BANDS = [(208, 216, 232), (233, 237, 244)]
+    AXIS_COLOR = (134, 134, 134)
     
-    # Remove multiple spaces and replace with single underscore
-    sanitized = re.sub(r'\s+', '_', sanitized)
+    def __init__(self, archive: zipfile.ZipFile, part: str, slide_size: tuple, width: int):
+        self.archive = archive
+        self.part = part
+        self.rels = package_part_rels(archive, part)
+        self.scale = width / slide_size[0]
+        self.size = (width, max(int(round(slide_size[1] * self.scale)), 1))
     
-    # Remove leading/trailing dots and spaces
-    sanitized = sanitized.strip('._')
+    def box(self, xfrm) -> Optional[tuple]:
+        """Pixel box (left, top, right, bottom) of an <a:xfrm>/<p:xfrm>"""
+        if xfrm is None:
+            return None
+        offset, extent = xfrm.find("a:off", _DML_NS), xfrm.find("a:ext", _DML_NS)
+        if offset is None or extent is None:
+            return None
+        left, top = int(offset.get("x")) * self.scale, int(offset.get("y")) * self.scale
+        return left, top, left + int(extent.get("cx")) * self.scale, top + int(extent.get("cy")) * self.scale
     
-    # Limit length to reasonable size
-    if len(sanitized) > 100:
-        sanitized = sanitized[:100]
+    def font_pixels(self, size: int) -> int:
+        """Pixel height of a font size in hundredths of a point"""
+        return max(int(round(size / 100 * EMU_PER_POINT * self.scale)), 1)
     
-    # Ensure it's not empty after sanitization
-    if not sanitized:
-        sanitized = "Presentation"
+    def render(self) -> Image.Image:
+        slide = ET.fromstring(self.archive.read(self.part))
+        background = _srgb(slide.find("p:cSld/p:bg/p:bgPr", _DML_NS))
+        img = Image.new("RGB", self.size, color=background or (255, 255, 255))
+        draw = ImageDraw.Draw(img)
+        
+        tree = slide.find("p:cSld/p:spTree", _DML_NS)
+        for shape in (tree if tree is not None else []):
+            tag = shape.tag.rsplit("}", 1)[-1]
+            if tag == "pic":
+                self.draw_picture(img, shape)
+            elif tag == "sp":
+                self.draw_shape(draw, shape)
+            elif tag == "graphicFrame":
+                self.draw_graphic_frame(draw, shape)
+        return img
     
-    return sanitized
-
-@app.post("/api/upload")
-async def upload_file(file: UploadFile = File(...)):
-    """Upload and process Excel file"""
-    try:
-        # Validate file type
-        allowed_types = [
-            "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",  # .xlsx
-            "application/vnd.ms-excel",  # .xls
-            "text/csv"  # .csv
+    def draw_picture(self, img: Image.Image, pic):
+        box = self.box(pic.find("p:spPr/a:xfrm", _DML_NS))
+        blip = pic.find("p:blipFill/a:blip", _DML_NS)
+        target = self.rels.get(blip.get(_R_EMBED)) if blip is not None else None
+        if box is None or target is None:
+            return
+        size = (max(int(round(box[2] - box[0])), 1), max(int(round(box[3] - box[1])), 1))
+        with Image.open(io.BytesIO(self.archive.read(target))) as picture:
+            picture.draft("RGB", size)  # JPEG decodes straight at a reduced scale
+            picture = picture.convert("RGBA").resize(size, Image.Resampling.BILINEAR)
+        img.paste(picture, (int(round(box[0])), int(round(box[1]))), picture)
+    
+    def draw_shape(self, draw: ImageDraw.ImageDraw, shape):
+        sp_pr = shape.find("p:spPr", _DML_NS)
+        box = self.box(sp_pr.find("a:xfrm", _DML_NS) if sp_pr is not None else None)
+        if box is None:
+            return
+        fill = _srgb(sp_pr)
+        if fill is not None:
+            draw.rectangle(box, fill=fill)
+        body = shape.find("p:txBody", _DML_NS)
+        if body is not None:
+            self.draw_text_body(draw, body, box, fill or (255, 255, 255))
+    
+    def draw_text_body(self, draw: ImageDraw.ImageDraw, body, box: tuple, background: tuple = (255, 255, 255)):
+        """Paragraphs top-down inside the box, styled by their first run"""
+        body_pr = body.find("a:bodyPr", _DML_NS)
+        insets = [
+            int(body_pr.get(name, default)) * self.scale if body_pr is not None else default * self.scale
+            for name, default in (("lIns", 91440), ("tIns", 45720), ("rIns", 91440))
         ]
+        wrap = body_pr is None or body_pr.get("wrap") != "none"
+        left = box[0] + insets[0]
+        max_width = max(box[2] - box[0] - insets[0] - insets[2], 1)
+        y = box[1] + insets[1]
         
-        if file.content_type not in allowed_types:
-            raise HTTPException(status_code=400, detail="Invalid file type. Please upload Excel or CSV files only.")
-        
-        # Generate unique file ID
-        file_id = str(uuid.uuid4())
+        for paragraph in body.findall("a:p", _DML_NS):
+            runs = paragraph.findall("a:r", _DML_NS)
+            text = "".join(run.findtext("a:t", default="", namespaces=_DML_NS) for run in runs)
+            p_pr = paragraph.find("a:pPr", _DML_NS)
+            # Run properties, then the paragraph's defaults, then the end-of-paragraph properties
+            styles = [runs[0].find("a:rPr", _DML_NS) if runs else None,
+                      p_pr.find("a:defRPr", _DML_NS) if p_pr is not None else None,
+                      paragraph.find("a:endParaRPr", _DML_NS)]
+            styles = [style for style in styles if style is not None]
+            size = next((int(style.get("sz")) for style in styles if style.get("sz")), 1800)
+            bold = next((style.get("b") == "1" for style in styles if style.get("b")), False)
+            color = next((rgb for rgb in map(_srgb, styles) if rgb is not None), (0, 0, 0))
+            align = p_pr.get("algn") if p_pr is not None else None
+            
+            pixels = self.font_pixels(size)
+            if pixels < SLIDE_TEXT_GREEK_PIXELS:
+                font = None
+                lines = [text]
+            else:
+                font = slide_font(pixels, bold)
+                lines = wrap_words(text, font, max_width) if wrap and text else [text]
+            for line in lines:
+                if y >= self.size[1]:
+                    return
+                if line:
+                    line_width = min(greeked_width(line, pixels), max_width) if font is None else font.getlength(line)
+                    x = left + {"ctr": (max_width - line_width) / 2, "r": max_width - line_width}.get(align, 0)
+                    self.draw_text_line(draw, (x, y), line, font, pixels, color, line_width, background)
+                y += pixels * 1.2
+    
+    def draw_text_line(self, draw: ImageDraw.ImageDraw, xy: tuple, text: str, font, pixels: int, color: tuple,
+                       width: float = 0, background: tuple = (255, 255, 255)):
+        """One line of text; with no font (too small to read) a bar of the given width stands in for it"""
+        if font is not None:
+            draw.text(xy, text, fill=color, font=font)
+        elif width >= 1:
+            # Halfway to the background, about as dark as a line of small text looks from afar
+            shade = tuple((c + b) // 2 for c, b in zip(color, background))
+            x, y = xy
+            draw.rectangle([x, y + pixels * 0.35, x + width, y + pixels * 0.35 + max(pixels * 0.4, 1) - 1], fill=shade)
+    
+    def draw_graphic_frame(self, draw: ImageDraw.ImageDraw, frame):
+        box = self.box(frame.find("p:xfrm", _DML_NS))
+        data = frame.find("a:graphic/a:graphicData", _DML_NS)
+        if box is None or data is None:
+            return
+        table = data.find("a:tbl", _DML_NS)
+        if table is not None:
+            self.draw_table(draw, table, box)
+            return
+        chart = data.find("c:chart", _DML_NS)
+        target = self.rels.get(chart.get(_R_ID)) if chart is not None else None
+        if target is not None:
+            self.draw_chart(draw, ET.fromstring(self.archive.read(target)), box)
+    
+    def draw_table(self, draw: ImageDraw.ImageDraw, table, box: tuple):
+        """Cells on a grid, shaded like a Medium Style 2 table (accent header row, banded rows)"""
+        widths = [int(col.get("w")) * self.scale for col in table.findall("a:tblGrid/a:gridCol", _DML_NS)]
+        table_pr = table.find("a:tblPr", _DML_NS)
+        header = table_pr is not None and table_pr.get("firstRow") == "1"
+        banded = table_pr is not None and table_pr.get("bandRow") == "1"
+        inset = 91440 * self.scale
         
-        # Save file to disk
-        file_path = UPLOAD_DIR / f"{file_id}_{file.filename}"
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+        y = box[1]
+        for row_index, row in enumerate(table.findall("a:tr", _DML_NS)):
+            if y >= self.size[1]:
+                break
+            height = int(row.get("h")) * self.scale
+            is_header = header and row_index == 0
+            band = row_index - header
+            fill = self.ACCENTS[0] if is_header else self.TABLE_BANDS[band % 2 if banded else 1]
+            x = box[0]
+            for cell, width in zip(row.findall("a:tc", _DML_NS), widths):
+                draw.rectangle([x, y, x + width, y + height], fill=fill, outline=(255, 255, 255))
+                paragraph = cell.find("a:txBody/a:p", _DML_NS)
+                runs = paragraph.findall("a:r", _DML_NS) if paragraph is not None else []
+                text = "".join(run.findtext("a:t", default="", namespaces=_DML_NS) for run in runs)
+                if text:
+                    r_pr = runs[0].find("a:rPr", _DML_NS)
+                    size = int(r_pr.get("sz", 1800)) if r_pr is not None else 1800
+                    pixels = self.font_pixels(size)
+                    color = (255, 255, 255) if is_header else (0, 0, 0)
+                    xy = (x + inset, y + (height - pixels) / 2)
+                    if pixels < SLIDE_TEXT_GREEK_PIXELS:
+                        self.draw_text_line(draw, xy, text, None, pixels, color,
+                                            min(greeked_width(text, pixels), width - 2 * inset), fill)
+                    else:
+                        font = slide_font(pixels, is_header or (r_pr is not None and r_pr.get("b") == "1"))
+                        text = fit_text(text, font, width - 2 * inset)
+                        if text:
+                            self.draw_text_line(draw, xy, text, font, pixels, color)
+                x += width
+            y += height
+    
+    def draw_chart(self, draw: ImageDraw.ImageDraw, chart_space, box: tuple):
+        """Axes and series of the first bar, line or scatter plot of a chart part"""
+        plot_area = chart_space.find("c:chart/c:plotArea", _DML_NS)
+        if plot_area is None:
+            return
+        plot = next((element for element in plot_area
+                     if element.tag.rsplit("}", 1)[-1] in ("barChart", "lineChart", "scatterChart")), None)
+        if plot is None:
+            return
+        kind = plot.tag.rsplit("}", 1)[-1]
         
-        # Read Excel file to get sheet names
-        try:
-            if file.filename.endswith('.csv'):
-                df = pd.read_csv(file_path)
-                sheets = ["Sheet1"]  # CSV files have only one sheet
+        series = []
+        for ser in plot.findall("c:ser", _DML_NS):
+            if kind == "scatterChart":
+                ys = _num_cache(ser.find("c:yVal", _DML_NS))
+                xs = _num_cache(ser.find("c:xVal", _DML_NS)) or [float(i) for i in range(len(ys))]
             else:
-                excel_file = pd.ExcelFile(file_path)
-                sheets = excel_file.sheet_names
-        except Exception as e:
-            # Clean up file if reading fails
-            os.remove(file_path)
-            raise HTTPException(status_code=400, detail=f"Error reading Excel file: {str(e)}")
-        
-        # Store file metadata
-        file_storage[file_id] = {
-            "filename": file.filename,
-            "filepath": str(file_path),
-            "sheets": sheets,
-            "content_type": file.content_type
-        }
+                ys = _num_cache(ser.find("c:val", _DML_NS))
+                xs = [float(i) for i in range(len(ys))]
+            marker = ser.find("c:marker/c:symbol", _DML_NS)
+            series.append((xs, ys, marker is not None and marker.get("val") == "none"))
+        values = [y for _, ys, _ in series for y in ys if y is not None]
+        if not values:
+            return
         
-        return JSONResponse(content={
-            "fileId": file_id,
-            "filename": file.filename,
-            "sheets": sheets,
-            "message": "File uploaded successfully"
-        })
+        box_width, box_height = box[2] - box[0], box[3] - box[1]
+        left, top = box[0] + 0.08 * box_width, box[1] + 0.06 * box_height
+        right, bottom = box[2] - 0.04 * box_width, box[3] - 0.12 * box_height
+        low, high = min(0.0, min(values)), max(0.0, max(values))
+        if high == low:
+            high = low + 1
+        line_width = max(int(round(self.size[0] / 640)), 1)
+        horizontal = kind == "barChart" and plot.find("c:barDir", _DML_NS) is not None \
+            and plot.find("c:barDir", _DML_NS).get("val") == "bar"
         
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
-
-@app.get("/api/files/{file_id}/data")
-async def get_file_data(file_id: str):
-    """Get Excel file data for processing"""
-    if file_id not in file_storage:
-        raise HTTPException(status_code=404, detail="File not found")
-    
-    try:
-        file_info = file_storage[file_id]
-        filepath = file_info["filepath"]
+        def value_y(value):
+            return bottom - (value - low) / (high - low) * (bottom - top)
         
-        # Read all sheets from Excel file
-        sheets_data = {}
+        def value_x(value):
+            return left + (value - low) / (high - low) * (right - left)
         
-        if file_info["filename"].endswith('.csv'):
-            df = pd.read_csv(filepath)
-            sheets_data["Sheet1"] = df.fillna("").values.tolist()
+        if horizontal:
+            zero = value_x(0.0)
+            draw.line([(zero, top), (zero, bottom)], fill=self.AXIS_COLOR, width=1)
         else:
-            excel_file = pd.ExcelFile(filepath)
-            for sheet_name in excel_file.sheet_names:
-                df = pd.read_excel(filepath, sheet_name=sheet_name)
-                # Convert to list of lists, filling NaN with empty strings
-                sheets_data[sheet_name] = df.fillna("").values.tolist()
+            zero = value_y(0.0)
+            draw.line([(left, zero), (right, zero)], fill=self.AXIS_COLOR, width=1)
+            draw.line([(left, top), (left, bottom)], fill=self.AXIS_COLOR, width=1)
         
-        return JSONResponse(content={
-            "fileId": file_id,
-            "filename": file_info["filename"],
-            "sheets": sheets_data
-        })
+        if kind == "barChart":
+            categories = max(len(ys) for _, ys, _ in series)
+            span = (bottom - top) if horizontal else (right - left)
+            group = span / max(categories, 1)
+            bar = group * 0.7 / len(series)
+            for index, (_, ys, _) in enumerate(series):
+                color = self.ACCENTS[index % len(self.ACCENTS)]
+                for category, value in enumerate(ys):
+                    if value is None:
+                        continue
+                    start = group * category + group * 0.15 + bar * index
+                    if horizontal:
+                        # Category 0 sits at the bottom, as in PowerPoint
+                        y1 = bottom - start
+                        draw.rectangle([min(zero, value_x(value)), y1 - bar, max(zero, value_x(value)), y1], fill=color)
+                    else:
+                        x0 = left + start
+                        draw.rectangle([x0, min(zero, value_y(value)), x0 + bar, max(zero, value_y(value))], fill=color)
+            return
         
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error reading file data: {str(e)}")
+        if kind == "scatterChart":
+            xs_all = [x for xs, _, _ in series for x in xs if x is not None]
+            x_low, x_high = min(xs_all), max(xs_all)
+        else:
+            x_low, x_high = -0.5, max(len(ys) for _, ys, _ in series) - 0.5
+        if x_high == x_low:
+            x_high = x_low + 1
+        radius = max(line_width, 1)
+        for index, (xs, ys, no_markers) in enumerate(series):
+            color = self.ACCENTS[index % len(self.ACCENTS)]
+            points = [
+                (left + (x - x_low) / (x_high - x_low) * (right - left), value_y(y))
+                for x, y in zip(xs, ys) if x is not None and y is not None
+            ]
+            if kind == "scatterChart" and not no_markers:
+                for x, y in points:
+                    draw.ellipse([x - radius, y - radius, x + radius, y + radius], fill=color)
+            elif len(points) > 1:
+                draw.line(points, fill=color, width=line_width)
 
-@app.delete("/api/clear-all")
-async def clear_all_uploads():
-    """Delete all uploaded files and clear storage from all directories"""
-    try:
-        deleted_files = []
-        errors = []
-        
-        # Directories to clean
-        directories_to_clean = [
-            ("uploads", UPLOAD_DIR),
-            ("previews", PREVIEW_DIR), 
-            ("images", IMAGES_DIR)
-        ]
-        
-        # Clear in-memory storage first to release any file handles
-        file_storage.clear()
-        print("Cleared file_storage dictionary")
-        
-        # Force garbage collection to release file handles
-        import gc
-        gc.collect()
-        
-        # Clear all files from each directory
-        for dir_name, dir_path in directories_to_clean:
-            if dir_path.exists():
-                print(f"Cleaning {dir_name} directory...")
-                for file_path in dir_path.glob("*"):
-                    if file_path.is_file():
-                        try:
-                            # Try to delete file normally first
-                            file_path.unlink()
-                            deleted_files.append(f"{dir_name}/{file_path.name}")
-                            print(f"Deleted file: {file_path}")
-                        except PermissionError as e:
-                            # If file is locked, try multiple methods to force delete
-                            deleted_successfully = False
-                            try:
-                                import subprocess
-                                import time
-                                
-                                if platform.system() == "Windows":
-                                    # Method 1: Try del command
-                                    result = subprocess.run(['cmd', '/c', f'del /F /Q "{file_path}"'], 
-                                                          capture_output=True, text=True)
-                                    
-                                    # Wait a moment and check if file was actually deleted
-                                    time.sleep(0.1)
-                                    if not file_path.exists():
-                                        deleted_files.append(f"{dir_name}/{file_path.name}")
-                                        print(f"Force deleted locked file with del: {file_path}")
-                                        deleted_successfully = True
-                                    else:
-                                        # Method 2: Try using os.remove with retry
-                                        for attempt in range(3):
-                                            try:
-                                                time.sleep(0.1)
-                                                os.remove(str(file_path))
-                                                deleted_files.append(f"{dir_name}/{file_path.name}")
-                                                print(f"Deleted locked file on retry {attempt + 1}: {file_path}")
-                                                deleted_successfully = True
-                                                break
-                                            except:
-                                                continue
-                                
-                                if not deleted_successfully:
-                                    error_msg = f"Failed to delete locked file {dir_name}/{file_path.name}: File remains locked"
-                                    errors.append(error_msg)
-                                    print(f"Cannot delete locked file after all attempts: {file_path}")
-                                    
-                            except Exception as e2:
-                                error_msg = f"Failed to delete {dir_name}/{file_path.name}: {str(e2)}"
-                                errors.append(error_msg)
-                                print(f"Error force deleting {file_path}: {e2}")
-                        except Exception as e:
-                            error_msg = f"Failed to delete {dir_name}/{file_path.name}: {str(e)}"
-                            errors.append(error_msg)
-                            print(f"Error deleting {file_path}: {e}")
-            else:
-                print(f"Directory {dir_name} does not exist")
-        
-        # File storage already cleared above
-        
-        return JSONResponse(content={
-            "message": "All files cleared successfully from uploads, previews, and images directories",
-            "deleted_files": deleted_files,
-            "errors": errors,
-            "total_deleted": len(deleted_files),
-            "directories_cleaned": ["uploads", "previews", "images"]
-        })
-        
-    except Exception as e:
-        print(f"Error clearing all files: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Error clearing all files: {str(e)}")
+def wrap_words(text: str, font, max_width: float) -> list:
+    """Greedy word wrap; a word wider than the line gets a line of its own"""
+    lines = []
+    current = ""
+    for word in text.split(" "):
+        candidate = f"{current} {word}" if current else word
+        if not current or font.getlength(candidate) <= max_width:
+            current = candidate
+        else:
+            lines.append(current)
+            current = word
+    lines.append(current)
+    return lines
 
-@app.delete("/api/upload/{file_id}")
-async def delete_file(file_id: str):
-    """Delete uploaded file"""
-    print(f"DELETE request for file_id: {file_id}")
-    print(f"Current file_storage keys: {list(file_storage.keys())}")
+def greeked_width(text: str, pixels: int) -> float:
+    """Approximate width of text in a font of the given pixel size (half an em per character)"""
+    return len(text) * pixels * 0.5
+
+def fit_text(text: str, font, max_width: float) -> str:
+    """text cut short (with an ellipsis) to fit max_width pixels"""
+    if font.getlength(text) <= max_width:
+        return text
+    # Start from an estimate of how many characters fit, then trim
+    keep = int(len(text) * max_width / max(font.getlength(text), 1))
+    while keep > 0 and font.getlength(text[:keep] + "…") > max_width:
+        keep -= 1
+    return text[:keep] + "…" if keep > 0 else ""
+
+@timed("slide_render")
+def render_slide_thumbnail(deck_path: str, part: str, slide_size: tuple, width: int, output_path: str, image_format: str):
+    """Rasterize one slide of a deck to output_path (runs in a pool worker)"""
+    with zipfile.ZipFile(deck_path) as archive:
+        img = SlideRasterizer(archive, part, slide_size, width).render()
+    # Written aside and renamed, so a concurrent reader never sees half a file
+    temp_path = f"{output_path}.{uuid.uuid4().hex[:8]}.tmp"
+    if image_format == "WEBP":
+        img.save(temp_path, format="WEBP", quality=PREVIEW_WEBP_QUALITY)
+    else:
+        img.save(temp_path, format="PNG", compress_level=PREVIEW_PNG_COMPRESS_LEVEL)
+    os.replace(temp_path, output_path)
+
+def plan_slide_thumbnails(deck_path: Path, width: int, start: int, limit: int) -> dict:
+    """Cache keys and thumbnail files of slides start..start+limit-1 (1-based) of a deck"""
+    image_format, suffix = thumbnail_format()
+    with zipfile.ZipFile(deck_path) as archive:
+        slide_size, parts = deck_slide_parts(archive)
+        slides = []
+        for number, part in enumerate(parts[start - 1:start - 1 + limit], start):
+            key = slide_thumbnail_key(archive, part, slide_size, width, suffix)
+            filename = f"slide_{key[:32]}{suffix}"
+            slides.append({"slide": number, "part": part, "key": key, "file": filename,
+                           "cached": (IMAGES_DIR / filename).exists()})
+    return {"slideCount": len(parts), "slideSize": slide_size, "format": image_format, "slides": slides}
+
+# Slide renders in progress by cache key, shared by concurrent requests for the same slide
+_slide_renders = {}
+
+async def render_slide_thumbnails(deck_path: Path, width: int, start: int, limit: int) -> dict:
+    """Thumbnails for a range of slides: cached ones as-is, the rest rendered in parallel on the CPU pool"""
+    plan = await io_pool.run(plan_slide_thumbnails, deck_path, width, start, limit)
+    misses = [slide for slide in plan["slides"] if not slide["cached"]]
+    metrics.inc("cache_requests_total", len(plan["slides"]) - len(misses), cache="slide_thumbnail", result="hit")
+    metrics.inc("cache_requests_total", len(misses), cache="slide_thumbnail", result="miss")
     
-    if file_id not in file_storage:
-        print(f"File not found in storage: {file_id}")
-        raise HTTPException(status_code=404, detail="File not found in storage")
+    # One slot per worker, like batches, so a long deck cannot fill the pool's queue
+    limit = asyncio.Semaphore(cpu_pool.max_workers)
     
-    try:
-        file_info = file_storage[file_id]
-        filepath = file_info["filepath"]
-        print(f"Attempting to delete file at: {filepath}")
-        
-        # Remove from storage first to release file handle
-        del file_storage[file_id]
-        print(f"File removed from storage: {file_id}")
-        
-        # Force garbage collection to release file handles
-        import gc
-        gc.collect()
-        
-        # Delete file from disk with improved error handling
-        if os.path.exists(filepath):
-            try:
-                # Try normal deletion first
-                os.remove(filepath)
-                print(f"File deleted from disk: {filepath}")
-            except PermissionError as e:
-                # If file is locked, try multiple methods
-                deleted_successfully = False
-                try:
-                    import subprocess
-                    import time
-                    
-                    if platform.system() == "Windows":
-                        # Method 1: Try del command
-                        result = subprocess.run(['cmd', '/c', f'del /F /Q "{filepath}"'], 
-                                              capture_output=True, text=True)
-                        
-                        # Wait and check if file was deleted
-                        time.sleep(0.1)
-                        if not os.path.exists(filepath):
-                            print(f"Force deleted locked file with del: {filepath}")
-                            deleted_successfully = True
-                        else:
-                            # Method 2: Retry with os.remove
-                            for attempt in range(3):
-                                try:
-                                    time.sleep(0.1)
-                                    os.remove(filepath)
-                                    print(f"Deleted locked file on retry {attempt + 1}: {filepath}")
-                                    deleted_successfully = True
-                                    break
-                                except:
-                                    continue
-                    
-                    if not deleted_successfully:
-                        print(f"Warning: Could not delete locked file: {filepath}")
-                        # Don't raise error - file is removed from storage anyway
-                        
-                except Exception as e2:
-                    print(f"Error force deleting {filepath}: {e2}")
-                    # Don't raise error - file is removed from storage anyway
-        else:
-            print(f"File not found on disk: {filepath}")
-        
-        return JSONResponse(content={"message": "File deleted successfully"})
-        
-    except Exception as e:
-        print(f"Error deleting file: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Error deleting file: {str(e)}")
+    async def render_limited(slide: dict):
+        async with limit:
+            await cpu_pool.run(
+                render_slide_thumbnail, str(deck_path), slide["part"], plan["slideSize"], width,
+                str(IMAGES_DIR / slide["file"]), plan["format"]
+            )
+    
+    async def render(slide: dict):
+        key = slide["key"]
+        task = _slide_renders.get(key)
+        if task is None:
+            task = asyncio.ensure_future(render_limited(slide))
+            _slide_renders[key] = task
+            task.add_done_callback(lambda _task, key=key: _slide_renders.pop(key, None))
+        try:
+            await asyncio.shield(task)
+        except HTTPException:
+            raise
+        except Exception as e:
+            # One slide that cannot be drawn should not cost the caller the rest
+            logger.error("Error rendering slide %s of %s: %s", slide["slide"], deck_path.name, e)
+            slide["error"] = str(e)
+    
+    await asyncio.gather(*(render(slide) for slide in misses))
+    return plan
 
+class PreviewCache:
+    """LRU index of rendered previews, bounded by the bytes their files take on disk"""
+    
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def _paths(result: dict) -> list:
+        return [
+            PREVIEW_DIR / result["previewFile"],
+            IMAGES_DIR / result["imageFile"],
+            IMAGES_DIR / result["thumbnailFile"]
+        ]
+    
+    def get(self, key: str):
+        with self._lock:
+            entry = self.entries.get(key)
+            # Files may have been removed behind our back (e.g. by clear-all)
+            if entry is not None and not all(path.exists() for path in self._paths(entry["result"])):
+                self.total_bytes -= self.entries.pop(key)["bytes"]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry["result"]
+    
+    def put(self, key: str, result: dict):
+        size = sum(path.stat().st_size for path in self._paths(result) if path.exists())
+        with self._lock:
+            if key in self.entries:
+                self.total_bytes -= self.entries.pop(key)["bytes"]
+            self.entries[key] = {"result": result, "bytes": size}
+            self.total_bytes += size
+            
+            # Evict least recently used renders, but always keep the one just added
+            while self.total_bytes > self.max_bytes and len(self.entries) > 1:
+                _, evicted = self.entries.popitem(last=False)
+                self.total_bytes -= evicted["bytes"]
+                self.evictions += 1
+                for path in self._paths(evicted["result"]):
+                    try:
+                        path.unlink()
+                    except FileNotFoundError:
+                        pass
+                    except Exception as e:
+                        logger.error("Error deleting evicted preview %s: %s", path, e)
+    
+    def clear(self):
+        with self._lock:
+            self.entries.clear()
+            self.total_bytes = 0
+    
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "bytes": self.total_bytes,
+            "maxBytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hitRate": self.hits / lookups if lookups else 0.0
+        }
 
-def create_powerpoint_preview_image(customizations: dict, output_path: Path) -> bool:
-    """Create a preview image that matches the PowerPoint layout using FirstPage.png"""
-    try:
-        from PIL import Image, ImageDraw, ImageFont
-        
-        # Load FirstPage.png as the base image
-        background_path = Path("FirstPage.png")
-        if background_path.exists():
-            try:
-                img = Image.open(background_path)
-                # Resize to PowerPoint dimensions if needed
-                width, height = 1280, 720
-                img = img.resize((width, height), Image.Resampling.LANCZOS)
-                print("Loaded FirstPage.png as base image")
-            except Exception as e:
-                print(f"Error loading FirstPage.png: {e}")
-                # Fallback: create blank image
-                width, height = 1280, 720
-                img = Image.new('RGB', (width, height), color=(245, 245, 245))
-        else:
-            print("FirstPage.png not found, creating blank image")
-            width, height = 1280, 720
-            img = Image.new('RGB', (width, height), color=(245, 245, 245))
-        
-        draw = ImageDraw.Draw(img)
-        
-        # Try to use system fonts with specific sizes, fallback to default
-        try:
-            presentation_font = ImageFont.truetype("arial.ttf", 25)  # 18.5pt equivalent for preview
-            made_by_font = ImageFont.truetype("arial.ttf", 21)  # 16pt equivalent for preview
-        except:
-            presentation_font = ImageFont.load_default()
-            made_by_font = ImageFont.load_default()
-        
-        # Add presentation title text (positioned under TAOGLAS logo, right side)
-        presentation_text = customizations.get("presentationTo", "")
-        if presentation_text and presentation_text != "Presentation to":
-            text_to_show = presentation_text
-        else:
-            text_to_show = "Presentation to (Ex: Taoglas internal, XXX company...etc)"
-        
-        # Position under TAOGLAS logo, right side (matching screenshot)
-        title_x = 850  # Right side, under logo - moved much further to the right
-        title_y = 280  # Moved down 25% more from TAOGLAS logo
-        text_box_width = 350  # Width for text wrapping - increased to match PowerPoint
-        
-        # Text wrapping function
-        def wrap_text(text, font, max_width):
-            words = text.split(' ')
-            lines = []
-            current_line = ""
+preview_cache = PreviewCache(PREVIEW_CACHE_MAX_BYTES)
+# Renders in progress by cache key, so identical concurrent requests share one render
+_preview_renders = {}
+# Cancellation checks of the callers waiting on each of those renders (None = never cancels)
+_preview_waiters = {}
+
+class PreviewSuperseded(Exception):
+    """Raised inside a render once every caller waiting for it has moved on"""
+
+def preview_cache_key(customizations: dict) -> str:
+    background_path = Path("FirstPage.png")
+    background = _source_signature(background_path) if background_path.exists() else None
+    payload = json.dumps({
+        "template": PREVIEW_TEMPLATE_VERSION,
+        "background": background,
+        "backgroundAsset": [BACKGROUND_ASSET_DPI, BACKGROUND_ASSET_QUALITY],
+        "customizations": customizations
+    }, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+async def render_preview_cached(customizations: dict, progress=None, timeout: float = None, cancelled=None) -> dict:
+    """render_preview() on the CPU pool, reusing an earlier render of the same key
+
+    cancelled, if given, is a thread-safe callable. Once it and the checks of
+    all other callers sharing the render return True, the render stops at its
+    next stage and PreviewSuperseded is raised. With a process pool the render
+    can only be dropped before it is submitted.
+    """
+    key = preview_cache_key(customizations)
+    result = preview_cache.get(key)
+    if result is not None:
+        return result
+    
+    while True:
+        task = _preview_renders.get(key)
+        if task is None:
+            waiters = []
             
-            for word in words:
-                test_line = current_line + (" " if current_line else "") + word
-                bbox = draw.textbbox((0, 0), test_line, font=font)
-                if bbox[2] - bbox[0] <= max_width:
-                    current_line = test_line
-                else:
-                    if current_line:
-                        lines.append(current_line)
-                        current_line = word
-                    else:
-                        lines.append(word)  # Single word is too long, add anyway
+            def abandoned(waiters=waiters) -> bool:
+                return bool(waiters) and all(check is not None and check() for check in waiters)
             
-            if current_line:
-                lines.append(current_line)
+            def check_progress(stage: str, percent: int):
+                if abandoned():
+                    raise PreviewSuperseded(key)
+                if progress:
+                    progress(stage, percent)
             
-            return lines
-        
-        # Wrap text to fit in box
-        wrapped_lines = wrap_text(text_to_show, presentation_font, text_box_width)
-        
-        # Calculate total text height
-        line_height = 30
-        total_text_height = len(wrapped_lines) * line_height
-        
-        # Draw text box border (removed - no border for cleaner look)
-        box_padding = 10
-        # draw.rectangle([
-        #     title_x - box_padding,
-        #     title_y - box_padding,
-        #     title_x + text_box_width + box_padding,
-        #     title_y + total_text_height + box_padding
-        # ], outline=(200, 200, 200), width=2)
-        
-        # Draw wrapped text (left aligned)
-        for i, line in enumerate(wrapped_lines):
-            line_y = title_y + (i * line_height)
-            draw.text((title_x, line_y), line, fill=(68, 68, 68), font=presentation_font)
-        
-        # Add "Made by" text (bottom right)
-        made_by_text = customizations.get("madeBy", "")
-        if made_by_text and made_by_text != "Made by":
-            made_by_to_show = made_by_text
-        else:
-            made_by_to_show = "Made by:"
-        
-        # Position at bottom right (aligned with presentation text box)
-        made_by_bbox = draw.textbbox((0, 0), made_by_to_show, font=made_by_font)
-        made_by_width = made_by_bbox[2] - made_by_bbox[0]
-        made_by_height = made_by_bbox[3] - made_by_bbox[1]
-        made_by_x = width - made_by_width - 20  # Right aligned positioning - closer to edge
-        made_by_y = height - made_by_height - 50
-        
-        # Draw made by text box border (removed - no border for cleaner look)
-        # draw.rectangle([
-        #     made_by_x - box_padding,
-        #     made_by_y - box_padding,
-        #     made_by_x + made_by_width + box_padding,
-        #     made_by_y + made_by_height + box_padding
-        # ], outline=(200, 200, 200), width=2)
-        
-        # Draw the text (right aligned within its box)
-        draw.text((made_by_x, made_by_y), made_by_to_show, fill=(68, 68, 68), font=made_by_font)
-        
-        # Save the image
-        img.save(str(output_path), 'PNG')
-        print(f"Preview image created: {output_path}")
-        return True
+            async def render():
+                if abandoned():
+                    raise PreviewSuperseded(key)
+                # The closure cannot be pickled, so process workers only get the plain callback
+                stage_callback = progress if cpu_pool.kind == "process" else check_progress
+                # Filenames derive from the key, so a repeat render overwrites rather than duplicates
+                result = await cpu_pool.run(render_preview, customizations, progress=stage_callback, render_id=key[:12], timeout=timeout)
+                preview_cache.put(key, result)
+                return result
+            
+            _preview_waiters[key] = waiters
+            task = asyncio.ensure_future(render())
+            _preview_renders[key] = task
+            
+            def forget(_task, key=key):
+                _preview_renders.pop(key, None)
+                _preview_waiters.pop(key, None)
+            task.add_done_callback(forget)
         
-    except Exception as e:
-        print(f"Error creating preview image: {e}")
-        return False
+        waiters = _preview_waiters[key]
+        waiters.append(cancelled)
+        try:
+            # shield: one caller giving up must not cancel the render for the others
+            return await asyncio.shield(task)
+        except PreviewSuperseded:
+            if cancelled is not None and cancelled():
+                raise
+            # Everyone else gave up on it just before we joined; render it again for us
+        finally:
+            waiters.remove(cancelled)
 
 @app.post("/api/generate-preview")
-async def generate_preview_ppt(data: dict):
-    """Generate a live preview PowerPoint with current customizations"""
+async def generate_preview_ppt(data: dict, mode: Optional[str] = None):
+    """Generate a live preview PowerPoint with current customizations
+
+    With ?mode=job the request returns 202 and a job id right away; the
+    result is fetched from /api/jobs/{job_id}/result once it is ready.
+    """
     try:
         file_id = data.get("fileId")
         customizations = data.get("customizations", {})
@@ -453,114 +4398,333 @@ async def generate_preview_ppt(data: dict):
         if not file_id or file_id not in file_storage:
             raise HTTPException(status_code=404, detail="File not found")
         
-        # Create a new presentation with better design
-        prs = Presentation()
-        
-        # Create first slide (title slide)
-        slide_layout = prs.slide_layouts[6]  # Blank layout
-        slide = prs.slides.add_slide(slide_layout)
+        if mode == "job":
+            job = submit_job(
+                "preview",
+                lambda progress: render_preview_cached(customizations, progress=progress, timeout=JOB_TIMEOUT)
+            )
+            return JSONResponse(status_code=202, content=job_status(job))
         
-        # Set slide dimensions (16:9)
-        prs.slide_width = Inches(13.33)
-        prs.slide_height = Inches(7.5)
+        # Build the deck and image on the worker pool (or reuse an identical earlier render)
+        result = await render_preview_cached(customizations)
+        return JSONResponse(content=result)
         
-        # Add FirstPage.png as background image
-        background_image_path = Path("FirstPage.png")
-        if background_image_path.exists():
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.exception("Error generating preview: %s", e)
+        raise HTTPException(status_code=500, detail=f"Error generating preview: {str(e)}")
+
+class LivePreviewSession:
+    """Latest-wins preview rendering for one live-preview WebSocket
+
+    Only the newest request is kept while a render runs; a render that a
+    newer request has overtaken is stopped at its next stage, and its frame
+    is never sent.
+    """
+    
+    def __init__(self, websocket: WebSocket):
+        self.websocket = websocket
+        self.generation = 0
+        self.pending = None
+        self.wake = asyncio.Event()
+    
+    def submit(self, request_id, customizations: dict):
+        if self.pending is not None:
+            metrics.inc("live_preview_requests_total", outcome="coalesced")
+        self.generation += 1
+        self.pending = (self.generation, request_id, customizations)
+        self.wake.set()
+    
+    async def run(self):
+        while True:
+            await self.wake.wait()
+            self.wake.clear()
+            generation, request_id, customizations = self.pending
+            self.pending = None
+            
             try:
-                # Add the background image to cover the entire slide
-                slide.shapes.add_picture(
-                    str(background_image_path), 
-                    0, 0,  # Position at top-left corner
-                    prs.slide_width, 
-                    prs.slide_height
+                result = await render_preview_cached(
+                    customizations, cancelled=lambda: self.generation != generation
                 )
-                print("Added FirstPage.png as background")
+            except PreviewSuperseded:
+                metrics.inc("live_preview_requests_total", outcome="superseded")
+                continue
+            except HTTPException as e:
+                metrics.inc("live_preview_requests_total", outcome="failed")
+                await self.websocket.send_json({"type": "error", "requestId": request_id, "detail": e.detail})
+                continue
             except Exception as e:
-                print(f"Error adding background image: {e}")
-                # Fallback to solid background
-                slide.background.fill.solid()
-                slide.background.fill.fore_color.rgb = RGBColor(245, 245, 245)
-        else:
-            print("FirstPage.png not found, using solid background")
-            slide.background.fill.solid()
-            slide.background.fill.fore_color.rgb = RGBColor(245, 245, 245)
+                logger.exception("Error rendering live preview: %s", e)
+                metrics.inc("live_preview_requests_total", outcome="failed")
+                await self.websocket.send_json({"type": "error", "requestId": request_id, "detail": f"Error generating preview: {str(e)}"})
+                continue
+            
+            if self.generation != generation:
+                # Finished just as a newer request came in; that one's frame follows
+                metrics.inc("live_preview_requests_total", outcome="superseded")
+                continue
+            metrics.inc("live_preview_requests_total", outcome="sent")
+            await self.websocket.send_json({"type": "preview", "requestId": request_id, **result})
+
+@app.websocket("/api/preview/live")
+async def live_preview(websocket: WebSocket):
+    """Live preview channel for a page that re-renders as the user types
+
+    The client sends {"fileId", "customizations", "requestId"} as often as it
+    likes; the server answers with {"type": "preview", "requestId", ...} carrying
+    the same fields as /api/generate-preview, for the latest request only, or
+    {"type": "error", "requestId", "detail"}.
+    """
+    await websocket.accept()
+    session = LivePreviewSession(websocket)
+    renderer = asyncio.create_task(session.run())
+    try:
+        while True:
+            try:
+                data = json.loads(await websocket.receive_text())
+            except json.JSONDecodeError:
+                await websocket.send_json({"type": "error", "requestId": None, "detail": "Messages must be JSON"})
+                continue
+            request_id = data.get("requestId") if isinstance(data, dict) else None
+            customizations = data.get("customizations", {}) if isinstance(data, dict) else None
+            if not isinstance(customizations, dict):
+                await websocket.send_json({"type": "error", "requestId": request_id, "detail": "customizations must be an object"})
+                continue
+            file_id = data.get("fileId")
+            if not file_id or file_id not in file_storage:
+                await websocket.send_json({"type": "error", "requestId": request_id, "detail": "File not found"})
+                continue
+            session.submit(request_id, customizations)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        renderer.cancel()
+        with contextlib.suppress(asyncio.CancelledError, Exception):
+            await renderer
+
+@app.post("/api/generate-deck")
+async def generate_deck(data: dict, mode: Optional[str] = None):
+    """Generate a deck with the title slide followed by a sheet's rows as table slides
+
+    Body: fileId, sheet, columns, rowsPerSlide, maxRows, stream, customizations.
+    stream=true reads rows straight from the upload instead of the sheet cache.
+    With ?mode=job the request returns 202 and a job id right away.
+    """
+    try:
+        file_id = data.get("fileId")
+        if not file_id or file_id not in file_storage:
+            raise HTTPException(status_code=404, detail="File not found")
+        file_info = file_storage[file_id]
         
-        # Add presentation title text box (positioned under TAOGLAS logo, right side)
-        presentation_text = customizations.get("presentationTo", "Presentation to")
-        print(f"DEBUG: Received presentation_text: '{presentation_text}'")
-        print(f"DEBUG: All customizations: {customizations}")
-        title_box = slide.shapes.add_textbox(
-            Inches(8.5), Inches(4
-            ), Inches(4.5), Inches(1.5)  # Positioned exactly under TAOGLAS logo on right side
+        build = functools.partial(
+            build_table_deck, file_info, customizations=data.get("customizations", {}),
+            **table_deck_options(data, file_info)
         )
-        title_frame = title_box.text_frame
-        title_frame.clear()  # Clear default paragraph
         
-        if presentation_text and presentation_text.strip() and presentation_text != "Presentation to":
-            title_frame.text = presentation_text
-        else:
-            title_frame.text = "Presentation to (Ex: Taoglas internal, XXX company...etc)"
-        
-        title_frame.paragraphs[0].alignment = PP_ALIGN.LEFT  # Ensure left alignment
-        title_frame.paragraphs[0].font.size = Inches(18.5/72)  # 18.5pt font size
-        title_frame.paragraphs[0].font.color.rgb = RGBColor(68, 68, 68)
-        title_frame.word_wrap = True
-        
-        # Add "Made by" text box (bottom right, exactly positioned)
-        made_by_text = customizations.get("madeBy", "Made by")
-        print(f"DEBUG: Received made_by_text: '{made_by_text}'")
-        made_by_box = slide.shapes.add_textbox(
-            Inches(10), Inches(6.2), Inches(2.5), Inches(0.8)  # Bottom right corner, aligned with presentation text
-        )
-        made_by_frame = made_by_box.text_frame
-        made_by_frame.clear()  # Clear default paragraph
+        if mode == "job":
+            job = submit_job("deck", lambda progress: cpu_pool.run(build, progress=progress, timeout=JOB_TIMEOUT))
+            return JSONResponse(status_code=202, content=job_status(job))
         
-        if made_by_text and made_by_text.strip() and made_by_text != "Made by":
-            made_by_frame.text = made_by_text
-        else:
-            made_by_frame.text = "Made by:"
+        return JSONResponse(content=await cpu_pool.run(build))
         
-        made_by_frame.paragraphs[0].alignment = PP_ALIGN.RIGHT  # Ensure right alignment
-        made_by_frame.paragraphs[0].font.size = Inches(16/72)  # 16pt font size
-        made_by_frame.paragraphs[0].font.color.rgb = RGBColor(68, 68, 68)
+    except HTTPException:
+        raise
+    except (KeyError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=f"Error generating deck: {str(e)}")
+    except Exception as e:
+        logger.exception("Error generating deck: %s", e)
+        raise HTTPException(status_code=500, detail=f"Error generating deck: {str(e)}")
+
+@app.post("/api/generate-charts")
+async def generate_charts(data: dict, mode: Optional[str] = None):
+    """Generate a deck with the title slide followed by native charts of a sheet's numeric columns
+
+    Body: fileId, sheet, maxPoints, customizations and charts, a list of
+    {type: line|scatter|bar|column, x, y: [columns], aggregate, title}.
+    With ?mode=job the request returns 202 and a job id right away.
+    """
+    try:
+        file_id = data.get("fileId")
+        if not file_id or file_id not in file_storage:
+            raise HTTPException(status_code=404, detail="File not found")
+        file_info = file_storage[file_id]
         
-        # Save preview PowerPoint with custom filename based on presentation name
-        presentation_name = customizations.get("presentationTo", "Presentation")
-        sanitized_name = sanitize_filename(presentation_name)
+        build = functools.partial(
+            build_chart_deck, file_info, customizations=data.get("customizations", {}),
+            **chart_deck_options(data, file_info)
+        )
         
-        # Add unique identifier to prevent conflicts while keeping readable name
-        unique_id = str(uuid.uuid4())[:8]  # Short unique ID
-        preview_filename = f"{sanitized_name}_{unique_id}.pptx"
-        download_filename = f"{sanitized_name}.pptx"  # Clean name for download
+        if mode == "job":
+            job = submit_job("charts", lambda progress: cpu_pool.run(build, progress=progress, timeout=JOB_TIMEOUT))
+            return JSONResponse(status_code=202, content=job_status(job))
         
-        preview_path = PREVIEW_DIR / preview_filename
-        prs.save(str(preview_path))
+        return JSONResponse(content=await cpu_pool.run(build))
         
-        # Create preview image that matches the PowerPoint content
-        image_filename = f"{sanitized_name}_{unique_id}_preview.png"
-        image_path = IMAGES_DIR / image_filename
+    except HTTPException:
+        raise
+    except (KeyError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=f"Error generating charts: {str(e)}")
+    except Exception as e:
+        logger.exception("Error generating charts: %s", e)
+        raise HTTPException(status_code=500, detail=f"Error generating charts: {str(e)}")
+
+@app.post("/api/generate-batch")
+async def generate_batch(data: dict):
+    """Render fileIds x customizations decks in parallel and stream them back as one zip
+
+    Body: fileIds (optional, title-only decks when empty), customizations (a
+    list of customization sets), plus the /api/generate-deck or
+    /api/generate-charts options (sheet, columns, rowsPerSlide, maxRows,
+    stream, charts, maxPoints), checked per deck like those endpoints do;
+    table decks stop after BATCH_MAX_ROWS rows unless maxRows asks for fewer.
+    Decks are added to the zip in completion order; a failed or invalid item
+    is listed in manifest.json, written last, instead of aborting the batch.
+    """
+    file_ids = data.get("fileIds") or [None]
+    customization_sets = data.get("customizations") or [{}]
+    if not isinstance(file_ids, list) or not isinstance(customization_sets, list):
+        raise HTTPException(status_code=400, detail="fileIds and customizations must be lists")
+    # Checked before the response starts: a bad entry here would otherwise abort the zip midway
+    if not all(isinstance(customizations, dict) for customizations in customization_sets):
+        raise HTTPException(status_code=400, detail="Every customizations entry must be an object")
+    if not all(file_id is None or isinstance(file_id, str) for file_id in file_ids):
+        raise HTTPException(status_code=400, detail="Every fileIds entry must be a string")
+    
+    items = [(file_id, customizations) for file_id in file_ids for customizations in customization_sets]
+    if len(items) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"Batch too large ({len(items)} decks), the limit is {BATCH_MAX_ITEMS}")
+    # Fail fast if the pool is already saturated rather than after the response has started
+    cpu_pool.check_capacity()
+    
+    options = {key: data[key] for key in ("sheet", "columns", "rowsPerSlide", "maxRows", "stream", "charts", "maxPoints") if key in data}
+    
+    async def render_item(index: int, file_id: Optional[str], customizations: dict) -> dict:
+        result = {"index": index, "fileId": file_id, "presentationTo": customizations.get("presentationTo")}
+        file_info = None
+        deck_options = {}
+        if file_id is not None:
+            file_info = file_storage.get(file_id)
+            if file_info is None:
+                return {**result, "status": "failed", "error": "File not found"}
+            try:
+                if options.get("charts"):
+                    deck_options = chart_deck_options(options, file_info)
+                else:
+                    deck_options = table_deck_options(options, file_info, BATCH_MAX_ROWS)
+            except HTTPException as e:
+                return {**result, "status": "failed", "error": e.detail}
+            except (TypeError, ValueError) as e:
+                return {**result, "status": "failed", "error": str(e)}
         
-        # Generate actual preview image with the same content
-        success = create_powerpoint_preview_image(customizations, image_path)
-        if not success:
-            print("Failed to create preview image, using fallback")
-            # Fallback: create simple image
-            fallback_img = Image.new('RGB', (1280, 720), color=(245, 245, 245))
-            fallback_img.save(str(image_path), 'PNG')
+        try:
+            deck, summary = await cpu_pool.run(render_batch_item, file_info, deck_options, customizations)
+            
+            stem = sanitize_filename(customizations.get("presentationTo", "Presentation"))
+            if file_info is not None:
+                stem += "_" + sanitize_filename(Path(file_info["filename"]).stem)
+            result.update(status="ok", filename=f"{index + 1:04d}_{stem}.pptx", **summary)
+            return {**result, "deck": deck}
+        except HTTPException as e:
+            return {**result, "status": "failed", "error": e.detail}
+        except Exception as e:
+            return {**result, "status": "failed", "error": str(e)}
+    
+    async def generate():
+        # At most BATCH_CONCURRENCY decks are rendering or waiting to be written at any
+        # time; the next one starts only after a finished deck has gone into the zip
+        # and the client has taken it, so a slow reader holds a bounded number in memory
+        queue = iter(enumerate(items))
+        in_flight = set()
         
-        return JSONResponse(content={
-            "message": "Preview generated successfully",
-            "previewFile": preview_filename,
-            "downloadFilename": download_filename,
-            "imageFile": image_filename,
-            "downloadUrl": f"/api/download-preview/{preview_filename}?download_name={download_filename}",
-            "imageUrl": f"/api/preview-image/{image_filename}"
-        })
+        def schedule():
+            while len(in_flight) < BATCH_CONCURRENCY:
+                entry = next(queue, None)
+                if entry is None:
+                    return
+                index, (file_id, customizations) = entry
+                in_flight.add(asyncio.ensure_future(render_item(index, file_id, customizations)))
         
-    except Exception as e:
-        print(f"Error generating preview: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Error generating preview: {str(e)}")
+        stream = ZipStream()
+        manifest = []
+        try:
+            with zipfile.ZipFile(stream, "w") as archive:
+                schedule()
+                while in_flight:
+                    done, _ = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        in_flight.discard(task)
+                        result = task.result()
+                        deck = result.pop("deck", None)
+                        if deck is not None:
+                            # .pptx is already deflated, store it as is
+                            archive.writestr(result["filename"], deck, compress_type=zipfile.ZIP_STORED)
+                        manifest.append(result)
+                        chunk = stream.drain()
+                        if chunk:
+                            yield chunk
+                    schedule()
+                
+                manifest.sort(key=lambda item: item["index"])
+                archive.writestr("manifest.json", json.dumps({
+                    "total": len(manifest),
+                    "succeeded": sum(item["status"] == "ok" for item in manifest),
+                    "failed": sum(item["status"] == "failed" for item in manifest),
+                    "items": manifest
+                }, indent=2), compress_type=zipfile.ZIP_DEFLATED)
+            yield stream.drain()
+        finally:
+            # Client went away: stop the decks still in flight, the rest were never started
+            for task in in_flight:
+                task.cancel()
+    
+    return StreamingResponse(
+        generate(),
+        media_type="application/zip",
+        headers={"Content-Disposition": 'attachment; filename="decks.zip"'}
+    )
+
+@app.get("/api/jobs/{job_id}")
+async def get_job_status(job_id: str):
+    """Get the status and progress of a background job"""
+    return JSONResponse(content=job_status(get_job(job_id)))
+
+@app.get("/api/jobs/{job_id}/result")
+async def get_job_result(job_id: str):
+    """Get the result of a finished job (202 with the status while it is still running)"""
+    job = get_job(job_id)
+    if job["status"] == "succeeded":
+        return JSONResponse(content=job["result"])
+    if job["status"] == "failed":
+        raise HTTPException(status_code=500, detail=f"Job failed: {job['error']}")
+    return JSONResponse(status_code=202, content=job_status(job))
+
+@app.get("/api/jobs/{job_id}/events")
+async def stream_job_events(job_id: str):
+    """Server-sent events with the job status on every change, ending when the job finishes"""
+    job = get_job(job_id)
+    
+    async def generate():
+        nonlocal job
+        seen_version = -1
+        while True:
+            if job["version"] != seen_version:
+                seen_version = job["version"]
+                yield f"event: status\ndata: {json.dumps(job_status(job))}\n\n"
+            if job["status"] in ("succeeded", "failed"):
+                return
+            await asyncio.sleep(JOB_EVENTS_POLL_INTERVAL)
+            # The job may be running on another worker, so poll the store
+            job = file_storage.get_record("job", job_id)
+            if job is None:
+                return
+    
+    return StreamingResponse(generate(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+@app.get("/api/preview-cache")
+async def get_preview_cache_stats():
+    """Preview render cache size and hit/miss counters"""
+    return JSONResponse(content=preview_cache.stats())
 
 @app.get("/api/download-preview/{filename}")
 async def download_preview(filename: str, download_name: str = None):
@@ -580,7 +4744,7 @@ async def download_preview(filename: str, download_name: str = None):
         )
         
     except Exception as e:
-        print(f"Error downloading preview: {str(e)}")
+        logger.exception("Error downloading preview: %s", e)
         raise HTTPException(status_code=500, detail=f"Error downloading preview: {str(e)}")
 
 @app.get("/api/preview-image/{filename}")
@@ -593,14 +4757,61 @@ async def get_preview_image(filename: str):
         
         return FileResponse(
             path=str(file_path),
-            media_type="image/png",
+            media_type="image/webp" if file_path.suffix == ".webp" else "image/png",
             filename=filename
         )
         
     except Exception as e:
-        print(f"Error serving preview image: {str(e)}")
+        logger.exception("Error serving preview image: %s", e)
         raise HTTPException(status_code=500, detail=f"Error serving preview image: {str(e)}")
 
+@app.get("/api/decks/{filename}/thumbnails")
+async def get_deck_thumbnails(
+    filename: str,
+    width: int = Query(SLIDE_THUMBNAIL_WIDTH, ge=16, le=SLIDE_THUMBNAIL_MAX_WIDTH),
+    start: int = Query(1, ge=1),
+    limit: int = Query(SLIDE_THUMBNAILS_PER_REQUEST, ge=1, le=SLIDE_THUMBNAILS_PER_REQUEST),
+):
+    """Thumbnail of every slide of a generated deck, rendered server-side
+
+    Slides are drawn in parallel on the worker pool and cached by a hash of
+    their XML, so unchanged slides (the title slide of every deck, say) are
+    only ever drawn once. Use start/limit to page through long decks.
+    """
+    try:
+        deck_path = PREVIEW_DIR / filename
+        if Path(filename).name != filename or deck_path.suffix != ".pptx" or not deck_path.exists():
+            raise HTTPException(status_code=404, detail="Deck not found")
+        
+        try:
+            plan = await render_slide_thumbnails(deck_path, width, start, limit)
+        except (zipfile.BadZipFile, KeyError, ET.ParseError) as e:
+            raise HTTPException(status_code=422, detail=f"Deck could not be read: {str(e)}")
+        
+        slides = []
+        for slide in plan["slides"]:
+            entry = {"slide": slide["slide"], "cached": slide["cached"]}
+            if "error" in slide:
+                entry["error"] = slide["error"]
+            else:
+                entry["thumbnailUrl"] = f"/api/preview-image/{slide['file']}"
+            slides.append(entry)
+        
+        last = start + len(slides) - 1
+        return JSONResponse(content={
+            "deckFile": filename,
+            "slideCount": plan["slideCount"],
+            "width": width,
+            "slides": slides,
+            "nextStart": last + 1 if last < plan["slideCount"] else None
+        })
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.exception("Error rendering deck thumbnails: %s", e)
+        raise HTTPException(status_code=500, detail=f"Error rendering deck thumbnails: {str(e)}")
+
 @app.get("/api/files")
 async def get_all_files():
     """Get information about all uploaded files"""
@@ -623,11 +4834,125 @@ async def get_all_files():
         raise HTTPException(status_code=500, detail=f"Error getting files info: {str(e)}")
 
 
+# Most recent slow requests with their stage breakdown (and a profile when sampled)
+slow_requests = deque(maxlen=SLOW_REQUEST_LOG_SIZE)
+# Called with each slow-request record; add callables to ship them elsewhere
+slow_request_hooks = [slow_requests.append]
+# cProfile can only profile one request at a time
+_profiler_lock = threading.Lock()
+
+def _route_template(scope) -> str:
+    # The route's path template ("/api/files/{file_id}/data") keeps label cardinality bounded
+    for route in app.router.routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return route.path
+    return "unmatched"
+
+@app.middleware("http")
+async def record_request_metrics(request, call_next):
+    """Time every request, and log the slow ones with their per-stage breakdown"""
+    stages = []
+    token = _request_stages.set(stages)
+    profiler = None
+    if PROFILE_SAMPLE_RATE and random.random() < PROFILE_SAMPLE_RATE and _profiler_lock.acquire(blocking=False):
+        # Profiles the event loop thread; stages on the worker pool show up in the breakdown instead
+        profiler = cProfile.Profile()
+        profiler.enable()
+    
+    start = time.perf_counter()
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+        return response
+    finally:
+        elapsed = time.perf_counter() - start
+        if profiler is not None:
+            profiler.disable()
+            _profiler_lock.release()
+        _request_stages.reset(token)
+        
+        route = _route_template(request.scope)
+        metrics.observe("http_request_duration_seconds", elapsed,
+                        method=request.method, route=route, status=str(status_code))
+        
+        if elapsed >= SLOW_REQUEST_SECONDS:
+            metrics.inc("slow_requests_total", route=route)
+            record = {
+                "time": time.time(),
+                "method": request.method,
+                "path": request.url.path,
+                "route": route,
+                "status": status_code,
+                "seconds": round(elapsed, 6),
+                "stages": stages,
+            }
+            if profiler is not None:
+                output = io.StringIO()
+                pstats.Stats(profiler, stream=output).sort_stats("cumulative").print_stats(25)
+                record["profile"] = output.getvalue()
+            for hook in slow_request_hooks:
+                try:
+                    hook(record)
+                except Exception as e:
+                    logger.error("Slow request hook failed: %s", e)
+
+@metrics.register
+def collect_runtime_metrics() -> list:
+    samples = []
+    for pool in (cpu_pool, io_pool):
+        samples.append(("worker_pool_running", "gauge", "Jobs running on a worker pool", {"pool": pool.name}, pool.running))
+        samples.append(("worker_pool_queued", "gauge", "Jobs waiting for a worker", {"pool": pool.name}, pool.queued))
+        samples.append(("worker_pool_capacity", "gauge", "Running plus queued jobs a pool accepts", {"pool": pool.name}, pool.capacity))
+    
+    statuses = {}
+    for _, job in file_storage.records("job"):
+        statuses[job["status"]] = statuses.get(job["status"], 0) + 1
+    for status, count in sorted(statuses.items()):
+        samples.append(("jobs", "gauge", "Background jobs by status", {"status": status}, count))
+    
+    preview_stats = preview_cache.stats()
+    for result, key in (("hit", "hits"), ("miss", "misses")):
+        samples.append(("preview_cache_lookups_total", "counter", "Preview cache lookups by result",
+                        {"result": result}, preview_stats[key]))
+    samples.append(("preview_cache_hit_ratio", "gauge", "Preview cache hits / lookups", {}, preview_stats["hitRate"]))
+    samples.append(("preview_cache_bytes", "gauge", "Bytes of rendered previews on disk", {}, preview_stats["bytes"]))
+    samples.append(("preview_renders_in_flight", "gauge", "Preview renders being computed", {}, len(_preview_renders)))
+    samples.append(("slide_renders_in_flight", "gauge", "Slide thumbnails being rendered", {}, len(_slide_renders)))
+    samples.append(("sweeper_runs_total", "counter", "Storage sweeper passes", {}, sweeper_stats.get("runs", 0)))
+    return samples
+
+@app.get("/api/metrics")
+async def get_metrics():
+    """Prometheus text exposition of stage timings, request latency, cache hit rates and queue depths"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/api/metrics/slow-requests")
+async def get_slow_requests():
+    """The last SLOW_REQUEST_LOG_SIZE requests slower than SLOW_REQUEST_SECONDS"""
+    return JSONResponse(content={"thresholdSeconds": SLOW_REQUEST_SECONDS, "requests": list(slow_requests)})
+
 @app.get("/api/health")
 async def health_check():
     """Health check endpoint"""
     return {"status": "healthy", "message": "FastAPI backend is running"}
 
+@app.get("/api/ready")
+async def readiness_check():
+    """Readiness check: 503 until the startup warm-up has finished"""
+    content = {
+        "status": "ready" if startup_state["ready"] else "warming up",
+        "startupMs": {phase: round(seconds * 1000, 1) for phase, seconds in startup_timings.items()},
+        "error": startup_state["error"]
+    }
+    if not startup_state["ready"]:
+        return JSONResponse(status_code=503, content=content, headers={"Retry-After": "1"})
+    return JSONResponse(content=content)
+
+# Everything above this line is what a bare "import main" costs
+startup_timings["module import"] = time.perf_counter() - _MODULE_LOAD_STARTED
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import { useNavigate } from 'react-router-dom';
 import 'boxicons/css/boxicons.min.css';
 
@@ -16,6 +16,10 @@ const Process = () => {
   const [previewImageUrl, setPreviewImageUrl] = useState(null);
   const [isGeneratingPreview, setIsGeneratingPreview] = useState(false);
   const [selectedFileIndex, setSelectedFileIndex] = useState(0); // For selecting which file to use for preview
+  
+  // Live preview WebSocket: the server renders only the latest edit and drops superseded ones
+  const liveSocketRef = useRef(null);
+  const liveRequestIdRef = useRef(0);
 
   useEffect(() => {
     // Immediate check before component fully loads
@@ -79,6 +83,59 @@ const Process = () => {
     }
   };
 
+  useEffect(() => {
+    if (!projectData?.files || projectData.files.length === 0) return;
+    
+    const socket = new WebSocket('ws://localhost:8000/api/preview/live');
+    socket.onmessage = (event) => {
+      const message = JSON.parse(event.data);
+      // Answers to older requests are stale; the latest one's answer follows
+      if (message.requestId !== liveRequestIdRef.current) return;
+      if (message.type === 'preview') {
+        setPreviewUrl(`http://localhost:8000${message.downloadUrl}`);
+      } else {
+        console.error('Error generating live preview:', message.detail);
+      }
+      setIsGeneratingPreview(false);
+    };
+    socket.onclose = () => {
+      if (liveSocketRef.current === socket) {
+        liveSocketRef.current = null;
+      }
+    };
+    liveSocketRef.current = socket;
+    
+    return () => {
+      liveSocketRef.current = null;
+      socket.close();
+    };
+  }, [projectData?.files]);
+
+  // Sends the customizations over the live preview socket; false if it is not connected
+  const sendLivePreview = (customPresentationTo, customMadeBy) => {
+    const socket = liveSocketRef.current;
+    if (!socket || socket.readyState !== WebSocket.OPEN || !projectData?.files?.length) return false;
+    
+    const selectedFile = projectData.files[selectedFileIndex] || projectData.files[0];
+    liveRequestIdRef.current += 1;
+    socket.send(JSON.stringify({
+      requestId: liveRequestIdRef.current,
+      fileId: selectedFile.fileId,
+      customizations: {
+        presentationTo: customPresentationTo || 'Presentation to',
+        madeBy: customMadeBy || 'Made by'
+      }
+    }));
+    return true;
+  };
+
+  // Re-render the downloadable deck as the user types, once one has been generated
+  useEffect(() => {
+    if (previewUrl) {
+      sendLivePreview(presentationTo, madeBy);
+    }
+  }, [presentationTo, madeBy, selectedFileIndex]);
+
   const handleBack = () => {
     navigate('/upload');
   };
@@ -200,8 +257,12 @@ const Process = () => {
     localStorage.setItem('currentProject', JSON.stringify(updatedProject));
     setProjectData(updatedProject);
     
-    // Generate live PowerPoint preview
-    await generateLivePreview(newPresentationTo, newMadeBy);
+    // Generate live PowerPoint preview, over the live socket when it is connected
+    if (sendLivePreview(newPresentationTo, newMadeBy)) {
+      setIsGeneratingPreview(true);
+    } else {
+      await generateLivePreview(newPresentationTo, newMadeBy);
+    }
   };
 
   if (isLoading) {